@@ -0,0 +1,155 @@
+import os
+import threading
+import time
+from collections import deque
+from helper import Helper
+from udpipe_cache import UDPipeCache
+
+
+# Morphosyntactic analyzer backends
+# an analyzer turns texts into CoNLL-U analyses (with TokenRange offsets of the tokens)
+# analyze(texts) yields the analysis of each text in the order of the texts, a failed analysis yields its exception instead
+class Analyzer:
+
+    NAMES = ["rest", "local", "record", "replay"]
+
+    def analyze(self, texts):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+    # latencies (seconds) of the recent analyzer calls (used by the profiler)
+    def latencies(self):
+        return []
+
+    def close(self):
+        pass
+
+
+# UDPipe2 REST API (public LINDAT service or a self-hosted server)
+# requests are concurrent if workers > 1 and packed if batch_max_bytes > 0, responses are served from the cache if possible
+class RestAnalyzer(Analyzer):
+    # constructor
+    def __init__(self, url, payload, workers, batch_max_bytes, cache, transport):
+        self.url = url
+        self.payload = payload
+        self.workers = workers
+        self.batch_max_bytes = batch_max_bytes
+        self.cache = cache
+        self.transport = transport
+
+    def analyze(self, texts):
+        return Helper.call_udpipe_service_concurrent(texts, self.url, self.payload, self.workers, self.batch_max_bytes, self.cache, self.transport)
+
+    def stats(self):
+        return {"udpipe_cache": self.cache.stats() if self.cache is not None else None, "udpipe_transport": self.transport.stats()}
+
+    # latencies of the recent successful requests (responses served from the cache are not requests)
+    def latencies(self):
+        with self.transport.lock:
+            return [latency for latency, _ in self.transport.samples]
+
+    def close(self):
+        self.transport.close()
+
+
+# UDPipe model running in-process (ufal.udpipe, optional dependency), no network is used
+# ufal.udpipe loads UDPipe 1 models (*.udpipe), their analyses may differ from the ones of the UDPipe2 service
+class LocalAnalyzer(Analyzer):
+    # constructor
+    def __init__(self, model_path):
+        try:
+            from ufal.udpipe import Model, Pipeline, ProcessingError
+        except ImportError as e:
+            raise ImportError("The local analyzer needs the ufal.udpipe package (pip install ufal.udpipe).") from e
+
+        self.model_path = model_path
+        self.model = Model.load(model_path)
+        if self.model is None:
+            raise ValueError(f"UDPipe model could not be loaded: {model_path}")
+        # tokenizer with token ranges (TokenRange in MISC column) and model's default tagger
+        # dependency parsing is skipped (HEAD and DEPREL columns are not used by the mappers)
+        self.pipeline = Pipeline(self.model, "tokenizer=" + Model.TOKENIZER_RANGES, Pipeline.DEFAULT, Pipeline.NONE, "conllu")
+        self.processing_error = ProcessingError
+        self.lock = threading.Lock() # the pipeline is not shared by threads
+        self.count = 0
+        self.samples = deque(maxlen=1000) # processing times (seconds) of the recent texts
+
+    def analyze(self, texts):
+        for text in texts:
+            try:
+                yield self.process(text)
+            except Exception as e:
+                yield e
+
+    def process(self, text):
+        error = self.processing_error()
+        with self.lock:
+            start = time.perf_counter()
+            result = self.pipeline.process(text, error)
+            self.samples.append(time.perf_counter() - start)
+            self.count += 1
+        if error.occurred():
+            raise RuntimeError(f"UDPipe processing error: {error.message}")
+        return result
+
+    def stats(self):
+        return {"model": self.model_path, "analyzed": self.count}
+
+    def latencies(self):
+        with self.lock:
+            return list(self.samples)
+
+
+# recording the analyses of another analyzer to a directory (for offline runs and benchmarks with ReplayAnalyzer)
+class RecordingAnalyzer(Analyzer):
+    # constructor
+    def __init__(self, analyzer, recordings_dir, payload):
+        self.analyzer = analyzer
+        self.payload = payload # model and options (part of the key of a recording)
+        self.store = RecordingAnalyzer.open_store(recordings_dir)
+
+    # recordings are kept in the layout of the response cache, without size limit and in-memory tier
+    @staticmethod
+    def open_store(recordings_dir):
+        return UDPipeCache(recordings_dir, max_bytes=float("inf"), max_items_memory=0)
+
+    def analyze(self, texts):
+        for text, result in zip(texts, self.analyzer.analyze(texts)):
+            if not isinstance(result, Exception):
+                self.store.put(UDPipeCache.make_key(self.payload, text), result)
+            yield result
+
+    def stats(self):
+        stats = self.analyzer.stats()
+        stats["recorded"] = self.store.writes
+        return stats
+
+    def latencies(self):
+        return self.analyzer.latencies()
+
+    def close(self):
+        self.analyzer.close()
+
+
+# serving recorded analyses (see RecordingAnalyzer) deterministically, no network is used
+# a text without a recording of the same model and options fails
+class ReplayAnalyzer(Analyzer):
+    # constructor
+    def __init__(self, recordings_dir, payload):
+        if not os.path.isdir(recordings_dir):
+            raise ValueError(f"Recordings directory not found: {recordings_dir}")
+        self.payload = payload
+        self.store = RecordingAnalyzer.open_store(recordings_dir)
+
+    def analyze(self, texts):
+        for text in texts:
+            result = self.store.get(UDPipeCache.make_key(self.payload, text))
+            if result is None:
+                yield LookupError(f"No recorded analysis for the text (model {self.payload['model']}): {text[:50]!r}...")
+            else:
+                yield result
+
+    def stats(self):
+        return {"replayed": self.store.hits_disk, "missing": self.store.misses}
@@ -0,0 +1,28 @@
+import os
+import uuid
+
+
+# Atomic writing of files stored next to an output or in a cache directory (manifest, token counts, cache entries)
+# the content is written to a temporary file in the same directory which then replaces the file,
+# the temporary file is created with mode 0666 like open() does, so the kernel applies the umask and it gets the permissions of the other outputs
+
+
+# writing a text file atomically, write(f) writes the content to the open file
+def write_atomic(path, write, prefix=".tmp-"):
+    directory = os.path.dirname(path)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    while True:
+        tmp_path = os.path.join(directory, prefix + uuid.uuid4().hex)
+        try:
+            fd = os.open(tmp_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o666)
+            break
+        except FileExistsError:
+            continue
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
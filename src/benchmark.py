@@ -0,0 +1,352 @@
+import argparse
+import gc
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+import tracemalloc
+import config
+from main import expand_inputs
+from pipeline import Pipeline
+from export_reader import ExportReader
+from validator import DataValidator
+from token_table import TokenTable
+from stage_timer import StageTimer
+
+try:
+    import resource # peak RSS (not available on Windows)
+except ImportError:
+    resource = None
+
+
+# Benchmark of the pipeline over the bundled exports
+# analyses are served by the replay analyzer (recorded responses), so the numbers do not depend on the network
+# recordings are created once with --record (record analyzer, needs the UDPipe2 service)
+# run with: python src/benchmark.py --baseline ./benchmarks/baseline.json
+class Benchmark:
+
+    # stages in the order of the pipeline, "map" contains the span lookup and the facet mappers
+    STAGES = ["resources", "load", "validate", "reconstruct", "analyze", "parse", "map", "span", "pos", "inf_feat", "lex_feat", "unit", "phenomenon", "level"]
+    MIN_SECONDS = 0.01 # stages faster than this are not checked for regressions (timer noise)
+    STARTUP_BUDGET = 2.0 # seconds from process start to the first mapped task (short incremental runs, service cold starts)
+    HEAVY_MODULES = ["pandas", "numpy", "nltk", "requests"] # modules which should not be imported at CLI start (imported on first use)
+
+    # cold start in a fresh interpreter: importing the CLI module, then streaming the first export until its first task is mapped
+    # the probe prints a marker line with its own measurements as soon as the first task is done
+    STARTUP_PROBE = """
+import json, sys, time
+start = time.perf_counter()
+sys.path.insert(0, {src_dir!r})
+import main
+imported = time.perf_counter()
+heavy = [name for name in {heavy!r} if name in sys.modules]
+main.config.DEBUG = False
+with main.Pipeline(use_cache=False, analyzer={analyzer!r}, recordings_dir={recordings_dir!r}) as pipeline:
+    next(pipeline.iter_errors({path!r}), None)
+    print("STARTUP " + json.dumps({{"import_seconds": imported - start, "first_task_seconds": time.perf_counter() - start, "heavy_modules_at_import": heavy}}), flush=True)
+"""
+
+    # constructor
+    def __init__(self, paths, recordings_dir, analyzer = "replay"):
+        self.paths = paths
+        self.recordings_dir = recordings_dir
+        self.analyzer = analyzer
+
+    def pipeline(self, processes = 1):
+        return Pipeline(use_cache=False, processes=processes, analyzer=self.analyzer, recordings_dir=self.recordings_dir)
+
+    # recording the analyses of all tasks (the only step using the network)
+    def record(self):
+        with Pipeline(analyzer="record", recordings_dir=self.recordings_dir) as pipeline:
+            for path in self.paths:
+                for _ in pipeline.iter_errors(path):
+                    pass
+            return pipeline.analyzer.stats()
+
+    # one pass over the exports (at most max_tasks tasks), all stages are timed
+    # if keep is a list, the mapped errors are appended to it (see error_memory)
+    def run_once(self, max_tasks = None, keep = None):
+        timer = StageTimer()
+        tasks_total = 0
+        errors_total = 0
+        failed_total = 0
+        started = time.perf_counter()
+        pipeline = self.pipeline()
+        try:
+            with timer.stage("resources"):
+                pipeline.open()
+            pipeline.mapper.timer = timer
+
+            for path in self.paths:
+                if max_tasks is not None and tasks_total >= max_tasks:
+                    break
+                with timer.stage("load"):
+                    tasks = list(ExportReader.iter_tasks(path))
+                if max_tasks is not None:
+                    tasks = tasks[:max_tasks - tasks_total]
+
+                with timer.stage("validate"):
+                    validator = DataValidator()
+                    for task in tasks:
+                        validator.add_task(task)
+                if not validator.passed(): # invalid exports are not processed by the pipeline either
+                    continue
+                tasks_total += len(tasks)
+
+                with timer.stage("reconstruct"):
+                    prepared = [res for res in (pipeline.prepare_task(idx, task) for idx, task in enumerate(tasks)) if res is not None]
+
+                with timer.stage("analyze"):
+                    analyses = list(pipeline.analyze(prepared))
+
+                for (_, ctx), (res_service, res_original) in zip(prepared, analyses):
+                    if isinstance(res_service, Exception) or isinstance(res_original, Exception):
+                        failed_total += 1
+                        continue
+                    start = time.perf_counter()
+                    table = TokenTable(res_service)
+                    original_table = TokenTable(res_original)
+                    start = timer.lap("parse", start)
+                    errors = pipeline.mapper.map_task(ctx, table, original_table)
+                    timer.lap("map", start)
+                    errors_total += len(errors)
+                    if keep is not None:
+                        keep.extend(errors)
+        finally:
+            pipeline.close()
+
+        return {
+            "seconds": time.perf_counter() - started,
+            "tasks": tasks_total,
+            "failed_tasks": failed_total,
+            "errors": errors_total,
+            "stages": timer.report()
+        }
+
+    # repeated runs, the median of every measurement is reported
+    def measure(self, repeat = 3, max_tasks = None):
+        runs = [self.run_once(max_tasks) for _ in range(repeat)]
+        stages = {}
+        for stage in Benchmark.STAGES:
+            values = [run["stages"][stage]["seconds"] for run in runs if stage in run["stages"]]
+            if len(values) > 0:
+                stages[stage] = {"seconds": round(statistics.median(values), 6), "count": runs[0]["stages"][stage]["count"]}
+        seconds = statistics.median(run["seconds"] for run in runs)
+        return {
+            "repeat": repeat,
+            "seconds": round(seconds, 6),
+            "tasks": runs[0]["tasks"],
+            "failed_tasks": runs[0]["failed_tasks"],
+            "errors": runs[0]["errors"],
+            "errors_per_second": round(runs[0]["errors"] / seconds, 2) if seconds > 0 else 0.0,
+            "stages": stages
+        }
+
+    # peak memory: Python heap (tracemalloc, separate run because tracing slows everything down) and peak RSS of the process
+    def memory(self):
+        tracemalloc.start()
+        try:
+            self.run_once()
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+        return {
+            "peak_heap_bytes": peak,
+            "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 if resource is not None else None # ru_maxrss is in KiB on Linux
+        }
+
+    # memory held by the mapped errors (Error objects with their taxonomy, metadata and the texts only they refer to)
+    # measured as the traced memory released when the errors of all tasks are dropped, i.e. what a caller of Pipeline.run keeps
+    def error_memory(self):
+        errors = []
+        tracemalloc.start()
+        try:
+            self.run_once(keep=errors)
+            gc.collect()
+            retained = tracemalloc.get_traced_memory()[0]
+            count = len(errors)
+            errors.clear()
+            gc.collect()
+            released = retained - tracemalloc.get_traced_memory()[0]
+        finally:
+            tracemalloc.stop()
+        return {"errors": count, "bytes": released, "bytes_per_error": round(released / count, 1) if count > 0 else None}
+
+    # time from process start to the first mapped task (median of repeat cold starts)
+    def startup(self, repeat = 3):
+        code = Benchmark.STARTUP_PROBE.format(src_dir=os.path.dirname(os.path.abspath(__file__)), heavy=Benchmark.HEAVY_MODULES,
+                                              analyzer=self.analyzer, recordings_dir=self.recordings_dir, path=self.paths[0])
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            process = subprocess.Popen([sys.executable, "-c", code], stdout=subprocess.PIPE, text=True, encoding="utf-8")
+            probe = None
+            for line in process.stdout:
+                if line.startswith("STARTUP "):
+                    seconds = time.perf_counter() - started
+                    probe = json.loads(line[len("STARTUP "):])
+                    probe["seconds"] = seconds
+                    break
+            process.stdout.read()
+            if process.wait() != 0 or probe is None:
+                raise RuntimeError(f"Startup probe failed (exit code {process.returncode})")
+            runs.append(probe)
+        return {
+            "seconds": round(statistics.median(run["seconds"] for run in runs), 6),
+            "import_seconds": round(statistics.median(run["import_seconds"] for run in runs), 6),
+            "first_task_seconds": round(statistics.median(run["first_task_seconds"] for run in runs), 6),
+            "heavy_modules_at_import": runs[0]["heavy_modules_at_import"]
+        }
+
+    # time over the number of tasks
+    def task_scaling(self, task_counts, repeat = 1):
+        curve = []
+        for count in task_counts:
+            res = self.measure(repeat, count)
+            curve.append({"tasks": res["tasks"], "seconds": res["seconds"], "errors": res["errors"], "errors_per_second": res["errors_per_second"]})
+        return curve
+
+    # time of the mapping stage over the number of mapping processes (analyses are done once before)
+    def worker_scaling(self, process_counts):
+        with self.pipeline() as pipeline:
+            pipeline.open()
+            analyzed = []
+            for path in self.paths:
+                tasks = list(ExportReader.iter_tasks(path))
+                validator = DataValidator()
+                for task in tasks:
+                    validator.add_task(task)
+                if not validator.passed():
+                    continue
+                prepared = [res for res in (pipeline.prepare_task(idx, task) for idx, task in enumerate(tasks)) if res is not None]
+                for (_, ctx), (res_service, res_original) in zip(prepared, pipeline.analyze(prepared)):
+                    if not isinstance(res_service, Exception) and not isinstance(res_original, Exception):
+                        analyzed.append((ctx, res_service, res_original))
+
+        curve = []
+        for processes in process_counts:
+            with self.pipeline(processes) as pipeline:
+                pipeline.open()
+                # warming up (worker processes are started on first use)
+                for _ in pipeline.map_analyzed(analyzed[:4 * processes]):
+                    pass
+                start = time.perf_counter()
+                errors = sum(len(errors) for errors in pipeline.map_analyzed(analyzed))
+                seconds = time.perf_counter() - start
+            curve.append({"processes": processes, "seconds": round(seconds, 6), "errors": errors, "errors_per_second": round(errors / seconds, 2) if seconds > 0 else 0.0})
+        return curve
+
+    # comparing a report with a baseline report, returns the list of regressions (slower by more than threshold)
+    @staticmethod
+    def compare(report, baseline, threshold):
+        regressions = []
+        limit = 1.0 + threshold
+        if report["seconds"] > baseline["seconds"] * limit:
+            regressions.append({"measure": "seconds", "baseline": baseline["seconds"], "current": report["seconds"]})
+        if report["errors_per_second"] * limit < baseline["errors_per_second"]:
+            regressions.append({"measure": "errors_per_second", "baseline": baseline["errors_per_second"], "current": report["errors_per_second"]})
+        for stage, current in report["stages"].items():
+            base = baseline.get("stages", {}).get(stage)
+            if base is None or max(base["seconds"], current["seconds"]) < Benchmark.MIN_SECONDS:
+                continue
+            if current["seconds"] > base["seconds"] * limit:
+                regressions.append({"measure": f"stages.{stage}", "baseline": base["seconds"], "current": current["seconds"]})
+        base = baseline.get("error_memory")
+        current = report.get("error_memory")
+        if base is not None and current is not None and base["bytes_per_error"] is not None and current["bytes_per_error"] > base["bytes_per_error"] * limit:
+            regressions.append({"measure": "error_memory.bytes_per_error", "baseline": base["bytes_per_error"], "current": current["bytes_per_error"]})
+        return regressions
+
+    @staticmethod
+    def print_report(report):
+        print(f"\nTasks: {report['tasks']} --- Errors: {report['errors']} --- Time: {report['seconds']:.3f} s --- Errors/s: {report['errors_per_second']}")
+        for stage, res in report["stages"].items():
+            indent = "    " if stage in ["span", "pos", "inf_feat", "lex_feat", "unit", "phenomenon", "level"] else "  "
+            print(f"{indent}{stage:<{22 - len(indent)}}{res['seconds']:>10.4f} s  ({res['count']} calls)")
+        if "startup" in report:
+            startup = report["startup"]
+            print(f"Startup: {startup['seconds']:.3f} s to the first task (imports {startup['import_seconds']:.3f} s), heavy modules at import: {startup['heavy_modules_at_import'] or 'none'}")
+        if "memory" in report:
+            print(f"Peak memory: heap {report['memory']['peak_heap_bytes'] / 2**20:.1f} MiB, RSS {(report['memory']['peak_rss_bytes'] or 0) / 2**20:.1f} MiB")
+        if "error_memory" in report:
+            print(f"Error objects: {report['error_memory']['bytes'] / 2**20:.1f} MiB for {report['error_memory']['errors']} errors ({report['error_memory']['bytes_per_error']} bytes per error)")
+        for point in report.get("task_scaling", []):
+            print(f"  tasks={point['tasks']:<6} {point['seconds']:>8.3f} s  {point['errors_per_second']:>10.1f} errors/s")
+        for point in report.get("worker_scaling", []):
+            print(f"  processes={point['processes']:<3} {point['seconds']:>8.3f} s  {point['errors_per_second']:>10.1f} errors/s (mapping stage)")
+
+
+def parse_counts(text):
+    return [int(item) for item in text.split(",") if item.strip() != ""]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark of the Semi-automated Annotation Extender (recorded analyzer responses, no network)")
+    parser.add_argument("inputs", nargs="*", default=["./input/ls_output_*.json"], help="Export files, directories or glob patterns (default: ./input/ls_output_*.json).")
+    parser.add_argument("--recordings-dir", default=config.UDPIPE2_RECORDINGS_DIR, help="Directory of the recorded analyzer responses.")
+    parser.add_argument("--record", action="store_true", help="Record the analyzer responses first (uses the UDPipe2 service).")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of measured runs (medians are reported).")
+    parser.add_argument("--output", default="./output/benchmark.json", help="JSON report of the benchmark.")
+    parser.add_argument("--baseline", default=None, help="Baseline report to compare with (exit code 1 on regression).")
+    parser.add_argument("--save-baseline", action="store_true", help="Write the report of this run to the --baseline path.")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown relative to the baseline (0.10 = 10%%).")
+    parser.add_argument("--task-counts", type=parse_counts, default=[50, 100, 200, 400], help="Task counts of the scaling curve (comma-separated, empty to skip).")
+    parser.add_argument("--processes", type=parse_counts, default=[1, 2, 4], help="Mapping process counts of the scaling curve (comma-separated, empty to skip).")
+    parser.add_argument("--no-memory", action="store_true", help="Skip the (slow) peak memory measurement.")
+    parser.add_argument("--no-startup", action="store_true", help="Skip the cold start measurement.")
+    parser.add_argument("--startup-budget", type=float, default=Benchmark.STARTUP_BUDGET, help="Allowed seconds from process start to the first mapped task (exit code 1 if exceeded).")
+    args = parser.parse_args()
+    if args.save_baseline and args.baseline is None:
+        parser.error("--save-baseline needs the baseline path (--baseline)")
+
+    config.DEBUG = False
+    paths = expand_inputs(args.inputs)
+    if len(paths) == 0:
+        parser.error(f"No export files found for {args.inputs}")
+    benchmark = Benchmark(paths, args.recordings_dir)
+
+    if args.record:
+        print(f"Recording analyzer responses to {args.recordings_dir}: {benchmark.record()}")
+    if not os.path.isdir(args.recordings_dir):
+        parser.error(f"Recordings directory not found: {args.recordings_dir} (run with --record first)")
+
+    report = benchmark.measure(args.repeat)
+    report["inputs"] = paths
+    if report["failed_tasks"] > 0:
+        print(f"Warning: {report['failed_tasks']} tasks have no recorded analysis (run with --record).")
+    if not args.no_memory:
+        report["memory"] = benchmark.memory()
+        report["error_memory"] = benchmark.error_memory()
+    if not args.no_startup:
+        report["startup"] = benchmark.startup()
+        report["startup"]["budget"] = args.startup_budget
+    if len(args.task_counts) > 0:
+        report["task_scaling"] = benchmark.task_scaling(args.task_counts)
+    if len(args.processes) > 0:
+        report["worker_scaling"] = benchmark.worker_scaling(args.processes)
+    Benchmark.print_report(report)
+
+    exit_code = 0
+    if "startup" in report and report["startup"]["seconds"] > args.startup_budget:
+        print(f"Startup budget exceeded: {report['startup']['seconds']:.3f} s > {args.startup_budget} s")
+        exit_code = 1
+    if args.baseline is not None and os.path.exists(args.baseline) and not args.save_baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        report["regressions"] = Benchmark.compare(report, baseline, args.threshold)
+        for regression in report["regressions"]:
+            print(f"Regression: {regression['measure']} {regression['baseline']} -> {regression['current']} (threshold {args.threshold:.0%})")
+        if len(report["regressions"]) == 0:
+            print(f"No regression against {args.baseline} (threshold {args.threshold:.0%}).")
+        else:
+            exit_code = 1
+
+    for path in [args.output] + ([args.baseline] if args.save_baseline else []):
+        directory = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+    sys.exit(exit_code)
@@ -1,8 +1,22 @@
 VERSION = "1.0.0"
 DEBUG = True
-DATA = [] # will hold the input data (Label Studio's json output/export file)
-METADATA = [] # used to keep metadata information
-ABBREVIATIONS_TDK = [] # used to keep abbreviations defined by TDK
+METADATA_FILE = "./input/metadata.xlsx" # metadata of the texts (sheet "raw": id, nationality, gender, topic)
+ABBREVIATIONS_TDK_FILE = "./res/abbr_list_tr.xlsx" # abbreviations defined by TDK
+MAPPING_SCHEMA_FILE = "./PredefinedTagsetMappingSchema.xlsx" # allowed UPOS/UIF/ULF/Unit/Phenomenon/Level values per error tag
+STRICT_FACETS = False # rejecting mapped facet values which the mapping schema does not allow for the error tag (raises an error)
+RESOURCE_CACHE_DIR = "./cache/resources" # directory of the compiled metadata and abbreviations (None disables the compiled cache)
+ANALYZER = "rest" # morphosyntactic analyzer backend: rest (UDPipe2 REST API), local (ufal.udpipe model), record (REST API, analyses are recorded), replay (recorded analyses)
 UDPIPE2_SERVICE = "https://lindat.mff.cuni.cz/services/udpipe/api"  # base URL for UDPipe service
 UDPIPE2_MODEL = "turkish-imst-ud-2.15-241121" # Turkish model for UDPipe (old: turkish-boun-ud-2.15-241121)
-MAP_LOOKUP = [] # used to find new indices of errors in corrected text
\ No newline at end of file
+UDPIPE2_CACHE_DIR = "./cache/udpipe" # directory of the persistent UDPipe response cache (None disables caching)
+UDPIPE2_CACHE_MAX_BYTES = 512 * 1024 * 1024 # size limit of the on-disk cache tier
+UDPIPE2_CACHE_MEMORY_ITEMS = 1024 # number of responses kept in the in-memory cache tier
+UDPIPE2_WORKERS = 1 # maximum number of concurrent UDPipe requests (1 means sequential)
+UDPIPE2_BATCH_MAX_BYTES = 0 # maximum size of a request which packs several tasks (0 means one request per task)
+UDPIPE2_TIMEOUT = (25, 60) # (connect, read) timeout of a UDPipe request in seconds (read timeout is the upper limit of the adaptive timeout)
+UDPIPE2_MAX_RETRIES = 3 # number of retries for timeouts, connection errors and 5xx responses
+UDPIPE2_HEDGE = False # sending a duplicate request if a request is slower than the usual (p95) latency
+TASK_WINDOW = 64 # number of tasks read and analyzed together while streaming the input file
+MAPPING_PROCESSES = 1 # number of worker processes mapping the errors to the taxonomy (1 means in the main process)
+UDPIPE_LOCAL_MODEL = None # UDPipe model file (*.udpipe) of the local analyzer
+UDPIPE2_RECORDINGS_DIR = "./recordings/udpipe" # directory of the analyses recorded by the record analyzer and served by the replay analyzer
\ No newline at end of file
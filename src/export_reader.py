@@ -0,0 +1,78 @@
+import json
+
+
+# Incremental reader of Label Studio's json export
+# tasks are decoded one at a time from the top-level JSON array, so memory is bounded by the largest task (not by the file size)
+# only the fields used by the pipeline are kept (drafts, predictions, comment authors, etc. are dropped)
+class ExportReader:
+
+    CHUNK_SIZE = 1 << 20 # number of characters read at once
+
+    # yields compact tasks of the export one by one
+    @staticmethod
+    def iter_tasks(path, chunk_size=CHUNK_SIZE):
+        decoder = json.JSONDecoder()
+        with open(path, "r", encoding="utf-8") as file:
+            buffer = ""
+            pos = 0
+            eof = False
+            started = False
+            read_size = chunk_size
+            while True:
+                # skipping whitespace and separators between the elements of the array
+                while pos < len(buffer) and buffer[pos] in " \t\r\n,":
+                    pos += 1
+
+                if pos >= len(buffer):
+                    if eof:
+                        raise ValueError("Unexpected end of the export file (missing ']').")
+                    buffer, pos, eof = ExportReader._read_more(file, buffer, pos, read_size)
+                    continue
+
+                if not started:
+                    if buffer[pos] != "[":
+                        raise ValueError("The export file should contain a JSON array of tasks.")
+                    started = True
+                    pos += 1
+                    continue
+
+                if buffer[pos] == "]":
+                    return
+
+                try:
+                    task, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    # the task is not complete in the buffer yet
+                    if eof:
+                        raise
+                    buffer, pos, eof = ExportReader._read_more(file, buffer, pos, read_size)
+                    read_size *= 2 # a large task is decoded with fewer retries
+                    continue
+
+                read_size = chunk_size
+                pos = end
+                yield ExportReader.compact_task(task)
+
+    # keeping only the fields used by the pipeline
+    @staticmethod
+    def compact_task(task):
+        return {
+            "id": task["id"],
+            "updated_at": task.get("updated_at"),
+            "data": {"ID": task["data"]["ID"], "DATA": task["data"]["DATA"]},
+            "annotations": [{"result": [ExportReader.compact_result(result) for result in annotation["result"]]} for annotation in task["annotations"]]
+        }
+
+    @staticmethod
+    def compact_result(result):
+        value = result["value"]
+        compact_value = {"start": value["start"], "end": value["end"], "text": value["text"]}
+        if "labels" in value:
+            compact_value["labels"] = value["labels"]
+        return {"id": result["id"], "type": result["type"], "value": compact_value}
+
+    # dropping the consumed part of the buffer and appending the next chunk
+    @staticmethod
+    def _read_more(file, buffer, pos, read_size):
+        chunk = file.read(read_size)
+        return buffer[pos:] + chunk, 0, chunk == ""
@@ -1,19 +1,27 @@
 import config
 import json
-import requests
-import pandas as pd
+from concurrent.futures import ThreadPoolExecutor
 from model.error_tag import ErrorTag
+from udpipe_cache import UDPipeCache
+from udpipe_batch import UDPipeBatch
+from udpipe_transport import UDPipeTransport
+from validator import DataValidator
+from export_reader import ExportReader
+from resource_cache import ResourceCache
+from text_tools import turkish_casefold
+from span_map import OffsetMap, SpanMap
+from token_table import TokenTable
 
 
 # Helper class containing static methods for various functionalities
 class Helper:
-    # loading Label Studio's json output/export file
+    # loading Label Studio's json output/export file, returns the list of (compact) tasks
     @staticmethod
     def load_data(path):
         # loading json file
         try:
             with open(path, 'r') as file:
-                config.DATA = json.load(file)
+                data = [ExportReader.compact_task(task) for task in json.load(file)]
 
                 # ############## TODO:will be deleted (for Elif's re-annotation) ########
                 #data_elif = json.load(file)
@@ -31,168 +39,114 @@ class Helper:
                 #for i in range(len(results["Elif2"])):
                     #for idx, task in enumerate(data_elif):
                         #if results["Elif2"][i] == task["data"]["ID"]:
-                            #config.DATA.append(task)
+                            #data.append(task)
                 # ####################################################################
 
                 print("Data is loaded successfully.")
                 if config.DEBUG:
-                    print(f"Number of tasks in the input file: {len(config.DATA)}")
+                    print(f"Number of tasks in the input file: {len(data)}")
+                return data
         except Exception as e:
             raise Exception(f"An unexpected error occurred: {e}") from e
     
-    # validating the loaded data
+    # validating the data (single pass over the tasks, see DataValidator)
+    # tasks can be given as any iterable (e.g. the list returned by load_data or a stream of tasks)
+    # if report_path is given, a machine-readable report with the offending ids is written to that file
     @staticmethod
-    def validate_data():
+    def validate_data(report_path, tasks):
         print("Data validation started...")
 
-        # data validation - all spans should be assigned to an error type listed in ErrorTag class
-        values = [tag.value for tag in ErrorTag]
-        not_assigned_tag_counter = 0
-        for idx, task in enumerate(config.DATA):
-            for result in task["annotations"][0]["result"]:
-                if result["type"] == "labels":
-                    if result["value"]["labels"][0] not in values:
-                        not_assigned_tag_counter += 1
-                        #print(f"DATA_ID: {task["data"]["ID"]}; LABEL: {result["value"]["labels"]}; TEXT: {result["value"]["text"]}; ERROR_ID: {result["id"]}")
-        if not_assigned_tag_counter == 0:
-            print("Passed. All spans were assigned to valid error types.")
-        else:
-            print(f"Failed. There are {not_assigned_tag_counter} spans which were not assigned to valid error types.")
-
-        # data validation - the list of annotations for a task should contain only one element
-        multi_element_counter = 0
-        for task in config.DATA:
-            if len(task["annotations"]) > 1:
-                multi_element_counter += 1
-        if multi_element_counter == 0:
-            print("Passed. List of annotations has only one element in each task.")
-        else:
-            print(f"Failed. There are {multi_element_counter} tasks having more than one element in the list of annotations.")
-        
-        # data validation - the list of labels for each "labels" type result of a task should contain only one element
-        multi_element_counter = 0
-        for task in config.DATA:
-            for result in task["annotations"][0]["result"]:
-                if result["type"] == "labels" and len(result["value"]["labels"]) > 1:
-                    multi_element_counter += 1
-        if multi_element_counter == 0:
-            print("Passed. List of labels has only one element in each labels-type result in each task.")
-        else:
-            print(f"Failed. There are {multi_element_counter} result object having more than one element in the list of labels.")
-        
-        # data validation - the list of text for each "textarea" type result of a task should contain only one element
-        multi_element_counter = 0
-        for task in config.DATA:
-            for result in task["annotations"][0]["result"]:
-                if result["type"] == "textarea" and len(result["value"]["text"]) > 1:
-                    multi_element_counter += 1
-        if multi_element_counter == 0:
-            print("Passed. List of text has only one element in each textarea-type result in each task.")
-        else:
-            print(f"Failed. There are {multi_element_counter} result object having more than one element in the list of text.")
-        
-        # data validation - equal number of labels and textarea type should exist
-        isEqual = True
-        for task in config.DATA:
-            labelsCounter = 0
-            textareaCounter = 0
-            for result in task["annotations"][0]["result"]:
-                if result["type"] == "labels":
-                    labelsCounter += 1
-                if result['type'] == "textarea":
-                    textareaCounter += 1
-            if labelsCounter != textareaCounter:
-                isEqual = False
-                break
-        if isEqual:
-            print("Passed. Equal number of labels and textarea type exists.")
-        else:
-            print("Failed. Different number of labels and textarea type exists.")
-        
-        # data validation - cross overlapping span detection
-        cross_span_counter = 0
-        for idx, task in enumerate(config.DATA):
-            errors_sorted = sorted(config.DATA[idx]["annotations"][0]["result"], key = lambda e: (e["value"]["start"], -e["value"]["end"]))
-            
-            errors_filtered_by_type = list(filter(lambda x: x["type"] == "labels", errors_sorted))
+        validator = DataValidator()
+        for task in tasks:
+            validator.add_task(task)
+        validator.print_summary()
 
-            seen = set()
-            errors_filtered_by_same_span = []
-            for x in errors_filtered_by_type:
-                key = (x['value']['start'], x['value']['end'])
-                if key not in seen:
-                    seen.add(key)
-                    errors_filtered_by_same_span.append(x)
+        if report_path is not None:
+            with open(report_path, "w", encoding="utf-8") as f:
+                json.dump(validator.report(), f, ensure_ascii=False, indent=4)
 
-            for current in errors_filtered_by_same_span:
-                cur_start = current['value']['start']
-                cur_end = current['value']['end']
-                for item in errors_filtered_by_same_span:
-                    if item["value"]["start"] < cur_end and item["value"]["start"] > cur_start and item["value"]["end"] > cur_end:
-                        cross_span_counter += 1
-                        #print(f"DATA_ID: {task["data"]["ID"]};# ERROR_ID: {item['id']};# ERROR_TYPE: {Helper.get_error_type(idx, item['id'])};# TEXT1: {item['value']['text']};# TEXT2: {current['value']['text']}")          
-        
-        if cross_span_counter == 0:
-            print("Passed. Cross-overlap spans not found.")
-        else:
-            print(f"Failed. Cross-overlap spans found.")
+        return validator.passed()
+    
+    # loading metadata information for all tasks, returns data ID -> (id, nationality, gender, topic)
+    @staticmethod
+    def load_metadata(cache_dir=None):
+        rows = Helper.load_resource("metadata", config.METADATA_FILE, Helper.compile_metadata, cache_dir)
+        return {row[0]: tuple(row) for row in rows}
 
-        # data validation - same spans with different labels should have the same corrected text
-        same_span_multi_correction_counter = 0
-        for idx, task in enumerate(config.DATA):
-            for result in task["annotations"][0]["result"]:
-                if result["type"] == "labels":
-                    startIdx = result["value"]["start"]
-                    endIdx = result["value"]["end"]
-                    id = result["id"]
-                    corrected = Helper.get_corrected_text(idx, id)
-                    err_type = result["value"]["labels"][0]
-                    dataId = task["data"]["ID"]
-                    text = result["value"]["text"]
-                    for item in task["annotations"][0]["result"]:
-                        if item["type"] == "labels":
-                            err_type2 = item["value"]["labels"][0]
-                        corr2 = item["value"]["text"][0]
-                        if item["type"] == "textarea" and item["id"] != id and item["value"]["start"] == startIdx and item["value"]["end"] == endIdx and corr2 != corrected:
-                            same_span_multi_correction_counter += 1
-                            #if (err_type != "GEREKSİZ" and err_type2 != "GEREKSİZ"): # TODO: will be deleted!!!
-                            #print(f"ID: {dataId}, Text: {text}, Corrected: {corrected}, Corrected2: {corr2}, ErrType: {err_type}, ErrType2: {err_type2}")
+    # loading abbreviations defined by TDK from the abbr_list_tr.xlsx file, returns the set of abbreviations (casefolded, see turkish_casefold)
+    @staticmethod
+    def load_abbreviations_tdk(cache_dir=None):
+        return frozenset(Helper.load_resource("abbreviations_tdk", config.ABBREVIATIONS_TDK_FILE, Helper.compile_abbreviations_tdk, cache_dir))
 
-        if same_span_multi_correction_counter == 0:
-            print("Passed. Same spans with different labels have the same corrected text.")
-        else:
-            print(f"Failed. Same spans with different labels ({same_span_multi_correction_counter}) should be corrected with the same text.")
+    # loading the predefined tagset mapping schema, returns error tag -> facet -> list of allowed values (see compile_mapping_schema)
+    @staticmethod
+    def load_mapping_schema(cache_dir=None):
+        return Helper.load_resource("mapping_schema", config.MAPPING_SCHEMA_FILE, Helper.compile_mapping_schema, cache_dir)
 
-        if not_assigned_tag_counter != 0 or multi_element_counter != 0 or isEqual == False or cross_span_counter != 0 or same_span_multi_correction_counter != 0:
-            return False
-        return True
-    
-    # loading metadata information for all tasks
+    # compiled data of a resource spreadsheet (compiled again only if the source changed, see ResourceCache)
     @staticmethod
-    def load_metadata():
+    def load_resource(name, source_path, compile_source, cache_dir=None):
+        cache_dir = cache_dir if cache_dir is not None else config.RESOURCE_CACHE_DIR
         try:
-            df = pd.read_excel("./input/metadata.xlsx", sheet_name="raw")
-            for row in df.values.tolist():
-                config.METADATA.append((row[0], str(row[1]).lower(), str(row[2]).lower(), str(row[3]).lower())) # id, nationality, gender, topic
+            if cache_dir is None:
+                return compile_source(source_path)
+            return ResourceCache(cache_dir).load(name, source_path, compile_source)
         except Exception as e:
             raise Exception(f"An unexpected error occurred: {e}") from e
 
-    # loading abbreviations defined by TDK from the abbr_list_tr.xlsx file
+    # reading the metadata spreadsheet (sheet "raw"), returns [id, nationality, gender, topic] rows (first row of an id wins)
     @staticmethod
-    def load_abbreviations_tdk():
-        try:
-            df = pd.read_excel("./res/abbr_list_tr.xlsx")
-            for row in df.values.tolist():
-                config.ABBREVIATIONS_TDK.append(str(row[0]).lower())
-        except Exception as e:
-            raise Exception(f"An unexpected error occurred: {e}") from e
+    def compile_metadata(path):
+        import pandas as pd # imported on first use (slow import, only needed to compile the spreadsheets)
+        df = pd.read_excel(path, sheet_name="raw")
+        metadata = {}
+        for row in df.values.tolist():
+            metadata.setdefault(row[0], [row[0], str(row[1]).lower(), str(row[2]).lower(), str(row[3]).lower()]) # id, nationality, gender, topic
+        return list(metadata.values())
+
+    # reading the mapping schema spreadsheet: one block of rows per error tag, the first row has the number and the ID of the tag ("NO\n(PUN)"),
+    # the following rows list further allowed values; facets: upos, uif, ulf (morphosyntactic features), unit, phenomenon, level
+    # values are kept as in the schema ("-": no value, "<UPOS>"/"<UIF>"/"<ULF>": taken from the analysis)
+    @staticmethod
+    def compile_mapping_schema(path):
+        import pandas as pd
+        rows = pd.read_excel(path, header=None).fillna("").astype(str).values.tolist()
+        # columns are located by the two header rows ("ERROR ID", "UNIT", ... and "UPOS", "UIF", "ULF" below "MF")
+        header = next(i for i, row in enumerate(rows) if "ERROR ID" in [cell.strip() for cell in row])
+        columns = {}
+        for row in rows[header:header + 2]:
+            for col, cell in enumerate(row):
+                name = cell.strip().lower()
+                if name in ["error id", "upos", "uif", "ulf", "unit", "phenomenon", "level"]:
+                    columns[name] = col
+
+        schema = {}
+        tag = None
+        for row in rows[header + 2:]:
+            if row[columns["error id"]].strip() != "":
+                tag = row[columns["error id"]].split("\n")[0].strip()
+                schema[tag] = {facet: [] for facet in ["upos", "uif", "ulf", "unit", "phenomenon", "level"]}
+            if tag is None:
+                continue
+            for facet, values in schema[tag].items():
+                value = row[columns[facet]].strip()
+                if value != "" and value not in values:
+                    values.append(value)
+        return schema
+
+    # reading the abbreviation spreadsheet, returns the sorted list of casefolded abbreviations
+    @staticmethod
+    def compile_abbreviations_tdk(path):
+        import pandas as pd
+        df = pd.read_excel(path)
+        return sorted(set(turkish_casefold(str(row[0])) for row in df.values.tolist()))
     
-    # setting up UDPipe2 REST API call
+    # setting up UDPipe2 REST API call (service: base URL of the service, model: name of the model; defaults are taken from config)
     @staticmethod
-    def setup_udpipe2_call():
-        url = f"{config.UDPIPE2_SERVICE}/process"
+    def setup_udpipe2_call(service=None, model=None):
+        url = f"{service if service is not None else config.UDPIPE2_SERVICE}/process"
         payload = {"data": "", # filled when iterating through tasks
-                "model": config.UDPIPE2_MODEL, # latest Turkish model (turkish-boun-ud-2.15-241121)
+                "model": model if model is not None else config.UDPIPE2_MODEL, # latest Turkish model (turkish-boun-ud-2.15-241121)
                 "tokenizer": "ranges", # used to get token indices
                 "input": "horizontal", # input format
                 "tagger": "", # model's default
@@ -200,81 +154,83 @@ class Helper:
                 "output": "conllu" # output format
                 }
         return url, payload
+
+    # setting up the persistent cache for UDPipe2 responses (re-runs over the same texts do not call the service again)
+    # returns the cache instance, None if caching is disabled
+    @staticmethod
+    def setup_udpipe2_cache(cache_dir=None):
+        cache_dir = cache_dir if cache_dir is not None else config.UDPIPE2_CACHE_DIR
+        if cache_dir is None:
+            return None
+        return UDPipeCache(cache_dir, config.UDPIPE2_CACHE_MAX_BYTES, config.UDPIPE2_CACHE_MEMORY_ITEMS)
     
     # reconstructing the task data by using corrected forms written by annotators
+    # returns the reconstructed task data, the number of annotations and the span map of the task (used to find new indices of errors in corrected text)
+    # single sweep over the corrections sorted by span: the annotated spans never cross each other (see TaskValidator), so a span is either
+    # replaced or nested in one of the last two replaced spans, and the text is joined once from the unchanged segments and the corrected forms
     @staticmethod
-    def get_reconstructed_task_data(idx):
-        # clear the lookuup list before filling it for the current task
-        config.MAP_LOOKUP.clear()
-
-        # sorting errors occured in the task according to the start (asc) and end (desc) index of the error
-        errors_sorted = sorted(config.DATA[idx]["annotations"][0]["result"], key = lambda e: (e["value"]["start"], -e["value"]["end"]))
-
+    def get_reconstructed_task_data(task):
         # only textarea type records are enough to process which contains corrected form
-        errors_filtered_by_type = list(filter(lambda x: x["type"] == "textarea", errors_sorted))
+        # sorting them according to the start (asc) and end (desc) index of the error
+        corrections = sorted((x for x in task["annotations"][0]["result"] if x["type"] == "textarea"), key = lambda e: (e["value"]["start"], -e["value"]["end"]))
         if config.DEBUG:
-            print(f"Number of annotations: {len(errors_filtered_by_type)}")
-
-        # for the errors which have the same start and end indices, it is enough to process only one of them becuase annotators wrote the resultant correct form for the same span
-        seen = set()
-        errors_filtered_by_same_span = []
-        for x in errors_filtered_by_type:
-            key = (x['value']['start'], x['value']['end'])
-            if key not in seen:
-                seen.add(key)
-                errors_filtered_by_same_span.append(x)
-            else:
-                # to track how indices change after each correction, format -> (id, start_idx, end_idx, unused, unused)
-                config.MAP_LOOKUP.append((x["id"], x["value"]["start"], x["value"]["end"], -1, -1))
-        
-        # if there are overlapping errors, wider span will be processed, others are removed
-        errors_filtered_by_overlapping_span = []
-        for current in errors_filtered_by_same_span:
-            cur_start = current['value']['start']
-            cur_end = current['value']['end']
-
-            # check if current is contained within any already-kept error
-            is_contained = False
-            overlapped_result_id = -1
-            for kept in errors_filtered_by_overlapping_span:
-                kept_start = kept['value']['start']
-                kept_end = kept['value']['end']
-
-                if kept_start <= cur_start and cur_end <= kept_end:
-                    is_contained = True
-                    overlapped_result_id = kept["id"]
-                    break
-
-            if not is_contained:
-                errors_filtered_by_overlapping_span.append(current)
-            else:
-                # to track how indices change after each correction, format -> (id, start_idx, end_idx, overlapped_result_id, flag="overlap")
-                config.MAP_LOOKUP.append((current["id"], current['value']['start'], current["value"]["end"], overlapped_result_id, "overlap"))
-        
-        # reconstruct the task data by using corrected forms written by annotators
-        task_data = config.DATA[idx]["data"]["DATA"]
-        offset = 0
-        for error in errors_filtered_by_overlapping_span:
-            start = error["value"]["start"] + offset
-            end = error["value"]["end"] + offset
-
-            task_data = task_data[:start] + error["value"]["text"][0] + task_data[end:]
-            offset += len(error["value"]["text"][0]) - (error["value"]["end"] - error["value"]["start"])
+            print(f"Number of annotations: {len(corrections)}")
 
-            # to track how indices change after each correction, format -> (id, start_idx, end_idx, new_start_idx, new_end_idx)
-            config.MAP_LOOKUP.append((error["id"], error["value"]["start"], error["value"]["end"], len(task_data[:start]), len(task_data[:start]) + len(error["value"]["text"][0])))
+        task_data = task["data"]["DATA"]
+        cover = {} # result id -> (start_idx, end_idx, overlap flag) of the replaced span covering the error
+        cover_by_span = {} # (start_idx, end_idx) -> cover of the span
+        kept = [] # replaced spans (start_idx, end_idx), not nested in each other
+        edits = [] # replaced spans with their indices in the reconstructed text (start_idx, end_idx, new_start_idx, new_end_idx)
+        segments = [] # unchanged segments of the task data and corrected forms, in order
+        prev_end = 0 # end of the last replaced span in the task data
+        length = 0 # length of the reconstructed text so far
+        for x in corrections:
+            start = x["value"]["start"]
+            end = x["value"]["end"]
 
-        config.MAP_LOOKUP = sorted(config.MAP_LOOKUP, key=lambda e: (e[1]))
+            # for the errors which have the same start and end indices, it is enough to process only one of them becuase annotators wrote the resultant correct form for the same span
+            span_cover = cover_by_span.get((start, end))
+            if span_cover is None:
+                # if there are overlapping errors, wider span will be processed, others are covered by it
+                # important: always the same biggest span is refered for nested overlapping spans
+                parent = next((k for k in kept[-2:] if k[0] <= start and end <= k[1]), None)
+                if parent is not None:
+                    span_cover = (parent[0], parent[1], True)
+                else:
+                    text = x["value"]["text"][0]
+                    segments.append(task_data[prev_end:start])
+                    segments.append(text)
+                    new_start = length + (start - prev_end)
+                    length = new_start + len(text)
+                    edits.append((start, end, new_start, length))
+                    kept.append((start, end))
+                    prev_end = end
+                    span_cover = (start, end, False)
+                cover_by_span[(start, end)] = span_cover
+            cover.setdefault(x["id"], span_cover)
+        segments.append(task_data[prev_end:])
 
-        return task_data, len(errors_filtered_by_type) # reconstructed task data and number of annotations in the task
+        return "".join(segments), len(corrections), SpanMap(OffsetMap(edits), cover) # reconstructed task data, number of annotations in the task and span map
     
     # calling UDPipe2 REST API and getting analysis result with conllu format
     @staticmethod
-    def call_udpipe_service(reconstructed_task_data, url, payload):
+    def call_udpipe_service(reconstructed_task_data, url, payload, cache=None, transport=None):
+        # serving the response from the cache if the same text was analyzed before with the same model and options
+        if cache is not None:
+            cache_key = UDPipeCache.make_key(payload, reconstructed_task_data)
+            cached = cache.get(cache_key)
+            if cached is not None:
+                return cached
+
+        import requests # imported on first use (not needed if all responses are cached or another analyzer is used)
+        # pooled connections, retries and adaptive timeouts are handled by the transport (owned by the caller, e.g. the Pipeline)
+        # without one, a temporary transport is created for this call and closed afterwards
+        own_transport = transport is None
+        if own_transport:
+            transport = UDPipeTransport()
         try:
             payload["data"] = reconstructed_task_data
-            response = requests.post(url, data=payload, timeout=(25, 60))
-            response.raise_for_status()
+            response = transport.post(url, payload)
             res = response.json()
             
             # UDPipe service sometimes returns error/message instead of result
@@ -282,6 +238,8 @@ class Helper:
                 srv_msg = res.get("error") or res.get("message") or "Missing 'result' in UDPipe response."
                 raise RuntimeError(f"UDPipe service error: {srv_msg}")
             
+            if cache is not None:
+                cache.put(cache_key, res["result"])
             return res["result"]
         
         except requests.exceptions.Timeout as e:
@@ -294,61 +252,98 @@ class Helper:
         except requests.exceptions.RequestException as e:
             # catches connection errors, too many redirects, etc.
             raise RuntimeError(f"UDPipe request failed: {e}") from e
+        finally:
+            if own_transport:
+                transport.close()
         
-    # getting corrected text for a span
+    # calling UDPipe2 REST API once for several texts (texts are joined into a single payload and the result is split back)
+    # returns a list of results in the order of the input texts
     @staticmethod
-    def get_corrected_text(idx, result_id):
-        for res in config.DATA[idx]["annotations"][0]["result"]:
-            if res["id"] == result_id and res["type"] == "textarea":
-                return res["value"]["text"][0]
+    def call_udpipe_service_batch(texts, url, payload, cache=None, transport=None):
+        if len(texts) == 1:
+            return [Helper.call_udpipe_service(texts[0], url, payload, cache, transport)]
 
-    # getting conllu lines for a given span
-    @staticmethod
-    def get_conllu_lines_for_span(conllu_text, start_idx, end_idx):
-        sentence = ""
-        line_list = []
-        st_idx = 0
-        ed_idx = 0
-        multi_token_flag = False
-        #print(conllu_text)
-        for line in conllu_text.splitlines():
-            
-            if line.startswith("# text = "):
-                sentence = line[len("# text = "):]
-                continue
+        batch_text, offsets = UDPipeBatch.join(texts)
+        res_batch = Helper.call_udpipe_service(batch_text, url, payload, None, transport) # joined texts are not cached, single texts are
+        try:
+            results = UDPipeBatch.split(res_batch, offsets)
+        except ValueError as e:
+            # falling back to one request per text if the result cannot be split safely
+            if config.DEBUG:
+                print(f"Batch result could not be split ({e}). Falling back to single requests...")
+            return [Helper.call_udpipe_service(text, url, payload, cache, transport) for text in texts]
 
-            cols = line.split("\t")
-            if len(cols) != 10:
-                continue
-            
-            # according to conllu format
-            token_id = cols[0]
-            misc = cols[9] # to process TokenRange attribute
+        if cache is not None:
+            for text, result in zip(texts, results):
+                cache.put(UDPipeCache.make_key(payload, text), result)
+        return results
+
+    # calling UDPipe2 REST API for several texts with at most max_workers requests in flight
+    # if batch_max_bytes > 0, texts which are not in the cache are packed into requests of at most batch_max_bytes
+    # results are yielded in the order of the input texts; a failed call yields its exception instead of a result
+    @staticmethod
+    def call_udpipe_service_concurrent(texts, url, payload, max_workers, batch_max_bytes=0, cache=None, transport=None):
+        # every job gets its own payload (it is modified by call_udpipe_service)
+        def call(job):
+            try:
+                return Helper.call_udpipe_service_batch([texts[i] for i in job], url, dict(payload), cache, transport)
+            except Exception as e:
+                return [e] * len(job)
 
-            if multi_token_flag:
-                if int(token_id) <= ed_idx:
-                    line_list.append(line)
-                    if int(token_id) == ed_idx:
-                        multi_token_flag = False
+        # jobs are lists of text indices; cached texts are served without being sent in a batch
+        results = {}
+        if batch_max_bytes > 0:
+            missing = []
+            for i, text in enumerate(texts):
+                cached = cache.get(UDPipeCache.make_key(payload, text)) if cache is not None else None
+                if cached is not None:
+                    results[i] = cached
                 else:
-                    multi_token_flag = False
+                    missing.append(i)
+            jobs = [[missing[j] for j in batch] for batch in UDPipeBatch.pack([texts[i] for i in missing], batch_max_bytes)]
+        else:
+            jobs = [[i] for i in range(len(texts))]
 
-            for part in misc.split("|"):
-                if part.startswith("TokenRange="):
-                    start = int((part.split("=", 1)[1].strip()).split(":", 1)[0].strip())
-                    end = int((part.split("=", 1)[1].strip()).split(":", 1)[1].strip())
+        # without a transport of the caller, one transport is shared by all requests of this call and closed afterwards
+        own_transport = transport is None
+        if own_transport:
+            transport = UDPipeTransport(pool_size=max(max_workers, 1))
 
-                    if start_idx <= start and end_idx >= end:
-                        line_list.append(line)
+        if max_workers <= 1:
+            job_results = map(call, jobs)
+        else:
+            executor = ThreadPoolExecutor(max_workers=max_workers)
+            job_results = executor.map(call, jobs)
 
-                        if "-" in token_id:
-                            multi_token_flag = True
-                            st_idx, ed_idx = token_id.split("-")
-                            st_idx = int(st_idx)
-                            ed_idx = int(ed_idx)
-                            #print(st_idx, "---", ed_idx)
-                    break
-        return line_list, sentence
+        try:
+            jobs_iter = zip(jobs, job_results)
+            for i in range(len(texts)):
+                # consuming finished jobs until the result of the current text is available
+                while i not in results:
+                    job, job_result = next(jobs_iter)
+                    results.update(zip(job, job_result))
+                yield results.pop(i)
+        finally:
+            if max_workers > 1:
+                executor.shutdown(cancel_futures=True)
+            if own_transport:
+                transport.close()
+
+    # getting corrected text for a span
+    @staticmethod
+    def get_corrected_text(task, result_id):
+        for res in task["annotations"][0]["result"]:
+            if res["id"] == result_id and res["type"] == "textarea":
+                return res["value"]["text"][0]
+
+    # getting conllu lines for a given span, returns the lines and the text of the last sentence of the analysis
+    # by default only tokens lying completely within the span are returned, overlapping=True returns all tokens touching the span
+    # (kept for callers working on raw CoNLL-U; the mappers query a TokenTable parsed once per task)
+    @staticmethod
+    def get_conllu_lines_for_span(conllu_text, start_idx, end_idx, overlapping=False):
+        table = TokenTable(conllu_text)
+        lines = TokenTable.row_lines(conllu_text)
+        return [lines[row] for row in table.span_rows(start_idx, end_idx, overlapping)], table.last_sentence
 
     # finds and returns all punctiation marks in the input text as a list 
     @staticmethod
@@ -1,17 +1,14 @@
 import argparse
+import glob
+import os
 import sys
 import config
-from model.error import Error
-from helper import Helper
-from model.taxonomy import Taxonomy
-from model.pos import POS
-from model.inflectional_feature import InfFeat
-from model.lexical_feature import LexFeat
-from model.unit import Unit
-from model.level import Level
-from model.phenomenon import Phenomenon
-from model.metadata import Metadata
-import json
+from pipeline import Pipeline
+from analyzers import Analyzer
+from task_manifest import TaskManifest
+from profiler import Profiler
+from sinks import OutputSink
+from token_counts import TokenCounts
 
 """
 CONLLU format fields:
@@ -27,153 +24,69 @@ DEPS → Enhanced dependencies (may contain multiple head:relation pairs).
 MISC → Miscellaneous info (e.g., spaces, alignment).
 """
 
-def run(path):
-    # loading input file (Label Studio's json output/export file)
-    Helper.load_data(path)
+# running the extender over an export file, returns the list of all enriched errors (see Pipeline.iter_errors)
+def run(path, cache_dir=None, workers=None, batch_max_bytes=None, hedge=None, validation_report=None, processes=None):
+    with Pipeline(cache_dir, workers=workers, batch_max_bytes=batch_max_bytes, hedge=hedge, processes=processes) as pipeline:
+        return pipeline.run(path, validation_report)
 
-    # validating the loaded data (same spans with multiple corrections, cross-overlapping spans, validity of error tags, etc.)
-    res_validation = Helper.validate_data()
-    if not res_validation:
-        print("Data validation failed. Please check the issues above and fix them before running the extender.")
-        return []
-    
-    # loading metadata information for all tasks
-    Helper.load_metadata()
 
-    # loading TDK's abbreviation list into globals.abbr_list_TR to be used in Unit detection for error type "NO"/"PUNCTUATION"
-    Helper.load_abbreviations_tdk()
+# streaming version of run: enriched errors are yielded as soon as they are produced
+def iter_errors(path, cache_dir=None, workers=None, batch_max_bytes=None, hedge=None, validation_report=None, processes=None):
+    with Pipeline(cache_dir, workers=workers, batch_max_bytes=batch_max_bytes, hedge=hedge, processes=processes) as pipeline:
+        yield from pipeline.iter_errors(path, validation_report)
 
-    # setting up UDPipe2 REST API call (data of returned payload is empty, it will be loaded later)
-    url, payload = Helper.setup_udpipe2_call()
 
-    # main loop through tasks
-    print("\nProcessing tasks...")
-    errors = []
-    for idx, task in enumerate(config.DATA):
-        if config.DEBUG:
-            print("\n################################################")
-            print(f"Task: {idx} --- ID: {task['id']} --- DATA_ID: {task['data']['ID']}")
-        
-        # task reconstruction
-        reconstructed_task_data, no_of_annotations = Helper.get_reconstructed_task_data(idx)
-        
-        # skip processing the task if lookup table is not matching with the number of annotations
-        if no_of_annotations != len(config.MAP_LOOKUP):
-            print(f"Number of annotations ({no_of_annotations}) and number of records in MAP_LOOKUP ({len(config.MAP_LOOKUP)}) not matched. Skip processing the task...")
-            continue
-        
-        # UDPipe2 REST API call
-        try:
-            res_service = Helper.call_udpipe_service(reconstructed_task_data, url, payload)
-            #print(res_service)
-        except Exception as e:
-            print(f"Error occurred while calling UDPipe2 service: {e}")
-            continue
-        
-        # inner loop through results of a task
-        for result in task["annotations"][0]["result"]: # annotators were informed that they should create only one "annotation" object in Label Studio (task["annotations"][0] usage is secured because of this assumption)
-            if result["type"] == "labels": # there are two types of results: "labels" (contains error type) and "textarea" (contains corrected form)
-                err = Error()
-                err.id = result["id"] # id of the result
-                err.idLabelStudio = task["id"] # id that Label Studio assigned to task (text)
-                err.idData = task["data"]["ID"] # id that is coming from the data itself (per text)
-                
-                # filling out metadata
-                res_meta = next((row for row in config.METADATA if row[0] == err.idData), None)
-                if res_meta != None:
-                    err.metadata = Metadata()
-                    err.metadata.id = res_meta[0] # task id
-                    err.metadata.nationality = res_meta[1]
-                    err.metadata.gender = res_meta[2]
-                    err.metadata.topic = res_meta[3]
-                
-                err.rawText = task["data"]["DATA"] # raw text of task
-                err.idxStartErr = result["value"]["start"] # index that the error starts
-                err.idxEndErr = result["value"]["end"] # index that the error ends
-                err.incorrText = result["value"]["text"] # incorrect text
-                err.errType = result["value"]["labels"][0] # type of the error (observational fact; Label Studio creates different result object for the same region which has multiple labels)
-                err.corrText = Helper.get_corrected_text(idx, result["id"]) # corrected text of the error span
-                
-                # taxonomy related features
-                err.errTax = Taxonomy()
-                
-                # variables for case analysis (normal, same-span, overlapping-span)
-                start_for_tokenrange = -1
-                end_for_tokenrange = -1
-                overlap_flag = False
-
-                # if corrected text is empty then pos, infFeat and lexFeat should be None
-                if err.corrText.strip() == "":
-                    err.errTax.pos = []
-                    err.errTax.infFeat = []
-                    err.errTax.lexFeat = []
-                    #print(f"--- Skipped Error {err.idData, err.errType} ---")
-                # if corrected text is not empty then pos, infFeat and lexFeat should be assigned
-                else:
-                    # finding the record in MAP_LOOKUP for current error id
-                    err_in_lookup = next((q for q in config.MAP_LOOKUP if q[0] == err.id), None)
-                    # same span case -> MAP_LOOKUP structure: (result_id, start_idx, end_idx, -1, -1)
-                    if err_in_lookup[3] == -1 and err_in_lookup[4] == -1:
-                        # finding record in MAP_LOOKUP for this span which is not -1 in its 3rd and 4th positions, it will be either normal or overlapped
-                        alt_err = next((r for r in config.MAP_LOOKUP if r[1] == err_in_lookup[1] and r[2] == err_in_lookup[2] and r[2] != -1 and r[3] != -1), None)
-                        if alt_err[4] == "overlap": # if it is overlap
-                            overlap_err = next((o for o in config.MAP_LOOKUP if o[0] == alt_err[3]), None)
-                            start_for_tokenrange = overlap_err[3]
-                            end_for_tokenrange = overlap_err[4]
-                            overlap_flag = True
-                        else: # if it is normal
-                            start_for_tokenrange = alt_err[3]
-                            end_for_tokenrange = alt_err[4]
-                    
-                    # overlapping span case  -> MAP_LOOKUP structure: (result_id, start_idx, end_idx, overlapping_err_result_id, "overlap")
-                    # important: always the same biggest span is refered for nested overlapping spans
-                    elif err_in_lookup[4] == "overlap":
-                        overlap_err = next((o for o in config.MAP_LOOKUP if o[0] == err_in_lookup[3]), None)
-                        start_for_tokenrange = overlap_err[3]
-                        end_for_tokenrange = overlap_err[4]
-                        overlap_flag = True
-
-                    # normal case -> MAP_LOOKUP structure: (result_id, start_idx, end_idx, start_idx_for_tokenrange, end_idx_for_tokenrange)
-                    else:
-                        start_for_tokenrange = err_in_lookup[3]
-                        end_for_tokenrange = err_in_lookup[4]
-                
-                # getting conllu lines from udpipe2 api call result which are related to the error (selected span)
-                line_list, sentence = Helper.get_conllu_lines_for_span(res_service, start_for_tokenrange, end_for_tokenrange)
-
-                err.errTax.id = err.id
-                err.errTax.pos = POS.mapPOS(err, line_list, overlap_flag)
-                err.errTax.infFeat = InfFeat.mapInfFeat(err, line_list, overlap_flag)
-                err.errTax.lexFeat = LexFeat.mapLexFeat(err, line_list, overlap_flag)
-                err.errTax.unit = Unit.mapUnit(err, line_list, overlap_flag, sentence)
-                err.errTax.phenomenon = Phenomenon.mapPhenomenon(err, line_list, overlap_flag)
-                err.errTax.level = Level.mapLevel(err)
-
-
-                #print("\n##########################")
-                #for item in line_list:
-                #    print(item)
-                #print(f"Error ID: {err.errTax.id}")
-                #print(f"Corrected Text: {err.corrText}")
-                #print(f"POS: {err.errTax.pos}")
-                #print(f"Inflectional Features: {err.errTax.infFeat}")
-                #print(f"Lexical Features: {err.errTax.lexFeat}")
-                #print(f"Unit: {err.errTax.unit.value}")
-                #print(f"Phenomenon: {err.errTax.phenomenon.value}")
-                #print(f"Level: {err.errTax.level.value}")
-                #print(f"Nationality: {err.metadata.nationality}")
-                #print(f"Gender: {err.metadata.gender}")
-                #print(f"Topic: {err.metadata.topic}")
-
-                errors.append(err)
-
-    return errors
+# running the extender over several export files in one invocation (see Pipeline.run_batch)
+def run_batch(paths, output_dir="./output", fmt="jsonl", flush_every=100, cache_dir=None, workers=None, batch_max_bytes=None, hedge=None, processes=None, incremental=False):
+    with Pipeline(cache_dir, workers=workers, batch_max_bytes=batch_max_bytes, hedge=hedge, processes=processes) as pipeline:
+        return pipeline.run_batch(paths, output_dir, fmt, flush_every, incremental)
+
+
+# expanding input arguments (files, directories and glob patterns) into the list of export files
+# directories contribute their *.json files, matches of a directory or a pattern are sorted, duplicates are dropped
+def expand_inputs(inputs):
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            paths.extend(sorted(glob.glob(os.path.join(item, "*.json"))))
+        elif glob.has_magic(item):
+            paths.extend(sorted(glob.glob(item)))
+        else:
+            paths.append(item)
+    return list(dict.fromkeys(paths))
 
 
 # run the extender with the following command: python src/main.py "/Users/tolgahanturker/Downloads/***.json"
+# several exports (files, directories or glob patterns) are processed in one batch run: python src/main.py "./input/*.json" --output-dir ./output
+# error statistics of the outputs: python src/main.py stats ./output (see stats.py)
 if __name__ == "__main__":
+    if len(sys.argv) > 1 and sys.argv[1] == "stats":
+        import stats # imported on use (numpy is not needed by the extender)
+        sys.exit(stats.main(sys.argv[2:], prog=f"{os.path.basename(sys.argv[0])} stats"))
+
     parser = argparse.ArgumentParser(description="Semi-automated Annotation Extender")
-    parser.add_argument("path", help="File path to the exported JSON annotations from Label Studio.")
+    parser.add_argument("paths", nargs="+", metavar="path", help="File path to the exported JSON annotations from Label Studio (several files, directories or glob patterns start a batch run).")
+    parser.add_argument("-o", "--output", default=None, help="Output file path (default: ./output/results_<input file name>.<format>).")
+    parser.add_argument("--output-dir", default="./output", help="Output directory of a batch run (results_<input file name>.<format> per input file and run_report.json).")
+    parser.add_argument("--format", choices=OutputSink.FORMATS, default="jsonl", help="Output format: compact JSON Lines (default), an indented JSON array, or columnar Parquet/Arrow IPC files (errors and per-token taxonomy rows, needs pyarrow).")
+    parser.add_argument("--flush-every", type=int, default=100, help="Number of records buffered before they are written to the output file.")
+    parser.add_argument("--analyzer", choices=Analyzer.NAMES, default=config.ANALYZER, help="Analyzer backend: UDPipe2 REST API (rest), in-process UDPipe model (local), REST API with recording (record) or recorded analyses only (replay).")
+    parser.add_argument("--udpipe-service", default=config.UDPIPE2_SERVICE, help="Base URL of the UDPipe2 REST API (e.g. a self-hosted server).")
+    parser.add_argument("--udpipe-model", default=config.UDPIPE2_MODEL, help="Model name used by the UDPipe2 REST API (and the key of recorded analyses).")
+    parser.add_argument("--local-model", default=config.UDPIPE_LOCAL_MODEL, help="UDPipe model file (*.udpipe) of the local analyzer (requires ufal.udpipe).")
+    parser.add_argument("--recordings-dir", default=config.UDPIPE2_RECORDINGS_DIR, help="Directory of the analyses recorded by the record analyzer and served by the replay analyzer.")
+    parser.add_argument("--cache-dir", default=config.UDPIPE2_CACHE_DIR, help="Directory of the persistent UDPipe response cache.")
+    parser.add_argument("--no-cache", action="store_true", help="Disable the UDPipe response cache.")
+    parser.add_argument("--workers", type=int, default=config.UDPIPE2_WORKERS, help="Maximum number of concurrent UDPipe requests (1 means sequential).")
+    parser.add_argument("--validation-report", default=None, help="Write a JSON report of the data validation (counters and offending ids) to this file.")
+    parser.add_argument("--hedge", action="store_true", default=config.UDPIPE2_HEDGE, help="Send a duplicate UDPipe request if a request is slower than the usual (p95) latency.")
+    parser.add_argument("--processes", type=int, default=config.MAPPING_PROCESSES, help="Number of worker processes mapping the errors to the taxonomy (1 means in the main process).")
+    parser.add_argument("--incremental", action="store_true", help="Keep a manifest next to the output and reprocess only the tasks changed since the previous run.")
+    parser.add_argument("--profile", nargs="?", const="./output/profile.json", default=None, metavar="REPORT", help="Profile the run (time per stage, facet mapper and error tag, analyzer latencies) and write a JSON report (default: ./output/profile.json).")
+    parser.add_argument("--profile-memory", action="store_true", help="Also track the peak traced memory per stage (tracemalloc, slows the run down).")
+    parser.add_argument("--profile-cprofile", type=lambda text: [item.strip() for item in text.split(",") if item.strip() != ""], default=[], metavar="STAGES",
+                        help=f"Write cProfile dumps (<stage>.prof next to the report) of these comma-separated stages ({', '.join(Profiler.STAGES)}).")
+    parser.add_argument("--batch-bytes", type=int, default=config.UDPIPE2_BATCH_MAX_BYTES, help="Pack several tasks into UDPipe requests of at most this many bytes (0 means one request per task).")
     
     if len(sys.argv) == 1:
         print("Missing required argument 'path'.\n", file=sys.stderr)
@@ -181,13 +94,58 @@ if __name__ == "__main__":
         sys.exit(1)
 
     args = parser.parse_args()
+    if (args.profile_memory or len(args.profile_cprofile) > 0) and args.profile is None:
+        parser.error("--profile-memory and --profile-cprofile apply to a profiled run (--profile)")
+    profiler = None
+    if args.profile is not None:
+        try:
+            profiler = Profiler(args.profile_memory, args.profile_cprofile, os.path.dirname(args.profile) or ".")
+        except ValueError as e:
+            parser.error(str(e))
+        profiler.start()
+
+    pipeline = Pipeline(args.cache_dir, use_cache=not args.no_cache, workers=args.workers, batch_max_bytes=args.batch_bytes, hedge=args.hedge, processes=args.processes,
+                        analyzer=args.analyzer, service=args.udpipe_service, model=args.udpipe_model, local_model=args.local_model, recordings_dir=args.recordings_dir,
+                        profiler=profiler)
+
+    # writing the profile report (before the analyzer is closed)
+    def save_profile():
+        if profiler is not None:
+            profiler.stop()
+            profiler.save(args.profile, pipeline.analyzer)
+            print(f"Profile report: {args.profile}")
+
+    # batch run: several files, a directory or a glob pattern
+    if len(args.paths) > 1 or os.path.isdir(args.paths[0]) or glob.has_magic(args.paths[0]):
+        if args.output is not None or args.validation_report is not None:
+            parser.error("--output and --validation-report apply to a single input file (a batch run writes to --output-dir)")
+        paths = expand_inputs(args.paths)
+        if len(paths) == 0:
+            parser.error(f"No export files found for {args.paths}")
+        if config.DEBUG:
+            print(f"Input File Paths: {paths}")
+        with pipeline:
+            pipeline.run_batch(paths, args.output_dir, args.format, args.flush_every, args.incremental)
+            save_profile()
+        sys.exit(0)
 
+    path = args.paths[0]
     if config.DEBUG:
-        print(f"Input File Path: {args.path}")
+        print(f"Input File Path: {path}")
     
-    enriched_errors = run(args.path)
+    # output file is chosen on the command line, default: ./output/results_<input file name>.<format>
+    output = args.output if args.output is not None else os.path.join("./output", f"results_{os.path.splitext(os.path.basename(path))[0]}.{args.format}")
+    if config.DEBUG:
+        print(f"Output File Path: {output}")
+
+    # manifest of the output for incremental re-runs
+    manifest = TaskManifest(TaskManifest.path_for(output), TaskManifest.current_fingerprint(pipeline.model_id())) if args.incremental else None
+
+    # token counts of the tasks are written next to the output (used by the stats command)
+    counts = TokenCounts(TokenCounts.path_for(output))
 
-    # optionally, save the enriched errors to a JSON file
-    errors_as_dicts = [e.to_dict() for e in enriched_errors]
-    with open("./output/results_elif.json", "w", encoding="utf-8") as f:
-        json.dump(errors_as_dicts, f, ensure_ascii=False, indent=4)
\ No newline at end of file
+    # enriched errors are written to the output sink as soon as they are produced
+    with pipeline, OutputSink.create(output, args.format, args.flush_every) as sink:
+        for record in pipeline.iter_records(path, args.validation_report, manifest, counts):
+            sink.write(record)
+        save_profile()
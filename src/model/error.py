@@ -1,6 +1,12 @@
 
+from sys import intern
+
 # Represents <Error> in the paper https://doi.org/10.1007/s10579-024-09794-0
+# slots instead of a __dict__ (there is one per annotated error), rawText and metadata are shared by the errors of a task
 class Error:
+
+    __slots__ = ("id", "idLabelStudio", "idData", "rawText", "idxStartErr", "idxEndErr", "incorrText", "_errType", "corrText", "errTax", "metadata")
+
     # constructor
     def __init__(self, id = "", idLabelStudio = 0, idData = 0, rawText = '', idxStartErr = 0, idxEndErr = 0, incorrText = '', errType = '', corrText = '', errTax = None, metadata = None):    
         self.id = id # id of the result
@@ -13,8 +19,17 @@ class Error:
         self.errType = errType # data[0]["annotations"][0]["result"][0]["value"]["labels"][0] -> type of the error (from an observational experience, it is known that Label Studio create different result object for the same region that has different label)
         self.corrText = corrText # data[0]["annotations"][0]["result"][1]["value"]["text"][0] -> corrected text, filled by Helper.get_corrected_text()
         self.errTax = errTax # for taxonomy mapping of the error
-        self.metadata = metadata # for metadata
-    
+        self.metadata = metadata # for metadata (one Metadata instance per task)
+
+    # error tags are interned (a few dozen values shared by all errors)
+    @property
+    def errType(self):
+        return self._errType
+
+    @errType.setter
+    def errType(self, errType):
+        self._errType = intern(errType) if type(errType) is str else errType
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -1,72 +1,74 @@
-from model.error_tag import ErrorTag
-from nltk.tokenize import wordpunct_tokenize
-
 # Represents <LexicalFeature> in the paper https://doi.org/10.1007/s10579-024-09794-0
+# the mapper of an error tag is chosen by the ULF column of the mapping schema (see RuleRegistry)
 class LexFeat():
 
     # from Universal Dependencies web platform https://universaldependencies.org/u/feat/index.html (accessed on 2025-09-13)
     LEXICAL_FEATURES = {"PronType", "NumType", "Poss", "Reflex"}
     OTHER_FEATURES = {"Abbr", "Typo", "Foreign", "ExtPos"}
+    SCHEMA_FEATURES = {"OTHER_TYPO": "Typo=Yes", "OTHER_ABBR": "Abbr=Yes"} # fixed features of the mapping schema
 
+    # mapper of a schema value: "-" (no features), "<ULF>" (lexical features of the analysis) or a fixed feature (e.g. "OTHER_TYPO")
     @staticmethod
-    def mapLexFeat(err, line_list, overlap_flag):
-        if err.errType in [ErrorTag.NO.value, ErrorTag.SI.value, ErrorTag.ÇA.value, ErrorTag.ZA.value, ErrorTag.KİP.value,
-                            ErrorTag.GÖ.value, ErrorTag.OL.value, ErrorTag.ŞA.value, ErrorTag.ÇF.value, ErrorTag.SE.value, 
-                            ErrorTag.KK.value, ErrorTag.GE.value, ErrorTag.ST.value, ErrorTag.TÜ.value, ErrorTag.AB.value, 
-                            ErrorTag.KEG.value, ErrorTag.KBF.value, ErrorTag.İB.value, ErrorTag.AnB.value, ErrorTag.ÜS.value, 
-                            ErrorTag.DİJ.value]:
-            return []
-        elif err.errType == ErrorTag.YA.value:
-            return [(err.corrText, "Typo=Yes")] # format: (FORM, FEATS)
-        elif err.errType == ErrorTag.KI.value:
-            return [(err.corrText, "Abbr=Yes")] # format: (FORM, FEATS)
-        else:
-            result = []
-            if overlap_flag:
-                tokens = wordpunct_tokenize(err.corrText)
+    def rule(value):
+        if value == "-":
+            return LexFeat.mapNone
+        if value == "<ULF>":
+            return LexFeat.mapAnalysis
+        if value in LexFeat.SCHEMA_FEATURES:
+            feats = LexFeat.SCHEMA_FEATURES[value]
+            return lambda err, token_list, overlap_flag, task_tokens: [(err.corrText, feats)] # format: (FORM, FEATS)
+        raise ValueError(f"Unknown ULF value in the mapping schema: {value}")
 
-                for token in tokens:
-                    st_idx = 0
-                    ed_idx = 0
-                    multi_token_flag = False
+    @staticmethod
+    def mapNone(err, token_list, overlap_flag, task_tokens):
+        return []
 
-                    for line in line_list:
-                        cols = line.split("\t")
+    # lexical features of the tokens of the corrected text
+    @staticmethod
+    def mapAnalysis(err, token_list, overlap_flag, task_tokens):
+        result = []
+        if overlap_flag:
+            tokens = task_tokens.words(err.corrText)
 
-                        # if the multi-token flag is on, then keep adding lines until the end index is reached
-                        if multi_token_flag:
-                            if int(cols[0]) <= ed_idx:
-                                # format: (FORM, FEATS)
-                                result.append((cols[1], cols[5]))
-                                if int(cols[0]) == ed_idx:
-                                    multi_token_flag = False
-                            else:
-                                multi_token_flag = False
+            for token in tokens:
+                st_idx = 0
+                ed_idx = 0
+                multi_token_flag = False
 
-                        if cols[1] == token:
+                for tok in token_list:
+
+                    # if the multi-token flag is on, then keep adding tokens until the end index is reached
+                    if multi_token_flag:
+                        if tok.first <= ed_idx:
                             # format: (FORM, FEATS)
-                            result.append((cols[1], cols[5]))
-                            
-                            # if it is multi-token, then keep start and end indices and switch the flag
-                            if "-" in cols[0]:
-                                multi_token_flag = True
-                                st_idx, ed_idx = cols[0].split("-")
-                                st_idx = int(st_idx)
-                                ed_idx = int(ed_idx)
-            else:
-                for line in line_list:
-                    cols = line.split("\t")
-                    # format: (FORM, FEATS)
-                    result.append((cols[1], cols[5]))
+                            result.append((tok.form, tok.feats))
+                            if tok.first == ed_idx:
+                                multi_token_flag = False
+                        else:
+                            multi_token_flag = False
+
+                    if tok.form == token:
+                        # format: (FORM, FEATS)
+                        result.append((tok.form, tok.feats))
+                        
+                        # if it is multi-token, then keep start and end indices and switch the flag
+                        if tok.last != tok.first:
+                            multi_token_flag = True
+                            st_idx = tok.first
+                            ed_idx = tok.last
+        else:
+            for tok in token_list:
+                # format: (FORM, FEATS)
+                result.append((tok.form, tok.feats))
 
-            # filtering only lexical features
-            res_filtered = []
-            for item in result:
-                feats = item[1].split("|")
-                res = ""
-                for feat in feats:
-                    if feat.startswith(tuple(LexFeat.LEXICAL_FEATURES)) or feat.startswith(tuple(LexFeat.OTHER_FEATURES)):
-                        res += feat + "|"
-                res_filtered.append((item[0], res[:-1])) # removing the last "|"
-            
-            return res_filtered
\ No newline at end of file
+        # filtering only lexical features
+        res_filtered = []
+        for item in result:
+            feats = item[1].split("|")
+            res = ""
+            for feat in feats:
+                if feat.startswith(tuple(LexFeat.LEXICAL_FEATURES)) or feat.startswith(tuple(LexFeat.OTHER_FEATURES)):
+                    res += feat + "|"
+            res_filtered.append((item[0], res[:-1])) # removing the last "|"
+        
+        return res_filtered
\ No newline at end of file
@@ -1,6 +1,10 @@
 
 # Represents <Taxonomy> in the paper https://doi.org/10.1007/s10579-024-09794-0
+# a single instance is shared by all errors of a task (see TaskMapper.map_task)
 class Metadata:
+
+    __slots__ = ("id", "nationality", "gender", "topic")
+
     # constructor
     def __init__(self, taskId=-1, nationality='', gender='', topic=''):
         self.id = taskId
@@ -2,10 +2,9 @@ from enum import Enum
 from helper import Helper
 from collections import Counter
 from model.error_tag import ErrorTag
-import nltk
-from nltk.tokenize import wordpunct_tokenize
 
 # Represents <Phenomenon> in the paper https://doi.org/10.1007/s10579-024-09794-0
+# an error tag with a single phenomenon in the mapping schema always gets that phenomenon, the other error tags are decided by their heuristics (see RuleRegistry)
 class Phenomenon(Enum):
     
     NONE = 'None'
@@ -16,368 +15,360 @@ class Phenomenon(Enum):
     UNTRANSLATED = 'Untranslated' # not used
     AMBIGUITY = 'Ambiguity'
 
+    # phenomenon of a value of the mapping schema ("-" means no phenomenon)
     @staticmethod
-    def mapPhenomenon(err, line_list, overlap_flag):
-        if err.errType in [ErrorTag.BH.value, ErrorTag.KI.value, ErrorTag.ÜzY.value, ErrorTag.ÜDü.value, ErrorTag.ÜU.value, 
-                            ErrorTag.ÜzB.value, ErrorTag.ÜDa.value, ErrorTag.ÜzT.value, ErrorTag.ZA.value, ErrorTag.GÖ.value,
-                            ErrorTag.ŞA.value, ErrorTag.ÇF.value, ErrorTag.ST.value, ErrorTag.AB.value, ErrorTag.İB.value,
-                            ErrorTag.ÜS.value]:
-            return Phenomenon.MISUSE
-        elif err.errType == ErrorTag.SI.value:
+    def fromSchema(value):
+        return Phenomenon.NONE if value == "-" else Phenomenon[value]
+
+    # heuristics of the error tags which may have several phenomena: error tag -> mapper(err, token_list, overlap_flag, original_table, task_tokens)
+    @staticmethod
+    def heuristics():
+        return {
+            ErrorTag.NO.value: Phenomenon.mapNO,
+            ErrorTag.YA.value: Phenomenon.mapYA,
+            ErrorTag.BA.value: Phenomenon.mapBA,
+            ErrorTag.Dİ.value: Phenomenon.mapDİ,
+            ErrorTag.KH.value: Phenomenon.mapKH,
+            ErrorTag.DU.value: Phenomenon.mapKH,
+            ErrorTag.KK.value: Phenomenon.mapKK,
+            ErrorTag.SA.value: Phenomenon.mapSA,
+            ErrorTag.SE.value: Phenomenon.mapSA,
+            ErrorTag.İY.value: Phenomenon.mapİY,
+            ErrorTag.ÇA.value: Phenomenon.mapÇA,
+            ErrorTag.KİP.value: Phenomenon.mapKİP,
+            ErrorTag.OL.value: Phenomenon.mapOL,
+            ErrorTag.TÜ.value: Phenomenon.mapTÜ,
+            ErrorTag.SH.value: Phenomenon.mapSH
+        }
+
+    @staticmethod
+    def mapNO(err, token_list, overlap_flag, original_table, task_tokens):
+        # heuristical approach:  using th change in the number of punctiation marks
+        # if lengths of pnct. marks lists are equal, then there are two options: 
+        #   1- at least one element which is different -> MISUSE
+        #   2- no different element -> MISORDERING
+        # if there are more punct. marks in corrected form than in the original form -> OMISSION
+        # if there are less punct. marks in corrected form than in the original form -> ADDITION
+        corrPunct = Helper.extract_punctuation_marks_TR(err.corrText) # list of all punct. marks in the corrected text
+        incorrPunct = Helper.extract_punctuation_marks_TR(err.incorrText) # list of all punct. marks in the original text
+        if len(corrPunct) == len(incorrPunct):
+            if len(set(corrPunct) - set(incorrPunct)) > 0:
+                return Phenomenon.MISUSE
+            else:
+                return Phenomenon.MISORDERING
+        elif len(corrPunct) > len(incorrPunct):
+            return Phenomenon.OMISSION
+        elif len(corrPunct) < len(incorrPunct):
+            return Phenomenon.ADDITION
+        else:
+            return Phenomenon.NONE
+
+    @staticmethod
+    def mapYA(err, token_list, overlap_flag, original_table, task_tokens):
+        # if frequency of each character for both texts are equal -> MISORDERING
+        # if length of the original text is greater than the corrected text -> ADDITION
+        # if length of the original text is smaller than the corrected text -> OMISSION
+        # otherwise -> MISUSE
+        if (dict(Counter(err.incorrText)) == dict(Counter(err.corrText))):
             return Phenomenon.MISORDERING
-        elif err.errType == ErrorTag.GE.value:
+        elif len(err.incorrText) > len(err.corrText):
             return Phenomenon.ADDITION
-        elif err.errType in [ErrorTag.KEG.value, ErrorTag.KBF.value]:
+        elif len(err.incorrText) < len(err.corrText):
             return Phenomenon.OMISSION
-        elif err.errType == ErrorTag.AnB.value:
-            return Phenomenon.AMBIGUITY
-        elif err.errType == ErrorTag.DİJ.value:
-            return Phenomenon.NONE
-        elif err.errType == ErrorTag.NO.value:
-            # heuristical approach:  using th change in the number of punctiation marks
-            # if lengths of pnct. marks lists are equal, then there are two options: 
-            #   1- at least one element which is different -> MISUSE
-            #   2- no different element -> MISORDERING
-            # if there are more punct. marks in corrected form than in the original form -> OMISSION
-            # if there are less punct. marks in corrected form than in the original form -> ADDITION
-            corrPunct = Helper.extract_punctuation_marks_TR(err.corrText) # list of all punct. marks in the corrected text
-            incorrPunct = Helper.extract_punctuation_marks_TR(err.incorrText) # list of all punct. marks in the original text
-            if len(corrPunct) == len(incorrPunct):
-                if len(set(corrPunct) - set(incorrPunct)) > 0:
-                    return Phenomenon.MISUSE
-                else:
-                    return Phenomenon.MISORDERING
-            elif len(corrPunct) > len(incorrPunct):
-                return Phenomenon.OMISSION
-            elif len(corrPunct) < len(incorrPunct):
-                return Phenomenon.ADDITION
+        else:
+            return Phenomenon.MISUSE
+
+    @staticmethod
+    def mapBA(err, token_list, overlap_flag, original_table, task_tokens):
+        # if unnecessary spaces are inserted within a single word -> ADDITION, else OMMISSION
+        if len(err.incorrText.split()) > 1:
+            return Phenomenon.ADDITION
+        else:
+            return Phenomenon.OMISSION
+
+    @staticmethod
+    def mapDİ(err, token_list, overlap_flag, original_table, task_tokens):
+        # set operations are used heuristically, it can be improved by different approaches (using character frequency dictionary, etc.)
+        diff_list = list(set(err.corrText) - set(err.incorrText))
+        diff_list2 = list(set(err.incorrText) - set(err.corrText))
+        add = 0
+        omm = 0
+        els = 0
+        for char in diff_list:
+            if char in ["İ", "Ü", "Ö", "Ğ", "Ş", "Ç", "i", "ü", "ö", "ğ", "ş", "ç", "j", "î", "Î", "â", "Â"]:
+                omm += 1
+            elif char in ["I", "U", "O", "G", "S", "C", "ı", "u", "o", "g", "s", "c", "J", "a", "A"]:
+                add += 1
             else:
-                return Phenomenon.NONE
-        elif err.errType == ErrorTag.YA.value:
-            # if frequency of each character for both texts are equal -> MISORDERING
-            # if length of the original text is greater than the corrected text -> ADDITION
-            # if length of the original text is smaller than the corrected text -> OMISSION
-            # otherwise -> MISUSE
-            if (dict(Counter(err.incorrText)) == dict(Counter(err.corrText))):
-                return Phenomenon.MISORDERING
-            elif len(err.incorrText) > len(err.corrText):
-                return Phenomenon.ADDITION
-            elif len(err.incorrText) < len(err.corrText):
-                return Phenomenon.OMISSION
+                els += 1
+        for char in diff_list2:
+            if char in ["İ", "Ü", "Ö", "Ğ", "Ş", "Ç", "i", "ü", "ö", "ğ", "ş", "ç", "j", "î", "Î", "â", "Â"]:
+                add += 1
+            elif char in ["I", "U", "O", "G", "S", "C", "ı", "u", "o", "g", "s", "c", "J", "a", "A"]:
+                omm += 1
             else:
-                return Phenomenon.MISUSE
-        elif err.errType == ErrorTag.BA.value:
-            # if unnecessary spaces are inserted within a single word -> ADDITION, else OMMISSION
-            if len(err.incorrText.split()) > 1:
-                return Phenomenon.ADDITION
+                els += 1
+        if add > 0 and omm > 0:
+            return Phenomenon.MISUSE
+        elif add > 0:
+            return Phenomenon.ADDITION
+        elif omm > 0:
+            return Phenomenon.OMISSION
+        else:
+            return Phenomenon.NONE
+
+    # also used for DU
+    @staticmethod
+    def mapKH(err, token_list, overlap_flag, original_table, task_tokens):
+        # incorrect text is assumed that it involves only one error
+        # compare err.incorrText and err.corrText
+        if len(err.incorrText) > len(err.corrText):
+            return Phenomenon.ADDITION
+        elif len(err.incorrText) < len(err.corrText):
+            return Phenomenon.OMISSION
+        elif len(err.incorrText) == len(err.corrText):
+            return Phenomenon.MISUSE
+
+    @staticmethod
+    def mapKK(err, token_list, overlap_flag, original_table, task_tokens):
+        if "ki" in err.incorrText.strip()[-2:].lower() or "kı" in err.incorrText.strip()[-2:].lower():
+            return Phenomenon.ADDITION
+
+        if len(err.incorrText) > len(err.corrText):
+            return Phenomenon.ADDITION
+        elif len(err.incorrText) < len(err.corrText):
+            return Phenomenon.OMISSION
+        else:
+            return Phenomenon.NONE
+
+    # also used for SE
+    @staticmethod
+    def mapSA(err, token_list, overlap_flag, original_table, task_tokens):
+        if len(err.incorrText) > len(err.corrText):
+            return Phenomenon.ADDITION
+        elif len(err.incorrText) < len(err.corrText):
+            return Phenomenon.OMISSION
+        else:
+            return Phenomenon.NONE
+
+    @staticmethod
+    def mapİY(err, token_list, overlap_flag, original_table, task_tokens):
+        # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
+        if len(err.incorrText.split()) > 1:
+            return Phenomenon.MISUSE
+        else:
+            # the erroneous span is looked up in the analysis of the original text (analyzed once per task, in sentence context)
+            token_list_incorrText = original_table.span(err.idxStartErr, err.idxEndErr, overlapping=True)
+            
+            isPsorExist = False
+            for tok in token_list_incorrText:
+                if "Person[psor]" in tok.feats:
+                    isPsorExist = True
+                    break
+                            
+            featList = []
+            if overlap_flag:
+                tokens = task_tokens.words(err.corrText)
+
+                for token in tokens:
+                    multi_token_flag = False
+
+                    for tok in token_list:
+                        
+                        # if the multi-token flag is on, then keep adding tokens until the end index is reached
+                        if multi_token_flag:
+                            featList.append(tok.feats)
+                            multi_token_flag = False
+
+                        if tok.form.lower() == token.lower():
+                            if tok.last != tok.first:
+                                multi_token_flag = True
+                            else:
+                                featList.append(tok.feats)
             else:
-                return Phenomenon.OMISSION
-        elif err.errType == ErrorTag.Dİ.value:
-            # set operations are used heuristically, it can be improved by different approaches (using character frequency dictionary, etc.)
-            diff_list = list(set(err.corrText) - set(err.incorrText))
-            diff_list2 = list(set(err.incorrText) - set(err.corrText))
-            add = 0
-            omm = 0
-            els = 0
-            for char in diff_list:
-                if char in ["İ", "Ü", "Ö", "Ğ", "Ş", "Ç", "i", "ü", "ö", "ğ", "ş", "ç", "j", "î", "Î", "â", "Â"]:
-                    omm += 1
-                elif char in ["I", "U", "O", "G", "S", "C", "ı", "u", "o", "g", "s", "c", "J", "a", "A"]:
-                    add += 1
-                else:
-                    els += 1
-            for char in diff_list2:
-                if char in ["İ", "Ü", "Ö", "Ğ", "Ş", "Ç", "i", "ü", "ö", "ğ", "ş", "ç", "j", "î", "Î", "â", "Â"]:
-                    add += 1
-                elif char in ["I", "U", "O", "G", "S", "C", "ı", "u", "o", "g", "s", "c", "J", "a", "A"]:
-                    omm += 1
-                else:
-                    els += 1
-            if add > 0 and omm > 0:
+                for tok in token_list:
+                    featList.append(tok.feats)
+
+            isPsorExistInCorrText = False
+            for item in featList:
+                if "Person[psor]" in item:
+                    isPsorExistInCorrText = True
+                    break
+
+            if (isPsorExist and isPsorExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
                 return Phenomenon.MISUSE
-            elif add > 0:
-                return Phenomenon.ADDITION
-            elif omm > 0:
-                return Phenomenon.OMISSION
-            else:
-                return Phenomenon.NONE
-        elif err.errType in [ErrorTag.KH.value, ErrorTag.DU.value]:
-            # incorrect text is assumed that it involves only one error
-            # compare err.incorrText and err.corrText
             if len(err.incorrText) > len(err.corrText):
                 return Phenomenon.ADDITION
             elif len(err.incorrText) < len(err.corrText):
                 return Phenomenon.OMISSION
-            elif len(err.incorrText) == len(err.corrText):
-                return Phenomenon.MISUSE
-        elif err.errType == ErrorTag.DU.value:
-            # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
-            if len(err.incorrText.split()) > 1:
-                return Phenomenon.MISUSE
-            else:
-                if len(err.incorrText) > len(err.corrText):
-                    return Phenomenon.ADDITION
-                elif len(err.incorrText) < len(err.corrText):
-                    return Phenomenon.OMISSION
-                else:
-                    return Phenomenon.MISUSE
-        elif err.errType == ErrorTag.KK.value:
-            if "ki" in err.incorrText.strip()[-2:].lower() or "kı" in err.incorrText.strip()[-2:].lower():
-                return Phenomenon.ADDITION
 
+    @staticmethod
+    def mapÇA(err, token_list, overlap_flag, original_table, task_tokens):
+        # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
+        if len(err.incorrText.split()) > 1:
+            return Phenomenon.MISUSE
+        else:
+            # the erroneous span is looked up in the analysis of the original text (analyzed once per task, in sentence context)
+            token_list_incorrText = original_table.span(err.idxStartErr, err.idxEndErr, overlapping=True)
+            
+            isVoiceExist = False
+            for tok in token_list_incorrText:
+                if "Voice" in tok.feats:
+                    isVoiceExist = True
+                    break
+            
+            featList = []
+            if overlap_flag:
+                tokens = task_tokens.words(err.corrText)
+
+                for token in tokens:
+                    multi_token_flag = False
+
+                    for tok in token_list:
+                        
+                        # if the multi-token flag is on, then keep adding tokens until the end index is reached
+                        if multi_token_flag:
+                            featList.append(tok.feats)
+                            multi_token_flag = False
+
+                        if tok.form.lower() == token.lower():
+                            if tok.last != tok.first:
+                                multi_token_flag = True
+                            else:
+                                featList.append(tok.feats)
+            else:
+                for tok in token_list:
+                    featList.append(tok.feats)
+            
+            isVoiceExistInCorrText = False
+            for item in featList:
+                if "Voice" in item:
+                    isVoiceExistInCorrText = True
+                    break
+            
+            if (isVoiceExist and isVoiceExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
+                return Phenomenon.MISUSE
             if len(err.incorrText) > len(err.corrText):
                 return Phenomenon.ADDITION
             elif len(err.incorrText) < len(err.corrText):
                 return Phenomenon.OMISSION
+
+    @staticmethod
+    def mapKİP(err, token_list, overlap_flag, original_table, task_tokens):
+        # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
+        if len(err.incorrText.split()) > 1:
+            return Phenomenon.MISUSE
+        else:
+            # the erroneous span is looked up in the analysis of the original text (analyzed once per task, in sentence context)
+            token_list_incorrText = original_table.span(err.idxStartErr, err.idxEndErr, overlapping=True)
+            
+            isMoodExist = False
+            for tok in token_list_incorrText:
+                if "Mood" in tok.feats:
+                    isMoodExist = True
+                    break
+            
+            featList = []
+            if overlap_flag:
+                tokens = task_tokens.words(err.corrText)
+
+                for token in tokens:
+                    multi_token_flag = False
+
+                    for tok in token_list:
+                        
+                        # if the multi-token flag is on, then keep adding tokens until the end index is reached
+                        if multi_token_flag:
+                            featList.append(tok.feats)
+                            multi_token_flag = False
+
+                        if tok.form.lower() == token.lower():
+                            if tok.last != tok.first:
+                                multi_token_flag = True
+                            else:
+                                featList.append(tok.feats)
             else:
-                return Phenomenon.NONE
-        elif err.errType in [ErrorTag.SA.value, ErrorTag.SE.value]:
+                for tok in token_list:
+                    featList.append(tok.feats)
+            
+            isMoodExistInCorrText = False
+            for item in featList:
+                if "Mood" in item:
+                    isMoodExistInCorrText = True
+                    break
+            
+            if (isMoodExist and isMoodExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
+                return Phenomenon.MISUSE
             if len(err.incorrText) > len(err.corrText):
                 return Phenomenon.ADDITION
             elif len(err.incorrText) < len(err.corrText):
                 return Phenomenon.OMISSION
-            else:
-                return Phenomenon.NONE
+
+    @staticmethod
+    def mapOL(err, token_list, overlap_flag, original_table, task_tokens):
+        # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
+        if len(err.incorrText.split()) > 1:
+            return Phenomenon.MISUSE
+        else:
+            # the erroneous span is looked up in the analysis of the original text (analyzed once per task, in sentence context)
+            token_list_incorrText = original_table.span(err.idxStartErr, err.idxEndErr, overlapping=True)
             
-        elif err.errType == ErrorTag.İY.value:
-            # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
-            if len(err.incorrText.split()) > 1:
-                return Phenomenon.MISUSE
-            else:
-                url, payload = Helper.setup_udpipe2_call()
-                service_result_incorrText = Helper.call_udpipe_service(err.incorrText, url, payload)
-                
-                isPsorExist = False
-                for line in service_result_incorrText.splitlines():
-                    cols = line.split("\t")
-                    if len(cols) != 10:
-                        continue
-                    token_id = cols[0] # according to conllu format
-                    feats = cols[5] # to process TokenRange attribute
-                    
-                    if "Person[psor]" in feats:
-                        isPsorExist = True
-                        break
-                                
-                featList = []
-                if overlap_flag:
-                    tokens = wordpunct_tokenize(err.corrText)
-
-                    for token in tokens:
-                        multi_token_flag = False
-
-                        for line in line_list:
-                            cols = line.split("\t")
-                            
-                            # if the multi-token flag is on, then keep adding lines until the end index is reached
-                            if multi_token_flag:
-                                featList.append(cols[5])
-                                multi_token_flag = False
-
-                            if cols[1].lower() == token.lower():
-                                if "-" in cols[0]:
-                                    multi_token_flag = True
-                                else:
-                                    featList.append(cols[5])
-                else:
-                    for line in line_list:
-                        cols = line.split("\t")
-                        featList.append(cols[5])
-
-                isPsorExistInCorrText = False
-                for item in featList:
-                    if "Person[psor]" in item:
-                        isPsorExistInCorrText = True
-                        break
-
-                if (isPsorExist and isPsorExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
-                    return Phenomenon.MISUSE
-                if len(err.incorrText) > len(err.corrText):
-                    return Phenomenon.ADDITION
-                elif len(err.incorrText) < len(err.corrText):
-                    return Phenomenon.OMISSION
-        elif err.errType == ErrorTag.ÇA.value:
-            # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
-            if len(err.incorrText.split()) > 1:
-                return Phenomenon.MISUSE
-            else:
-                url, payload = Helper.setup_udpipe2_call()
-                service_result_incorrText = Helper.call_udpipe_service(err.incorrText, url, payload)
-                
-                isVoiceExist = False
-                for line in service_result_incorrText.splitlines():
-                    cols = line.split("\t")
-                    if len(cols) != 10:
-                        continue
-                    token_id = cols[0] # according to conllu format
-                    feats = cols[5] # to process TokenRange attribute
-                    
-                    if "Voice" in feats:
-                        isVoiceExist = True
-                        break
-                
-                featList = []
-                if overlap_flag:
-                    tokens = wordpunct_tokenize(err.corrText)
-
-                    for token in tokens:
-                        multi_token_flag = False
-
-                        for line in line_list:
-                            cols = line.split("\t")
-                            
-                            # if the multi-token flag is on, then keep adding lines until the end index is reached
-                            if multi_token_flag:
-                                featList.append(cols[5])
-                                multi_token_flag = False
-
-                            if cols[1].lower() == token.lower():
-                                if "-" in cols[0]:
-                                    multi_token_flag = True
-                                else:
-                                    featList.append(cols[5])
-                else:
-                    for line in line_list:
-                        cols = line.split("\t")
-                        featList.append(cols[5])
-                
-                isVoiceExistInCorrText = False
-                for item in featList:
-                    if "Voice" in item:
-                        isVoiceExistInCorrText = True
-                        break
-                
-                if (isVoiceExist and isVoiceExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
-                    return Phenomenon.MISUSE
-                if len(err.incorrText) > len(err.corrText):
-                    return Phenomenon.ADDITION
-                elif len(err.incorrText) < len(err.corrText):
-                    return Phenomenon.OMISSION
-        elif err.errType == ErrorTag.KİP.value:
-            # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
-            if len(err.incorrText.split()) > 1:
-                return Phenomenon.MISUSE
+            isPolarityExist = False
+            for tok in token_list_incorrText:
+                if "Polarity" in tok.feats:
+                    isPolarityExist = True
+                    break
+            
+            featList = []
+            if overlap_flag:
+                tokens = task_tokens.words(err.corrText)
+
+                for token in tokens:
+                    multi_token_flag = False
+
+                    for tok in token_list:
+                        
+                        # if the multi-token flag is on, then keep adding tokens until the end index is reached
+                        if multi_token_flag:
+                            featList.append(tok.feats)
+                            multi_token_flag = False
+
+                        if tok.form.lower() == token.lower():
+                            if tok.last != tok.first:
+                                multi_token_flag = True
+                            else:
+                                featList.append(tok.feats)
             else:
-                url, payload = Helper.setup_udpipe2_call()
-                service_result_incorrText = Helper.call_udpipe_service(err.incorrText, url, payload)
-                
-                isMoodExist = False
-                for line in service_result_incorrText.splitlines():
-                    cols = line.split("\t")
-                    if len(cols) != 10:
-                        continue
-                    token_id = cols[0] # according to conllu format
-                    feats = cols[5] # to process TokenRange attribute
-                    
-                    if "Mood" in feats:
-                        isMoodExist = True
-                        break
-                
-                featList = []
-                if overlap_flag:
-                    tokens = wordpunct_tokenize(err.corrText)
-
-                    for token in tokens:
-                        multi_token_flag = False
-
-                        for line in line_list:
-                            cols = line.split("\t")
-                            
-                            # if the multi-token flag is on, then keep adding lines until the end index is reached
-                            if multi_token_flag:
-                                featList.append(cols[5])
-                                multi_token_flag = False
-
-                            if cols[1].lower() == token.lower():
-                                if "-" in cols[0]:
-                                    multi_token_flag = True
-                                else:
-                                    featList.append(cols[5])
-                else:
-                    for line in line_list:
-                        cols = line.split("\t")
-                        featList.append(cols[5])
-                
-                isMoodExistInCorrText = False
-                for item in featList:
-                    if "Mood" in item:
-                        isMoodExistInCorrText = True
-                        break
-                
-                if (isMoodExist and isMoodExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
-                    return Phenomenon.MISUSE
-                if len(err.incorrText) > len(err.corrText):
-                    return Phenomenon.ADDITION
-                elif len(err.incorrText) < len(err.corrText):
-                    return Phenomenon.OMISSION
-        elif err.errType == ErrorTag.OL.value:
-            # it is assumed that selected span with this error has only one token, if not -> returns MISUSE by default!
-            if len(err.incorrText.split()) > 1:
+                for tok in token_list:
+                    featList.append(tok.feats)
+
+            isPolarityExistInCorrText = False
+            for item in featList:
+                if "Polarity" in item:
+                    isPolarityExistInCorrText = True
+                    break
+            
+            if (isPolarityExist and isPolarityExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
                 return Phenomenon.MISUSE
-            else:
-                url, payload = Helper.setup_udpipe2_call()
-                service_result_incorrText = Helper.call_udpipe_service(err.incorrText, url, payload)
-                
-                isPolarityExist = False
-                for line in service_result_incorrText.splitlines():
-                    cols = line.split("\t")
-                    if len(cols) != 10:
-                        continue
-                    token_id = cols[0] # according to conllu format
-                    feats = cols[5] # to process TokenRange attribute
-                    
-                    if "Polarity" in feats:
-                        isPolarityExist = True
-                        break
-                
-                featList = []
-                if overlap_flag:
-                    tokens = wordpunct_tokenize(err.corrText)
-
-                    for token in tokens:
-                        multi_token_flag = False
-
-                        for line in line_list:
-                            cols = line.split("\t")
-                            
-                            # if the multi-token flag is on, then keep adding lines until the end index is reached
-                            if multi_token_flag:
-                                featList.append(cols[5])
-                                multi_token_flag = False
-
-                            if cols[1].lower() == token.lower():
-                                if "-" in cols[0]:
-                                    multi_token_flag = True
-                                else:
-                                    featList.append(cols[5])
-                else:
-                    for line in line_list:
-                        cols = line.split("\t")
-                        featList.append(cols[5])
-
-                isPolarityExistInCorrText = False
-                for item in featList:
-                    if "Polarity" in item:
-                        isPolarityExistInCorrText = True
-                        break
-                
-                if (isPolarityExist and isPolarityExistInCorrText) or (len(err.incorrText) == len(err.corrText)):
-                    return Phenomenon.MISUSE
-                if len(err.incorrText) > len(err.corrText):
-                    return Phenomenon.ADDITION
-                elif len(err.incorrText) < len(err.corrText):
-                    return Phenomenon.OMISSION
-        elif err.errType == ErrorTag.TÜ.value:
             if len(err.incorrText) > len(err.corrText):
                 return Phenomenon.ADDITION
             elif len(err.incorrText) < len(err.corrText):
                 return Phenomenon.OMISSION
-            else:
-                return Phenomenon.MISUSE # assumption: incorrect and correct word have the same length
-        elif err.errType == ErrorTag.SH.value:
-            if len(err.corrText.split()) == 0:
-                return Phenomenon.ADDITION
-            elif len(err.corrText.split()) > len(err.incorrText.split()):
-                return Phenomenon.OMISSION
-            else:
-                return Phenomenon.MISUSE
\ No newline at end of file
+
+    @staticmethod
+    def mapTÜ(err, token_list, overlap_flag, original_table, task_tokens):
+        if len(err.incorrText) > len(err.corrText):
+            return Phenomenon.ADDITION
+        elif len(err.incorrText) < len(err.corrText):
+            return Phenomenon.OMISSION
+        else:
+            return Phenomenon.MISUSE # assumption: incorrect and correct word have the same length
+
+    @staticmethod
+    def mapSH(err, token_list, overlap_flag, original_table, task_tokens):
+        if len(err.corrText.split()) == 0:
+            return Phenomenon.ADDITION
+        elif len(err.corrText.split()) > len(err.incorrText.split()):
+            return Phenomenon.OMISSION
+        else:
+            return Phenomenon.MISUSE
\ No newline at end of file
@@ -1,57 +1,57 @@
-from model.error_tag import ErrorTag
-from nltk.tokenize import wordpunct_tokenize
-import sys
-
 # Represents <Part-of-speech> in the paper https://doi.org/10.1007/s10579-024-09794-0
-# important: POS results are returned as a list of tuples (UPOS, XPOS)
+# important: POS results are returned as a list of tuples (FORM, UPOS, XPOS)
+# the mapper of an error tag is chosen by the UPOS column of the mapping schema (see RuleRegistry)
 class POS:
-    
+
+    # mapper of a schema value: "-" (no POS), "<UPOS>" (POS of the analysis) or a fixed UPOS tag (e.g. "PUNCT")
     @staticmethod
-    def mapPOS(err, line_list, overlap_flag):
-        if err.errType in [ErrorTag.SI.value, ErrorTag.SE.value, ErrorTag.SH.value, ErrorTag.İB.value, ErrorTag.AnB.value,
-                            ErrorTag.ÜS.value, ErrorTag.DİJ.value]:
-            return []
-        elif err.errType == ErrorTag.NO.value:
-            return [(err.corrText, "PUNCT", "")]
-        elif err.errType == ErrorTag.KEG.value:
-            return [(err.corrText, "VERB", "")]
-        else:
-            result = []
-            if overlap_flag:
-                tokens = wordpunct_tokenize(err.corrText)
+    def rule(value):
+        if value == "-":
+            return POS.mapNone
+        if value == "<UPOS>":
+            return POS.mapAnalysis
+        return lambda err, token_list, overlap_flag, task_tokens: [(err.corrText, value, "")]
+
+    @staticmethod
+    def mapNone(err, token_list, overlap_flag, task_tokens):
+        return []
 
-                for token in tokens:
-                    st_idx = 0
-                    ed_idx = 0
-                    multi_token_flag = False
+    # POS of the tokens of the corrected text
+    @staticmethod
+    def mapAnalysis(err, token_list, overlap_flag, task_tokens):
+        result = []
+        if overlap_flag:
+            tokens = task_tokens.words(err.corrText)
 
-                    for line in line_list:
-                        cols = line.split("\t")
+            for token in tokens:
+                st_idx = 0
+                ed_idx = 0
+                multi_token_flag = False
 
-                        # if the multi-token flag is on, then keep adding lines until the end index is reached
-                        if multi_token_flag:
-                            if int(cols[0]) <= ed_idx:
-                                # format: (FORM, POS, XPOS)
-                                result.append((cols[1], cols[3], cols[4]))
-                                if int(cols[0]) == ed_idx:
-                                    multi_token_flag = False
-                            else:
-                                multi_token_flag = False
+                for tok in token_list:
 
-                        if cols[1] == token:
+                    # if the multi-token flag is on, then keep adding tokens until the end index is reached
+                    if multi_token_flag:
+                        if tok.first <= ed_idx:
                             # format: (FORM, POS, XPOS)
-                            result.append((cols[1], cols[3], cols[4]))
-                            
-                            # if it is multi-token, then keep start and end indices and switch the flag
-                            if "-" in cols[0]:
-                                multi_token_flag = True
-                                st_idx, ed_idx = cols[0].split("-")
-                                st_idx = int(st_idx)
-                                ed_idx = int(ed_idx)
-            else:
-                for line in line_list:
-                    cols = line.split("\t")
-                    # format: (FORM, POS, XPOS)
-                    result.append((cols[1], cols[3], cols[4]))
-            
-            return result
\ No newline at end of file
+                            result.append((tok.form, tok.upos, tok.xpos))
+                            if tok.first == ed_idx:
+                                multi_token_flag = False
+                        else:
+                            multi_token_flag = False
+
+                    if tok.form == token:
+                        # format: (FORM, POS, XPOS)
+                        result.append((tok.form, tok.upos, tok.xpos))
+                        
+                        # if it is multi-token, then keep start and end indices and switch the flag
+                        if tok.last != tok.first:
+                            multi_token_flag = True
+                            st_idx = tok.first
+                            ed_idx = tok.last
+        else:
+            for tok in token_list:
+                # format: (FORM, POS, XPOS)
+                result.append((tok.form, tok.upos, tok.xpos))
+        
+        return result
\ No newline at end of file
@@ -1,21 +1,99 @@
+from sys import intern
 from model.pos import POS
 from model.unit import Unit
 from model.level import Level
 from model.phenomenon import Phenomenon
 import json
 
+# codes of the enum facets (position in the enum), a Taxonomy keeps the three codes packed in one small int (4 bits each, 15: None)
+UNITS = list(Unit)
+PHENOMENA = list(Phenomenon)
+LEVELS = list(Level)
+UNIT_CODES = {unit: code for code, unit in enumerate(UNITS)}
+PHENOMENON_CODES = {phenomenon: code for code, phenomenon in enumerate(PHENOMENA)}
+LEVEL_CODES = {level: code for code, level in enumerate(LEVELS)}
+NO_CODE = 15
+
 # Represents <Taxonomy> in the paper https://doi.org/10.1007/s10579-024-09794-0
+# compact representation (there is one per error): slots instead of a __dict__, the enum facets packed into a small int
+# and the items of pos/infFeat/lexFeat stored as tuples of interned strings (forms and features repeat across errors and tasks)
 class Taxonomy:
+
+    __slots__ = ("id", "_pos", "_infFeat", "_lexFeat", "_facets")
+
     # constructor
-    #def __init__(self, id = '', pos = [], infFeat = [], lexFeat = [], unit = Unit.NONE, phenomenon = Phenomenon.NONE, level = Level.NONE):
-    def __init__(self, id = '', pos = [], infFeat = [], lexFeat = [], unit = Unit.NONE, phenomenon = Phenomenon.NONE, level = Level.NONE):
+    def __init__(self, id = '', pos = (), infFeat = (), lexFeat = (), unit = Unit.NONE, phenomenon = Phenomenon.NONE, level = Level.NONE):
         self.id = id # unique identifier of the error
-        self.pos = pos # part-of-speech tag of the error (list structure is used because well-formed utterance may have multiple tokens)
-        self.infFeat = infFeat # inflectional feature of the error (list structure is used because well-formed utterance may have multiple tokens)
-        self.lexFeat = lexFeat # # lexical feature of the error (list structure is used because well-formed utterance may have multiple tokens)
-        self.unit = unit # unit of the error
-        self.phenomenon = phenomenon # phenomenon of the error 
-        self.level = level # linguistic level of the error
+        self._pos = Taxonomy.tags(pos) # part-of-speech tag of the error (a tuple of items is used because well-formed utterance may have multiple tokens)
+        self._infFeat = Taxonomy.features(infFeat) # inflectional feature of the error (a tuple of items is used because well-formed utterance may have multiple tokens)
+        self._lexFeat = Taxonomy.features(lexFeat) # lexical feature of the error (a tuple of items is used because well-formed utterance may have multiple tokens)
+        # unit, phenomenon and level of the error
+        self._facets = (UNIT_CODES[unit] if unit is not None else NO_CODE) | (PHENOMENON_CODES[phenomenon] if phenomenon is not None else NO_CODE) << 4 | (LEVEL_CODES[level] if level is not None else NO_CODE) << 8
+
+    # (FORM, UPOS, XPOS) items with interned strings
+    @staticmethod
+    def tags(items):
+        return tuple([(intern(form), intern(upos), intern(xpos)) for form, upos, xpos in items]) if items else ()
+
+    # (FORM, FEATS) items with interned strings
+    @staticmethod
+    def features(items):
+        return tuple([(intern(form), intern(feats)) for form, feats in items]) if items else ()
+
+    @property
+    def pos(self):
+        return self._pos
+
+    @pos.setter
+    def pos(self, items):
+        self._pos = Taxonomy.tags(items)
+
+    @property
+    def infFeat(self):
+        return self._infFeat
+
+    @infFeat.setter
+    def infFeat(self, items):
+        self._infFeat = Taxonomy.features(items)
+
+    @property
+    def lexFeat(self):
+        return self._lexFeat
+
+    @lexFeat.setter
+    def lexFeat(self, items):
+        self._lexFeat = Taxonomy.features(items)
+
+    @property
+    def unit(self):
+        code = self._facets & 15
+        return UNITS[code] if code != NO_CODE else None
+
+    @unit.setter
+    def unit(self, unit):
+        self._facets = (self._facets & ~15) | (UNIT_CODES[unit] if unit is not None else NO_CODE)
+
+    @property
+    def phenomenon(self):
+        code = (self._facets >> 4) & 15
+        return PHENOMENA[code] if code != NO_CODE else None
+
+    @phenomenon.setter
+    def phenomenon(self, phenomenon):
+        self._facets = (self._facets & ~(15 << 4)) | ((PHENOMENON_CODES[phenomenon] if phenomenon is not None else NO_CODE) << 4)
+
+    @property
+    def level(self):
+        code = (self._facets >> 8) & 15
+        return LEVELS[code] if code != NO_CODE else None
+
+    @level.setter
+    def level(self, level):
+        self._facets = (self._facets & ~(15 << 8)) | ((LEVEL_CODES[level] if level is not None else NO_CODE) << 8)
+
+    # pickled through the constructor (mapping worker processes), so the strings are interned again in the receiving process
+    def __reduce__(self):
+        return (Taxonomy, (self.id, self._pos, self._infFeat, self._lexFeat, self.unit, self.phenomenon, self.level))
     
     def to_dict(self):
         
@@ -52,4 +130,4 @@ class Taxonomy:
             "unit": self.unit.value,
             "phenomenon": self.phenomenon.value,
             "level": self.level.value
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,458 @@
+import os
+import json
+import threading
+import time
+from contextlib import nullcontext
+import config
+from helper import Helper
+from udpipe_transport import UDPipeTransport
+from analyzers import Analyzer, RestAnalyzer, LocalAnalyzer, RecordingAnalyzer, ReplayAnalyzer
+from token_table import TokenTable
+from task_context import TaskContext
+from task_mapper import TaskMapper, MappingPool
+from rule_registry import RuleRegistry
+from task_manifest import TaskManifest
+from token_counts import TokenCounts
+from export_reader import ExportReader
+from validator import DataValidator
+from sinks import OutputSink
+
+
+# Semi-automated annotation extender pipeline
+# a pipeline owns its resources (metadata, abbreviations, analyzer backend and mapping processes), they are loaded once on first use
+# per-run and per-task state is kept in local variables and task contexts, so several pipelines (or threads sharing a pipeline) can run at the same time
+class Pipeline:
+    # constructor
+    def __init__(self, cache_dir=None, use_cache=True, workers=None, batch_max_bytes=None, hedge=None, processes=None,
+                 analyzer=None, service=None, model=None, local_model=None, recordings_dir=None, profiler=None):
+        self.analyzer_name = analyzer if analyzer is not None else config.ANALYZER # analyzer backend (see Analyzer.NAMES)
+        if self.analyzer_name not in Analyzer.NAMES:
+            raise ValueError(f"Unknown analyzer: {self.analyzer_name} (expected one of {Analyzer.NAMES})")
+        self.local_model = local_model if local_model is not None else config.UDPIPE_LOCAL_MODEL # model file of the local analyzer
+        self.recordings_dir = recordings_dir if recordings_dir is not None else config.UDPIPE2_RECORDINGS_DIR # directory of recorded analyses
+        self.cache_dir = cache_dir if cache_dir is not None else config.UDPIPE2_CACHE_DIR # directory of the persistent UDPipe2 response cache
+        self.use_cache = use_cache and self.cache_dir is not None
+        self.workers = workers if workers is not None else config.UDPIPE2_WORKERS # number of concurrent UDPipe2 requests
+        self.batch_max_bytes = batch_max_bytes if batch_max_bytes is not None else config.UDPIPE2_BATCH_MAX_BYTES # maximum size of a request which packs several tasks
+        self.hedge = hedge if hedge is not None else config.UDPIPE2_HEDGE
+        self.processes = processes if processes is not None else config.MAPPING_PROCESSES # number of worker processes of the mapping stage
+        self.profiler = profiler # Profiler of the stages, facet mappers and error tags (None disables profiling, a profiled pipeline should not be shared by threads)
+
+        # setting up UDPipe2 REST API call (data of the payload is filled per request)
+        self.url, self.payload = Helper.setup_udpipe2_call(service, model)
+
+        # resources, loaded by open()
+        self.mapper = None
+        self.analyzer = None
+        self.pool = None
+        self.lock = threading.Lock()
+
+    # loading the resources of the pipeline (only once, later calls return immediately)
+    def open(self):
+        with self.lock:
+            if self.mapper is not None:
+                return self
+
+            with self.stage("resources"):
+                # metadata information for all tasks, TDK's abbreviation list (used in Unit detection for error type "NO"/"PUNCTUATION")
+                # and the facet mappers per error tag compiled from the mapping schema
+                mapper = TaskMapper(Helper.load_metadata(), Helper.load_abbreviations_tdk(), RuleRegistry(Helper.load_mapping_schema(), config.STRICT_FACETS))
+                if self.profiler is not None:
+                    mapper.timer = self.profiler.timer
+                    mapper.tag_timer = self.profiler.tags
+
+                # morphosyntactic analyzer backend
+                self.analyzer = self.setup_analyzer()
+
+                # worker processes of the mapping stage (None means mapping in the calling thread)
+                self.pool = MappingPool(self.processes, mapper) if self.processes > 1 else None
+
+            self.mapper = mapper
+        return self
+
+    def close(self):
+        with self.lock:
+            if self.analyzer is not None:
+                self.analyzer.close()
+            if self.pool is not None:
+                self.pool.close()
+            self.mapper = None
+            self.analyzer = None
+            self.pool = None
+
+    # analyzer backend of the pipeline
+    # rest: UDPipe2 REST API with the response cache, local: in-process UDPipe model,
+    # record: REST API with the analyses recorded to recordings_dir, replay: recorded analyses only (no network)
+    def setup_analyzer(self):
+        if self.analyzer_name == "local":
+            if self.local_model is None:
+                raise ValueError("The local analyzer needs a UDPipe model file (--local-model or config.UDPIPE_LOCAL_MODEL).")
+            return LocalAnalyzer(self.local_model)
+        if self.analyzer_name == "replay":
+            return ReplayAnalyzer(self.recordings_dir, self.payload)
+
+        # persistent cache for UDPipe2 responses and HTTP transport (connection pool sized for the concurrent requests)
+        cache = Helper.setup_udpipe2_cache(self.cache_dir) if self.use_cache else None
+        transport = UDPipeTransport(pool_size=max(self.workers, 1), max_retries=config.UDPIPE2_MAX_RETRIES, timeout=config.UDPIPE2_TIMEOUT, hedge=self.hedge)
+        analyzer = RestAnalyzer(self.url, self.payload, self.workers, self.batch_max_bytes, cache, transport)
+        if self.analyzer_name == "record":
+            return RecordingAnalyzer(analyzer, self.recordings_dir, self.payload)
+        return analyzer
+
+    # identifier of the analyzer model, outputs of runs with the same model are interchangeable (used by the manifest fingerprint)
+    def model_id(self):
+        if self.analyzer_name == "local":
+            return "local:" + os.path.basename(self.local_model or "")
+        return self.payload["model"]
+
+    # timing a block of a stage if the pipeline is profiled
+    def stage(self, name):
+        return self.profiler.stage(name) if self.profiler is not None else nullcontext()
+
+    def count(self, counter, n=1):
+        if self.profiler is not None:
+            self.profiler.count(counter, n)
+
+    # resources are loaded on first use (see open)
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    # running the extender over an export file, returns the list of all enriched errors (see iter_errors)
+    def run(self, path, validation_report=None):
+        return list(self.iter_errors(path, validation_report))
+
+    # streaming version of run: tasks are read from the export file one by one and enriched errors are yielded as soon as they are produced
+    # memory usage is bounded by the largest task (and the window of tasks analyzed together), not by the size of the export file
+    def iter_errors(self, path, validation_report=None):
+        if not self.validate(path, validation_report):
+            return
+        for window in self.iter_windows(path):
+            for idx, task, errors, tokens in self.process_window(window):
+                if errors is not None:
+                    yield from errors
+
+    # streaming the output records (Error.to_dict()) of an export file
+    # if a manifest is given, tasks unchanged since the run recorded in the manifest are not processed again (their records are carried forward)
+    # and the manifest is updated with the records of this run when all tasks are done
+    # if token counts are given, the number of tokens of every task is recorded in them (saved when all tasks are done)
+    def iter_records(self, path, validation_report=None, manifest=None, counts=None):
+        if not self.validate(path, validation_report):
+            return
+        for window in self.iter_windows(path):
+            # tasks having the same hash as in the previous run
+            carried = {}
+            hashes = {}
+            pending = []
+            for idx, task in window:
+                if manifest is not None:
+                    hashes[idx], records = manifest.lookup(task)
+                    if records is not None:
+                        carried[idx] = records
+                        continue
+                pending.append((idx, task))
+
+            self.count("carried_tasks", len(carried))
+            results = {}
+            task_tokens = {}
+            for idx, task, errors, tokens in self.process_window(pending):
+                results[idx] = [err.to_dict() for err in errors] if errors is not None else None
+                task_tokens[idx] = tokens
+
+            for idx, task in window:
+                if idx in carried:
+                    records = carried[idx]
+                    tokens = manifest.tokens(task)
+                    manifest.add(task, hashes[idx], records, carried=True, tokens=tokens)
+                else:
+                    records = results[idx]
+                    if records is None: # failed tasks are not recorded in the manifest
+                        continue
+                    tokens = task_tokens[idx]
+                    if manifest is not None:
+                        manifest.add(task, hashes[idx], records, tokens=tokens)
+                if counts is not None:
+                    counts.add(task, tokens)
+                yield from records
+
+        if counts is not None:
+            counts.save()
+        if manifest is not None:
+            manifest.save()
+            if config.DEBUG:
+                print(f"Manifest: {manifest.stats()}")
+
+    # validating the input file (Label Studio's json output/export file) while streaming it (same spans with multiple corrections, cross-overlapping spans, validity of error tags, etc.)
+    def validate(self, path, validation_report=None):
+        with self.stage("validate"):
+            res_validation = Helper.validate_data(validation_report, ExportReader.iter_tasks(path))
+        if not res_validation:
+            print("Data validation failed. Please check the issues above and fix them before running the extender.")
+        return res_validation
+
+    # streaming the tasks of an export file in windows of (index, task) pairs
+    def iter_windows(self, path):
+        self.open()
+
+        # tasks are streamed again and processed in windows (UDPipe2 requests of a window run concurrently)
+        print("\nProcessing tasks...")
+        window_size = max(config.TASK_WINDOW, 4 * self.workers, 4 * self.processes)
+        try:
+            window = []
+            tasks = enumerate(ExportReader.iter_tasks(path))
+            while True:
+                with self.stage("load"):
+                    item = next(tasks, None)
+                if item is None:
+                    break
+                window.append(item)
+                if len(window) >= window_size:
+                    yield window
+                    window = []
+            if len(window) > 0:
+                yield window
+        finally:
+            if config.DEBUG:
+                print(f"\nAnalyzer ({self.analyzer_name}): {self.analyzer.stats()}")
+
+    # running the extender over several export files (e.g. one export per annotator) in one invocation
+    # tasks of all files are analyzed together (longest task first) and every file gets its own output
+    # a combined report of the run is written to <output_dir>/run_report.json, the report is also returned
+    # if incremental is set, every output gets a manifest and unchanged tasks of a re-run are carried forward (see iter_records)
+    def run_batch(self, paths, output_dir="./output", fmt="jsonl", flush_every=100, incremental=False):
+        run_started = time.perf_counter()
+        self.open()
+
+        # validating and reconstructing the tasks of every file
+        files = [] # report entries of the files
+        manifests = [] # manifests of the files (None if not incremental)
+        counts = [] # token counts of the files
+        hashes = [] # task index -> hash of the task per file
+        records = [] # task index -> records of the task per file
+        prepared = [] # (file index, task index, reconstructed task data, task context)
+        for file_idx, path in enumerate(paths):
+            entry = {"path": path, "output": os.path.join(output_dir, f"results_{os.path.splitext(os.path.basename(path))[0]}.{fmt}"),
+                     "status": "ok", "tasks": 0, "carried_tasks": 0, "skipped_tasks": 0, "failed_tasks": 0, "errors": 0, "validation": None, "seconds": 0.0}
+            files.append(entry)
+            manifests.append(TaskManifest(TaskManifest.path_for(entry["output"]), TaskManifest.current_fingerprint(self.model_id())) if incremental else None)
+            counts.append(TokenCounts(TokenCounts.path_for(entry["output"])))
+            hashes.append({})
+            records.append({})
+            print(f"\nInput File: {path}")
+
+            with self.stage("validate"):
+                validator = DataValidator()
+                for task in ExportReader.iter_tasks(path):
+                    validator.add_task(task)
+            validator.print_summary()
+            entry["validation"] = validator.report()
+            entry["tasks"] = validator.task_count
+            if not validator.passed():
+                print(f"Data validation failed. Skip processing the file {path}...")
+                entry["status"] = "invalid"
+                continue
+
+            for idx, task in enumerate(ExportReader.iter_tasks(path)):
+                self.count("tasks")
+                if incremental:
+                    hashes[file_idx][idx], carried = manifests[file_idx].lookup(task)
+                    if carried is not None:
+                        tokens = manifests[file_idx].tokens(task)
+                        manifests[file_idx].add(task, hashes[file_idx][idx], carried, carried=True, tokens=tokens)
+                        counts[file_idx].add(task, tokens)
+                        records[file_idx][idx] = carried
+                        entry["carried_tasks"] += 1
+                        entry["errors"] += len(carried)
+                        self.count("carried_tasks")
+                        continue
+                with self.stage("reconstruct"):
+                    res_prepare = self.prepare_task(idx, task)
+                if res_prepare is None:
+                    entry["skipped_tasks"] += 1
+                    self.count("skipped_tasks")
+                    continue
+                prepared.append((file_idx, idx, res_prepare[0], res_prepare[1]))
+
+        # longest tasks are scheduled first, so the run is not dominated by a long task started last
+        prepared.sort(key=lambda item: len(item[2]) + len(item[3].task["data"]["DATA"]), reverse=True)
+
+        # number of analyzed tasks left per file, a file is written as soon as all of its tasks are mapped
+        remaining = [0] * len(paths)
+        for file_idx, _, _, _ in prepared:
+            remaining[file_idx] += 1
+
+        def write_file(file_idx):
+            entry = files[file_idx]
+            with OutputSink.create(entry["output"], fmt, flush_every) as sink:
+                for idx in sorted(records[file_idx]):
+                    for record in records[file_idx][idx]:
+                        sink.write(record)
+            records[file_idx] = {}
+            counts[file_idx].save()
+            if manifests[file_idx] is not None:
+                manifests[file_idx].save()
+            entry["seconds"] = round(time.perf_counter() - run_started, 3)
+            print(f"Output File: {entry['output']} ({entry['errors']} errors)")
+
+        # storing the errors and the number of tokens of a task (None if the task failed), a file is written when its last task is done
+        def collect(file_idx, idx, errors, tokens=None):
+            if errors is None:
+                files[file_idx]["failed_tasks"] += 1
+                self.count("failed_tasks")
+            else:
+                task = prepared_tasks[(file_idx, idx)]
+                records[file_idx][idx] = [err.to_dict() for err in errors]
+                files[file_idx]["errors"] += len(errors)
+                counts[file_idx].add(task, tokens)
+                if manifests[file_idx] is not None:
+                    manifests[file_idx].add(task, hashes[file_idx][idx], records[file_idx][idx], tokens=tokens)
+            remaining[file_idx] -= 1
+            if remaining[file_idx] == 0:
+                write_file(file_idx)
+
+        print("\nProcessing tasks...")
+        # files without any task to analyze are written right away
+        for file_idx, entry in enumerate(files):
+            if entry["status"] == "ok" and remaining[file_idx] == 0:
+                write_file(file_idx)
+
+        prepared_tasks = {(file_idx, idx): ctx.task for file_idx, idx, _, ctx in prepared}
+        res_services = self.analyze([(reconstructed_task_data, ctx) for _, _, reconstructed_task_data, ctx in prepared])
+
+        # analyzed tasks are mapped in chunks (a chunk is sharded over the mapping processes)
+        chunk_size = max(config.TASK_WINDOW, 4 * self.processes)
+        keys = []
+        analyzed = []
+        for file_idx, idx, reconstructed_task_data, ctx in prepared:
+            with self.stage("analyze"):
+                res_service, res_original = next(res_services)
+            if isinstance(res_service, Exception) or isinstance(res_original, Exception):
+                print(f"Error occurred while calling UDPipe2 service: {res_service if isinstance(res_service, Exception) else res_original}")
+                collect(file_idx, idx, None)
+                continue
+            keys.append((file_idx, idx, TokenTable.count_words(res_original)))
+            analyzed.append((ctx, res_service, res_original))
+            if len(analyzed) >= chunk_size:
+                for key, errors in zip(keys, self.map_analyzed(analyzed)):
+                    collect(key[0], key[1], errors, key[2])
+                keys = []
+                analyzed = []
+        for key, errors in zip(keys, self.map_analyzed(analyzed)):
+            collect(key[0], key[1], errors, key[2])
+
+        report = {
+            "files": files,
+            "total": {
+                "files": len(files),
+                "invalid_files": sum(1 for entry in files if entry["status"] == "invalid"),
+                "tasks": sum(entry["tasks"] for entry in files),
+                "carried_tasks": sum(entry["carried_tasks"] for entry in files),
+                "skipped_tasks": sum(entry["skipped_tasks"] for entry in files),
+                "failed_tasks": sum(entry["failed_tasks"] for entry in files),
+                "errors": sum(entry["errors"] for entry in files)
+            },
+            "analyzer": self.analyzer_name,
+            "model": self.model_id(),
+            "analyzer_stats": self.analyzer.stats(),
+            "workers": self.workers,
+            "processes": self.processes,
+            "seconds": round(time.perf_counter() - run_started, 3)
+        }
+
+        os.makedirs(output_dir, exist_ok=True)
+        with open(os.path.join(output_dir, "run_report.json"), "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        print(f"\nRun report: {os.path.join(output_dir, 'run_report.json')} ({report['total']['errors']} errors in {report['seconds']} seconds)")
+        return report
+
+    # reconstructing a task, returns (reconstructed task data, task context) or None if the task should be skipped
+    def prepare_task(self, idx, task):
+        if config.DEBUG:
+            print("\n################################################")
+            print(f"Task: {idx} --- ID: {task['id']} --- DATA_ID: {task['data']['ID']}")
+
+        # task reconstruction (span map of the task is kept in its task context)
+        reconstructed_task_data, no_of_annotations, span_map = Helper.get_reconstructed_task_data(task)
+
+        # skip processing the task if some annotations could not be resolved in the span map (e.g. results sharing the same id)
+        if no_of_annotations != len(span_map):
+            print(f"Number of annotations ({no_of_annotations}) and number of resolved corrections in the span map ({len(span_map)}) not matched. Skip processing the task...")
+            return None
+
+        return reconstructed_task_data, TaskContext(task, span_map)
+
+    # UDPipe2 REST API calls for (reconstructed task data, task context) pairs (concurrent if workers > 1, packed if batch_max_bytes > 0)
+    # two texts are analyzed per task: the reconstructed (corrected) text and the original text, which is used for the features of the erroneous spans
+    # yields (analysis of the reconstructed text, analysis of the original text) per task in the given order, a failed call yields its exception
+    def analyze(self, prepared):
+        texts = []
+        for reconstructed_task_data, ctx in prepared:
+            texts.append(reconstructed_task_data)
+            texts.append(ctx.task["data"]["DATA"])
+        res_services = self.analyzer.analyze(texts)
+        for res_service in res_services:
+            yield res_service, next(res_services)
+
+    # mapping (task context, analysis of the reconstructed text, analysis of the original text) items to the taxonomy
+    # yields the list of errors of each item in the given order
+    def map_analyzed(self, analyzed):
+        if self.pool is not None:
+            if self.profiler is None:
+                yield from self.pool.map(analyzed)
+                return
+            # facet mappers run in the worker processes, only the whole stage is timed and the error tags are counted
+            with self.stage("map"):
+                results = list(self.pool.map(analyzed))
+            for errors in results:
+                for err in errors:
+                    self.profiler.tags.add(err.errType, 0.0)
+            yield from results
+            return
+        for ctx, res_service, res_original in analyzed:
+            # analysis results are parsed once per task into token tables
+            with self.stage("parse"):
+                table = TokenTable(res_service)
+                original_table = TokenTable(res_original)
+            with self.stage("map"):
+                errors = self.mapper.map_task(ctx, table, original_table)
+            yield errors
+
+    # reconstructing, analyzing and mapping a window of (index, task) pairs
+    # yields (index, task, errors, number of tokens) in the original task order, errors (and tokens) are None if the task was skipped or its analysis failed
+    # the number of tokens of a task is the number of words in the analysis of its original text (see TokenCounts)
+    def process_window(self, window):
+        # task reconstruction
+        prepared = []
+        indices = []
+        errors_by_idx = {}
+        tokens_by_idx = {}
+        with self.stage("reconstruct"):
+            for idx, task in window:
+                res_prepare = self.prepare_task(idx, task)
+                if res_prepare is not None:
+                    prepared.append(res_prepare)
+                    indices.append(idx)
+
+        # main loop through tasks
+        analyzed = []
+        analyzed_indices = []
+        with self.stage("analyze"):
+            for idx, (reconstructed_task_data, ctx), (res_service, res_original) in zip(indices, prepared, self.analyze(prepared)):
+                if isinstance(res_service, Exception) or isinstance(res_original, Exception):
+                    print(f"Error occurred while calling UDPipe2 service: {res_service if isinstance(res_service, Exception) else res_original}")
+                    continue
+                analyzed.append((ctx, res_service, res_original))
+                analyzed_indices.append(idx)
+                tokens_by_idx[idx] = TokenTable.count_words(res_original)
+        self.count("tasks", len(window))
+        self.count("skipped_tasks", len(window) - len(prepared))
+        self.count("failed_tasks", len(prepared) - len(analyzed))
+
+        # mapping stage (in worker processes if there is a mapping pool, errors are merged in the original task order)
+        for idx, errors in zip(analyzed_indices, self.map_analyzed(analyzed)):
+            errors_by_idx[idx] = errors
+
+        for idx, task in window:
+            yield idx, task, errors_by_idx.get(idx), tokens_by_idx.get(idx)
@@ -0,0 +1,157 @@
+import cProfile
+import json
+import os
+import time
+import tracemalloc
+from stage_timer import StageTimer
+
+
+# Profile of a pipeline run (--profile)
+# wall-clock time and calls per stage and per facet mapper, time and count per error tag (ErrorTag),
+# analyzer latency percentiles and histogram, optionally the peak traced memory per stage and cProfile dumps of selected stages
+# a profiler belongs to a single run (not shared by threads), a pipeline without a profiler skips all of it
+class Profiler:
+
+    STAGES = ["resources", "load", "validate", "reconstruct", "analyze", "parse", "map"] # stages timed by the pipeline (blocks, not nested)
+    MAPPERS = ["span", "pos", "inf_feat", "lex_feat", "unit", "phenomenon", "level"] # laps of the map stage (see TaskMapper.map_task)
+    LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0] # upper bounds (seconds) of the latency histogram
+
+    # constructor
+    def __init__(self, trace_memory = False, cprofile_stages = None, cprofile_dir = "./output/profile"):
+        self.timer = StageTimer() # stages and facet mappers
+        self.tags = StageTimer() # error tag -> mapping time and number of errors
+        self.counters = {} # tasks, skipped tasks, failed tasks, ...
+        self.trace_memory = trace_memory
+        self.memory = {} # stage -> peak traced memory (bytes) during the stage
+        self.peak_memory = 0
+        unknown = [stage for stage in (cprofile_stages or []) if stage not in Profiler.STAGES]
+        if len(unknown) > 0:
+            raise ValueError(f"cProfile can only be used for the stages {Profiler.STAGES}, not {unknown}")
+        self.profiles = {stage: cProfile.Profile() for stage in (cprofile_stages or [])}
+        self.cprofile_dir = cprofile_dir
+        self.started = None
+        self.seconds = 0.0
+
+    def start(self):
+        self.started = time.perf_counter()
+        if self.trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stop(self):
+        if self.started is not None:
+            self.seconds += time.perf_counter() - self.started
+            self.started = None
+        if self.trace_memory and tracemalloc.is_tracing():
+            self.peak_memory = max(self.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.stop()
+
+    # timing a block of a stage: with profiler.stage("reconstruct"): ...
+    def stage(self, stage):
+        return _ProfiledStage(self, stage)
+
+    def count(self, counter, n = 1):
+        self.counters[counter] = self.counters.get(counter, 0) + n
+
+    # nearest-rank percentile (p in 0-100) of sorted values, None if there are no values
+    @staticmethod
+    def percentile(values, p):
+        if len(values) == 0:
+            return None
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    # number of values per bucket (upper bound "le", the last bucket has no bound)
+    @staticmethod
+    def histogram(values, bounds = LATENCY_BUCKETS):
+        counts = [0] * (len(bounds) + 1)
+        for value in values:
+            i = 0
+            while i < len(bounds) and value > bounds[i]:
+                i += 1
+            counts[i] += 1
+        return [{"le": bound, "count": count} for bound, count in zip(bounds + [None], counts)]
+
+    # latency summary of the analyzer requests (seconds)
+    @staticmethod
+    def latency_report(latencies):
+        latencies = sorted(latencies)
+        return {
+            "samples": len(latencies),
+            "p50": Profiler.percentile(latencies, 50),
+            "p95": Profiler.percentile(latencies, 95),
+            "p99": Profiler.percentile(latencies, 99),
+            "max": latencies[-1] if len(latencies) > 0 else None,
+            "histogram": Profiler.histogram(latencies)
+        }
+
+    # writing the cProfile dumps (<cprofile_dir>/<stage>.prof), returns stage -> dump path
+    def dump_profiles(self):
+        paths = {}
+        if len(self.profiles) > 0:
+            os.makedirs(self.cprofile_dir, exist_ok=True)
+        for stage, profile in self.profiles.items():
+            paths[stage] = os.path.join(self.cprofile_dir, f"{stage}.prof")
+            profile.dump_stats(paths[stage])
+        return paths
+
+    # JSON-serializable report (analyzer: analyzer backend of the run, for its counters and latencies)
+    def report(self, analyzer = None):
+        stages = self.timer.report()
+        tags = self.tags.report()
+        errors = sum(res["count"] for res in tags.values())
+        report = {
+            "seconds": round(self.seconds, 6),
+            "counters": dict(self.counters, errors=errors),
+            "stages": {stage: stages[stage] for stage in Profiler.STAGES if stage in stages},
+            "mappers": {stage: stages[stage] for stage in Profiler.MAPPERS if stage in stages},
+            "error_tags": {
+                tag: {"count": res["count"], "seconds": res["seconds"], "mean_ms": round(1000 * res["seconds"] / res["count"], 4), "share": round(res["count"] / errors, 4)}
+                for tag, res in sorted(tags.items(), key=lambda item: (-item[1]["seconds"], -item[1]["count"], item[0]))
+            },
+            "analyzer": analyzer.stats() if analyzer is not None else None,
+            "latency": Profiler.latency_report(analyzer.latencies()) if analyzer is not None else None
+        }
+        if self.trace_memory:
+            report["memory"] = {"peak_bytes": self.peak_memory, "stages": dict(self.memory)}
+        if len(self.profiles) > 0:
+            report["cprofile"] = self.dump_profiles()
+        return report
+
+    def save(self, path, analyzer = None):
+        report = self.report(analyzer)
+        directory = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=4)
+        return report
+
+
+class _ProfiledStage:
+
+    def __init__(self, profiler, stage):
+        self.profiler = profiler
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        profiler = self.profiler
+        if profiler.trace_memory and tracemalloc.is_tracing():
+            # peak of the previous stages is kept before the peak is reset for this stage
+            profiler.peak_memory = max(profiler.peak_memory, tracemalloc.get_traced_memory()[1])
+            tracemalloc.reset_peak()
+        profile = profiler.profiles.get(self.stage)
+        if profile is not None:
+            profile.enable()
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        profiler = self.profiler
+        profiler.timer.add(self.stage, time.perf_counter() - self.start)
+        profile = profiler.profiles.get(self.stage)
+        if profile is not None:
+            profile.disable()
+        if profiler.trace_memory and tracemalloc.is_tracing():
+            peak = tracemalloc.get_traced_memory()[1]
+            profiler.memory[self.stage] = max(profiler.memory.get(self.stage, 0), peak)
+            profiler.peak_memory = max(profiler.peak_memory, peak)
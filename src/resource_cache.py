@@ -0,0 +1,66 @@
+import hashlib
+import json
+import os
+
+from atomic_file import write_atomic
+
+
+# Compiled cache of the resource spreadsheets (metadata, TDK abbreviations)
+# a resource is compiled once from its source file into a small JSON file, later runs read the compiled file without pandas/openpyxl
+# a compiled file is valid while the size and mtime of the source are unchanged; if they changed, the content hash of the source decides
+# entries are written atomically (temp file + rename), so concurrent runs can share the same cache directory
+class ResourceCache:
+
+    VERSION = 1 # version of the compiled format (compiled files of other versions are rebuilt)
+
+    # constructor
+    def __init__(self, cache_dir):
+        self.cache_dir = cache_dir
+        # counters
+        self.hits = 0
+        self.compiles = 0
+
+    # compiled data of a resource, compile_source(source_path) returns the JSON-serializable data of the source
+    def load(self, name, source_path, compile_source):
+        stat = os.stat(source_path)
+        path = os.path.join(self.cache_dir, f"{name}.json")
+        entry = self._read(path)
+        if entry is not None and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns:
+            self.hits += 1
+            return entry["data"]
+
+        # source was touched (or never compiled): the content hash decides whether it must be compiled again
+        source_hash = ResourceCache.hash_file(source_path)
+        if entry is not None and entry["sha256"] == source_hash:
+            data = entry["data"]
+            self.hits += 1
+        else:
+            data = compile_source(source_path)
+            self.compiles += 1
+        self._write(path, {"version": ResourceCache.VERSION, "source": source_path, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "sha256": source_hash, "data": data})
+        return data
+
+    @staticmethod
+    def hash_file(path):
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+        return digest.hexdigest()
+
+    def stats(self):
+        return {"hits": self.hits, "compiles": self.compiles}
+
+    # compiled entry or None if it is missing, unreadable or of another version
+    def _read(self, path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(entry, dict) or entry.get("version") != ResourceCache.VERSION:
+            return None
+        return entry
+
+    def _write(self, path, entry):
+        write_atomic(path, lambda f: json.dump(entry, f, ensure_ascii=False), ".tmp-")
@@ -0,0 +1,100 @@
+from model.pos import POS
+from model.inflectional_feature import InfFeat
+from model.lexical_feature import LexFeat
+from model.unit import Unit
+from model.phenomenon import Phenomenon
+from model.level import Level
+
+
+# Mappers of every facet per error tag, compiled once from the predefined tagset mapping schema (see Helper.load_mapping_schema)
+# - UPOS/UIF/ULF: the single schema value of the tag selects the mapper ("-", taken from the analysis or a fixed value)
+# - Unit/Phenomenon/Level: a single schema value is a constant, several values are decided by the heuristic of the tag
+# mapping an error is then a single dict lookup (rules) followed by one call per facet
+class RuleRegistry:
+
+    FACETS = ["upos", "uif", "ulf", "unit", "phenomenon", "level"]
+
+    # constructor
+    def __init__(self, schema, strict = False):
+        self.schema = schema # error tag -> facet -> allowed values (as in the schema)
+        self.strict = strict # rejecting mapped values which are not allowed for the tag (see check)
+        unit_heuristics = Unit.heuristics()
+        phenomenon_heuristics = Phenomenon.heuristics()
+
+        self.rules = {} # error tag -> TagRules
+        self.allowed = {} # error tag -> (allowed units, allowed phenomena, allowed levels)
+        for tag, values in schema.items():
+            for facet in ["upos", "uif", "ulf", "level"]:
+                if len(values[facet]) != 1:
+                    raise ValueError(f"Mapping schema: error tag {tag} must have exactly one {facet.upper()} value, found {values[facet]}")
+            units = [Unit.fromSchema(value) for value in values["unit"]]
+            phenomena = [Phenomenon.fromSchema(value) for value in values["phenomenon"]]
+            level = Level.fromSchema(values["level"][0])
+
+            self.rules[tag] = TagRules(
+                POS.rule(values["upos"][0]),
+                InfFeat.rule(values["uif"][0]),
+                LexFeat.rule(values["ulf"][0]),
+                RuleRegistry.facet_rule(tag, "unit", units, unit_heuristics, lambda value: lambda err, token_list, overlap_flag, sentence, abbreviations_tdk, task_tokens: value),
+                RuleRegistry.facet_rule(tag, "phenomenon", phenomena, phenomenon_heuristics, lambda value: lambda err, token_list, overlap_flag, original_table, task_tokens: value),
+                lambda err, level=level: level
+            )
+            self.allowed[tag] = (frozenset(units), frozenset(phenomena), frozenset([level]))
+
+        # error tags which are not in the schema (rejected by the data validation) keep the behaviour of the former mappers
+        self.default = TagRules(POS.mapAnalysis, InfFeat.mapAnalysis, LexFeat.mapAnalysis,
+                                lambda err, token_list, overlap_flag, sentence, abbreviations_tdk, task_tokens: None,
+                                lambda err, token_list, overlap_flag, original_table, task_tokens: None,
+                                lambda err: Level.NONE)
+
+    # mapper of a facet with the given allowed values: a constant if there is a single value, otherwise the heuristic of the tag
+    @staticmethod
+    def facet_rule(tag, facet, values, heuristics, constant):
+        if len(values) == 1:
+            return constant(values[0])
+        if tag not in heuristics:
+            raise ValueError(f"Mapping schema allows several {facet} values for error tag {tag} ({[value.name for value in values]}), but there is no heuristic for it")
+        return heuristics[tag]
+
+    # mappers of an error tag
+    def get(self, tag):
+        return self.rules.get(tag, self.default)
+
+    # facet values of a mapped error which the schema does not allow for its tag, as "facet=value" strings
+    # NONE (and None) means that a heuristic could not decide and is not reported; list facets are checked for "-" (must be empty)
+    def violations(self, err):
+        values = self.schema.get(err.errType)
+        if values is None:
+            return []
+        tax = err.errTax
+        units, phenomena, levels = self.allowed[err.errType]
+        res = []
+        for facet, items in [("upos", tax.pos), ("uif", tax.infFeat), ("ulf", tax.lexFeat)]:
+            if values[facet][0] == "-" and len(items) > 0:
+                res.append(f"{facet}={items}")
+        if tax.unit not in units and tax.unit not in [Unit.NONE, None]:
+            res.append(f"unit={tax.unit.name}")
+        if tax.phenomenon not in phenomena and tax.phenomenon not in [Phenomenon.NONE, None]:
+            res.append(f"phenomenon={tax.phenomenon.name}")
+        if tax.level not in levels:
+            res.append(f"level={tax.level.name}")
+        return res
+
+    # raising an error for a mapped error with values the schema does not allow (only if strict)
+    def check(self, err):
+        if self.strict:
+            res = self.violations(err)
+            if len(res) > 0:
+                raise ValueError(f"Error {err.id} ({err.errType}) has facet values which the mapping schema does not allow: {', '.join(res)}")
+
+
+# Mappers of the facets of an error tag
+class TagRules:
+    # constructor
+    def __init__(self, pos, inf_feat, lex_feat, unit, phenomenon, level):
+        self.pos = pos # (err, token_list, overlap_flag, task_tokens) -> list of (FORM, UPOS, XPOS)
+        self.inf_feat = inf_feat # (err, token_list, overlap_flag, task_tokens) -> list of (FORM, FEATS)
+        self.lex_feat = lex_feat # (err, token_list, overlap_flag, task_tokens) -> list of (FORM, FEATS)
+        self.unit = unit # (err, token_list, overlap_flag, sentence, abbreviations_tdk, task_tokens) -> Unit
+        self.phenomenon = phenomenon # (err, token_list, overlap_flag, original_table, task_tokens) -> Phenomenon
+        self.level = level # (err) -> Level
@@ -0,0 +1,263 @@
+import json
+import os
+
+
+# Output sinks for enriched errors
+# records (Error.to_dict()) are written as soon as they are produced and flushed in chunks,
+# so memory stays flat and downstream jobs can consume the output before the run finishes
+class OutputSink:
+
+    FORMATS = ["jsonl", "json", "parquet", "arrow"]
+
+    # constructor
+    def __init__(self, path, flush_every = 100):
+        self.path = path
+        self.flush_every = flush_every # number of records buffered before they are written to the file
+        self.count = 0 # number of records written
+        self.buffer = []
+
+        directory = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        self.file = open(path, "w", encoding="utf-8")
+
+    # creating a sink for the given format
+    @staticmethod
+    def create(path, fmt = "jsonl", flush_every = 100):
+        if fmt == "jsonl":
+            return JsonLinesSink(path, flush_every)
+        if fmt == "json":
+            return JsonArraySink(path, flush_every)
+        if fmt == "parquet":
+            return ParquetSink(path, flush_every)
+        if fmt == "arrow":
+            return ArrowSink(path, flush_every)
+        raise ValueError(f"Unknown output format: {fmt} (expected one of {OutputSink.FORMATS})")
+
+    def write(self, record):
+        self.buffer.append(self.encode(record))
+        self.count += 1
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) > 0:
+            self.file.write("".join(self.buffer))
+            self.buffer = []
+        self.file.flush()
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.flush()
+        self.file.close()
+
+    def encode(self, record):
+        raise NotImplementedError
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+# compact JSON Lines: one record per line
+class JsonLinesSink(OutputSink):
+
+    def encode(self, record):
+        return json.dumps(record, ensure_ascii=False, separators=(",", ":")) + "\n"
+
+
+# JSON array with indent=4 (same bytes as json.dump(records, f, ensure_ascii=False, indent=4)), written incrementally
+class JsonArraySink(OutputSink):
+
+    def encode(self, record):
+        element = "    " + json.dumps(record, ensure_ascii=False, indent=4).replace("\n", "\n    ")
+        return ("[\n" if self.count == 0 else ",\n") + element
+
+    def close(self):
+        if self.file.closed:
+            return
+        self.buffer.append("\n]" if self.count > 0 else "[]")
+        super().close()
+
+
+# Columnar output (optional dependency: pyarrow) for analytics over many errors without parsing JSON
+# two tables are written: the errors (one row per record, taxonomy and metadata flattened into columns) to the output path,
+# and the per-token taxonomy rows (pos, infFeat, lexFeat items) to <output path without extension>.tokens.<extension>
+# joined on (idLabelStudio, id); enum values, error tags, metadata fields and other repeated strings are dictionary-encoded
+# records are buffered and written as one batch (a Parquet row group or an Arrow record batch) of at least BATCH_ROWS records
+class ColumnarSink(OutputSink):
+
+    BATCH_ROWS = 10000 # minimum number of records per batch (row groups of a few records would make the files slow to scan)
+    CUMULATIVE_DICTIONARIES = True # dictionaries extended across batches (False: one dictionary per batch)
+
+    # error columns: (name, type, dictionary-encoded)
+    ERROR_COLUMNS = [
+        ("id", "string", False),
+        ("idLabelStudio", "int64", False),
+        ("idData", "int64", False),
+        ("rawText", "string", True), # repeated for every error of a task
+        ("idxStartErr", "int64", False),
+        ("idxEndErr", "int64", False),
+        ("incorrText", "string", False),
+        ("errType", "string", True),
+        ("corrText", "string", False),
+        ("unit", "string", True),
+        ("phenomenon", "string", True),
+        ("level", "string", True),
+        ("metadataId", "int64", False),
+        ("nationality", "string", True),
+        ("gender", "string", True),
+        ("topic", "string", True)
+    ]
+
+    # token columns: facet is the list of the taxonomy the row comes from (pos, infFeat or lexFeat), position is the index in the list
+    TOKEN_COLUMNS = [
+        ("idLabelStudio", "int64", False),
+        ("id", "string", False),
+        ("facet", "string", True),
+        ("position", "int32", False),
+        ("form", "string", False),
+        ("pos", "string", True),
+        ("xpos", "string", True),
+        ("feats", "string", True)
+    ]
+
+    # constructor
+    def __init__(self, path, flush_every = 100):
+        try:
+            import pyarrow
+        except ImportError as e:
+            raise ImportError(f"The {self.FORMAT} output format needs the pyarrow package (pip install pyarrow).") from e
+        self.pa = pyarrow
+        self.path = path
+        self.tokens_path = ColumnarSink.tokens_path_for(path)
+        self.flush_every = max(flush_every, ColumnarSink.BATCH_ROWS)
+        self.count = 0 # number of records written
+        self.token_count = 0 # number of token rows written
+        self.buffer = []
+        self.closed = False
+
+        # with cumulative dictionaries, dictionaries grow across batches (each batch extends the dictionary of the previous one, which Arrow IPC files store as deltas)
+        # otherwise every batch has its own dictionary of the values it uses
+        self.dictionaries = {} # (table, column) -> {value: index}
+
+        directory = os.path.dirname(path)
+        if directory != "":
+            os.makedirs(directory, exist_ok=True)
+        self.error_schema = self.schema(ColumnarSink.ERROR_COLUMNS)
+        self.token_schema = self.schema(ColumnarSink.TOKEN_COLUMNS)
+        self.error_writer = self.open_writer(self.path, self.error_schema)
+        self.token_writer = self.open_writer(self.tokens_path, self.token_schema)
+
+    # path of the token table of an output path (results_x.parquet -> results_x.tokens.parquet)
+    @staticmethod
+    def tokens_path_for(path):
+        root, ext = os.path.splitext(path)
+        return f"{root}.tokens{ext}"
+
+    def schema(self, columns):
+        pa = self.pa
+        fields = []
+        for name, type_name, dictionary in columns:
+            value_type = getattr(pa, type_name)()
+            fields.append(pa.field(name, pa.dictionary(pa.int32(), value_type) if dictionary else value_type))
+        return pa.schema(fields)
+
+    def open_writer(self, path, schema):
+        raise NotImplementedError
+
+    def write_batch(self, writer, batch):
+        raise NotImplementedError
+
+    def write(self, record):
+        self.buffer.append(record)
+        self.count += 1
+        if len(self.buffer) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if len(self.buffer) == 0:
+            return
+        errors = {name: [] for name, _, _ in ColumnarSink.ERROR_COLUMNS}
+        tokens = {name: [] for name, _, _ in ColumnarSink.TOKEN_COLUMNS}
+        for record in self.buffer:
+            tax = record["errTax"] or {}
+            metadata = record["metadata"] or {}
+            for name in ["id", "idLabelStudio", "idData", "rawText", "idxStartErr", "idxEndErr", "incorrText", "errType", "corrText"]:
+                errors[name].append(record[name])
+            for name in ["unit", "phenomenon", "level"]:
+                errors[name].append(tax.get(name))
+            errors["metadataId"].append(metadata.get("id"))
+            for name in ["nationality", "gender", "topic"]:
+                errors[name].append(metadata.get(name))
+
+            for facet in ["pos", "infFeat", "lexFeat"]:
+                for position, item in enumerate(tax.get(facet, [])):
+                    tokens["idLabelStudio"].append(record["idLabelStudio"])
+                    tokens["id"].append(record["id"])
+                    tokens["facet"].append(facet)
+                    tokens["position"].append(position)
+                    tokens["form"].append(item["form"])
+                    tokens["pos"].append(item.get("pos"))
+                    tokens["xpos"].append(item.get("xpos"))
+                    tokens["feats"].append(item.get("feats"))
+        self.buffer = []
+
+        self.write_batch(self.error_writer, self.batch("errors", self.error_schema, errors))
+        if len(tokens["id"]) > 0:
+            self.write_batch(self.token_writer, self.batch("tokens", self.token_schema, tokens))
+            self.token_count += len(tokens["id"])
+
+    # record batch of the given columns, dictionary columns are encoded with the dictionaries of the sink
+    def batch(self, table, schema, columns):
+        pa = self.pa
+        arrays = []
+        for field in schema:
+            values = columns[field.name]
+            if pa.types.is_dictionary(field.type):
+                dictionary = self.dictionaries.setdefault((table, field.name), {}) if self.CUMULATIVE_DICTIONARIES else {}
+                indices = [None if value is None else dictionary.setdefault(value, len(dictionary)) for value in values]
+                arrays.append(pa.DictionaryArray.from_arrays(pa.array(indices, type=field.type.index_type), pa.array(list(dictionary), type=field.type.value_type)))
+            else:
+                arrays.append(pa.array(values, type=field.type))
+        return pa.RecordBatch.from_arrays(arrays, schema=schema)
+
+    def close(self):
+        if self.closed:
+            return
+        self.flush()
+        self.error_writer.close()
+        self.token_writer.close()
+        self.closed = True
+
+
+# Parquet files (one row group per batch), e.g. pandas.read_parquet(path) or pyarrow.parquet.read_table(path, memory_map=True)
+# every row group stores its dictionaries, so a batch only carries the values it uses (a cumulative dictionary would repeat all earlier values)
+class ParquetSink(ColumnarSink):
+
+    FORMAT = "parquet"
+    CUMULATIVE_DICTIONARIES = False
+
+    def open_writer(self, path, schema):
+        import pyarrow.parquet
+        return pyarrow.parquet.ParquetWriter(path, schema)
+
+    def write_batch(self, writer, batch):
+        writer.write_batch(batch, row_group_size=batch.num_rows)
+
+
+# Arrow IPC files (one record batch per batch), e.g. pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all() without copying
+class ArrowSink(ColumnarSink):
+
+    FORMAT = "arrow"
+    CUMULATIVE_DICTIONARIES = True
+
+    def open_writer(self, path, schema):
+        pa = self.pa
+        return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(emit_dictionary_deltas=True))
+
+    def write_batch(self, writer, batch):
+        writer.write_batch(batch)
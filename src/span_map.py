@@ -0,0 +1,51 @@
+from bisect import bisect_left, bisect_right
+
+
+# Piecewise offset map from positions of the original text to positions of the reconstructed (corrected) text
+# edits are the replaced spans (original start, original end, new start, new end), sorted and not nested in each other
+# positions outside the edits are shifted by the length change of the edits before them, lookups use bisect (O(log n))
+class OffsetMap:
+    # constructor
+    def __init__(self, edits):
+        self.starts = [edit[0] for edit in edits] # original start of each edit
+        self.ends = [edit[1] for edit in edits] # original end of each edit
+        self.new_starts = [edit[2] for edit in edits] # start of each edit in the reconstructed text
+        self.new_ends = [edit[3] for edit in edits] # end of each edit in the reconstructed text
+
+    # position in the reconstructed text (positions inside a replaced span are mapped to the start of its correction)
+    def position(self, pos):
+        i = bisect_right(self.starts, pos) - 1
+        if i < 0:
+            return pos
+        if pos == self.starts[i]:
+            return self.new_starts[i]
+        if pos < self.ends[i]:
+            return self.new_starts[i]
+        return pos - self.ends[i] + self.new_ends[i]
+
+    # (start, end) of a span in the reconstructed text, a replaced span is mapped to its correction
+    def span(self, start, end):
+        i = bisect_left(self.starts, start)
+        if i < len(self.starts) and self.starts[i] == start and self.ends[i] == end:
+            return self.new_starts[i], self.new_ends[i]
+        return self.position(start), self.position(end)
+
+
+# Spans of the corrections of a task in the reconstructed text (see Helper.get_reconstructed_task_data)
+# every corrected result is covered by a replaced span: its own span, or the widest span it is nested in (overlap)
+class SpanMap:
+    # constructor
+    def __init__(self, offsets, cover):
+        self.offsets = offsets # OffsetMap of the replaced spans
+        self.cover = cover # result id -> (original start, original end, overlap flag) of the replaced span covering the result
+
+    # number of resolved corrections
+    def __len__(self):
+        return len(self.cover)
+
+    # indices of the error in the reconstructed text and whether it is covered by an overlapping (wider) error
+    # returns (start_for_tokenrange, end_for_tokenrange, overlap_flag)
+    def token_range(self, result_id):
+        start, end, overlap_flag = self.cover[result_id]
+        new_start, new_end = self.offsets.span(start, end)
+        return new_start, new_end, overlap_flag
@@ -0,0 +1,46 @@
+import time
+
+
+# Accumulated wall-clock time and number of calls per stage (load, validate, reconstruct, analyze, mappers, ...)
+# components take an optional timer and skip timing completely if it is None
+class StageTimer:
+    # constructor
+    def __init__(self):
+        self.seconds = {} # stage -> total seconds
+        self.counts = {} # stage -> number of timed calls
+
+    def add(self, stage, seconds, count = 1):
+        self.seconds[stage] = self.seconds.get(stage, 0.0) + seconds
+        self.counts[stage] = self.counts.get(stage, 0) + count
+
+    # adding the time since start to the stage, returns the current time (start of the next stage)
+    def lap(self, stage, start):
+        now = time.perf_counter()
+        self.add(stage, now - start)
+        return now
+
+    # timing a block: with timer.stage("validate"): ...
+    def stage(self, stage):
+        return _StageBlock(self, stage)
+
+    def merge(self, other):
+        for stage, seconds in other.seconds.items():
+            self.add(stage, seconds, other.counts[stage])
+
+    def report(self):
+        return {stage: {"seconds": round(seconds, 6), "count": self.counts[stage]} for stage, seconds in self.seconds.items()}
+
+
+class _StageBlock:
+
+    def __init__(self, timer, stage):
+        self.timer = timer
+        self.stage = stage
+        self.start = 0.0
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.timer.add(self.stage, time.perf_counter() - self.start)
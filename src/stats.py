@@ -0,0 +1,337 @@
+import argparse
+import glob
+import json
+import os
+import sys
+import time
+import numpy as np
+from helper import Helper
+from sinks import OutputSink
+from token_counts import TokenCounts
+
+
+# Error distributions of the enriched errors (outputs of the extender) by taxonomy facet and learner metadata
+# facets are integer-coded while the outputs are read, then every error facet becomes one contingency tensor
+# (facet value x nationality x gender x topic) built with a single bincount; marginals and cross-tabs are sums over its axes
+# errors per 1,000 tokens use the token counts written next to the outputs (see TokenCounts), tasks without them are left out of the rates
+# confidence intervals come from a bootstrap over the tasks (texts are resampled, errors of a text are not independent)
+# run with: python src/main.py stats ./output --output ./output/stats.json
+class CorpusStats:
+
+    ERROR_FACETS = ["level", "unit", "phenomenon", "errType"] # facets of the errors
+    META_FACETS = ["nationality", "gender", "topic"] # metadata of the learners (per task)
+    UNKNOWN = "" # value of a missing facet (e.g. a task without metadata)
+
+    # constructor
+    def __init__(self):
+        self.values = {facet: {} for facet in CorpusStats.ERROR_FACETS + CorpusStats.META_FACETS} # facet -> value -> code
+        self.tasks = {} # (file index, task id) -> task index
+        self.task_meta = {facet: [] for facet in CorpusStats.META_FACETS} # task index -> metadata code
+        self.task_tokens = [] # task index -> number of tokens (-1 if unknown)
+        self.error_tasks = [] # task index of each error (arrays per file, concatenated by report)
+        self.error_codes = {facet: [] for facet in CorpusStats.ERROR_FACETS} # facet -> codes of the errors (arrays per file)
+        self.files = []
+        self.metadata = None # data ID -> (id, nationality, gender, topic), loaded on first use (see _metadata_of)
+
+    # code of a facet value
+    def code(self, facet, value):
+        codes = self.values[facet]
+        return codes.setdefault(CorpusStats.UNKNOWN if value is None else value, len(codes))
+
+    # index of a task, metadata is taken from the first error of the task (or from the metadata file for tasks without errors)
+    def task(self, file_idx, task_id, metadata = None):
+        key = (file_idx, task_id)
+        idx = self.tasks.get(key)
+        if idx is None:
+            idx = self.tasks[key] = len(self.tasks)
+            self.task_tokens.append(-1)
+            for facet in CorpusStats.META_FACETS:
+                self.task_meta[facet].append(self.code(facet, metadata.get(facet) if metadata is not None else None))
+        return idx
+
+    # output files of the given paths: files, directories (results_* outputs) and glob patterns
+    @staticmethod
+    def expand_outputs(items):
+        paths = []
+        for item in items:
+            if os.path.isdir(item):
+                candidates = sorted(glob.glob(os.path.join(item, "results_*")))
+            elif glob.has_magic(item):
+                candidates = sorted(glob.glob(item))
+            else:
+                paths.append(item)
+                continue
+            for path in candidates:
+                name, ext = os.path.splitext(os.path.basename(path))
+                if ext[1:] in OutputSink.FORMATS and not name.endswith((".tokens", ".counts", ".manifest")):
+                    paths.append(path)
+        return list(dict.fromkeys(paths))
+
+    # reading an output file (format by extension) and its token counts
+    def add_file(self, path):
+        file_idx = len(self.files)
+        self.files.append(path)
+        ext = os.path.splitext(path)[1][1:]
+        if ext in ["parquet", "arrow"]:
+            n = self._add_columnar(file_idx, path, ext)
+        else:
+            n = self._add_records(file_idx, path, ext)
+
+        counts = TokenCounts.load(TokenCounts.path_for(path))
+        if counts is not None:
+            for task_id, entry in counts.items():
+                idx = self.tasks.get((file_idx, task_id))
+                if idx is None: # task without errors, its metadata comes from the metadata file
+                    idx = self.task(file_idx, task_id, self._metadata_of(entry["idData"]))
+                self.task_tokens[idx] = entry["tokens"]
+        return {"path": path, "errors": n, "token_counts": counts is not None}
+
+    def _add_records(self, file_idx, path, fmt):
+        with open(path, "r", encoding="utf-8") as f:
+            records = json.load(f) if fmt == "json" else (json.loads(line) for line in f if line.strip() != "")
+            tasks = []
+            codes = {facet: [] for facet in CorpusStats.ERROR_FACETS}
+            for record in records:
+                idx = self.tasks.get((file_idx, record["idLabelStudio"]))
+                if idx is None:
+                    idx = self.task(file_idx, record["idLabelStudio"], record["metadata"])
+                tasks.append(idx)
+                tax = record["errTax"] or {}
+                for facet in ["level", "unit", "phenomenon"]:
+                    codes[facet].append(self.code(facet, tax.get(facet)))
+                codes["errType"].append(self.code("errType", record["errType"]))
+        self.error_tasks.append(np.array(tasks, dtype=np.int64))
+        for facet in CorpusStats.ERROR_FACETS:
+            self.error_codes[facet].append(np.array(codes[facet], dtype=np.int64))
+        return len(tasks)
+
+    # dictionary-encoded columns are recoded through their dictionaries (one lookup per distinct value, not per error)
+    def _add_columnar(self, file_idx, path, fmt):
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError as e:
+            raise ImportError(f"Reading {fmt} outputs needs the pyarrow package (pip install pyarrow).") from e
+        columns = ["idLabelStudio"] + CorpusStats.ERROR_FACETS + CorpusStats.META_FACETS
+        if fmt == "parquet":
+            table = pyarrow.parquet.read_table(path, columns=columns, memory_map=True)
+        else:
+            table = pyarrow.ipc.open_file(pyarrow.memory_map(path)).read_all().select(columns)
+
+        # tasks: first error of every task
+        task_ids = table.column("idLabelStudio").to_numpy()
+        unique_ids, first, inverse = np.unique(task_ids, return_index=True, return_inverse=True)
+        meta = {facet: self._recode(facet, table.column(facet)) for facet in CorpusStats.META_FACETS}
+        task_index = np.empty(len(unique_ids), dtype=np.int64)
+        for i, (task_id, row) in enumerate(zip(unique_ids.tolist(), first.tolist())):
+            idx = self.tasks.get((file_idx, task_id))
+            if idx is None:
+                idx = self.tasks[(file_idx, task_id)] = len(self.tasks)
+                self.task_tokens.append(-1)
+                for facet in CorpusStats.META_FACETS:
+                    self.task_meta[facet].append(int(meta[facet][row]))
+            task_index[i] = idx
+
+        self.error_tasks.append(task_index[inverse.reshape(-1)])
+        for facet in CorpusStats.ERROR_FACETS:
+            self.error_codes[facet].append(self._recode(facet, table.column(facet)))
+        return table.num_rows
+
+    # global codes of a (dictionary-encoded) column, nulls are coded as UNKNOWN
+    def _recode(self, facet, column):
+        import pyarrow
+        if not pyarrow.types.is_dictionary(column.type):
+            column = column.dictionary_encode()
+        res = []
+        for chunk in column.chunks:
+            lookup = [self.code(facet, value) for value in chunk.dictionary.to_pylist()]
+            indices = chunk.indices
+            if indices.null_count > 0:
+                lookup.append(self.code(facet, None))
+                indices = indices.fill_null(len(chunk.dictionary))
+            res.append(np.array(lookup, dtype=np.int64)[indices.to_numpy()])
+        return np.concatenate(res) if len(res) > 0 else np.zeros(0, dtype=np.int64)
+
+    # metadata of a data id from the metadata file (loaded once, for tasks without errors only)
+    def _metadata_of(self, data_id):
+        if self.metadata is None:
+            self.metadata = Helper.load_metadata()
+        row = self.metadata.get(data_id)
+        if row is None:
+            return None
+        return {"nationality": row[1], "gender": row[2], "topic": row[3]}
+
+    # labels of a facet in report order (sorted)
+    def labels(self, facet):
+        return sorted(self.values[facet])
+
+    # reading code -> report code of a facet (codes are assigned while reading, the report uses sorted labels)
+    def recoding(self, facet):
+        res = np.empty(len(self.values[facet]), dtype=np.int64)
+        for code, label in enumerate(self.labels(facet)):
+            res[self.values[facet][label]] = code
+        return res
+
+    # contingency tensors and report (bootstrap: number of resamples, 0 disables the confidence intervals)
+    # values and tasks are put in a canonical order first (sorted labels, tasks by file and id), so the report and its resamples
+    # do not depend on the format or the order the outputs were read in
+    def report(self, bootstrap = 1000, confidence = 0.95, seed = 0):
+        order = np.array([self.tasks[key] for key in sorted(self.tasks)], dtype=np.int64) # report task -> reading task
+        task_index = np.empty(len(order), dtype=np.int64) # reading task -> report task
+        task_index[order] = np.arange(len(order))
+        error_tasks = task_index[np.concatenate(self.error_tasks)] if len(self.error_tasks) > 0 else np.zeros(0, dtype=np.int64)
+        task_tokens = np.array(self.task_tokens, dtype=np.float64)[order]
+        counted = task_tokens >= 0 # tasks with token counts
+        task_meta = {facet: self.recoding(facet)[np.array(self.task_meta[facet], dtype=np.int64)[order]] for facet in CorpusStats.META_FACETS}
+        meta_shape = tuple(len(self.values[facet]) for facet in CorpusStats.META_FACETS)
+        n_tasks = len(self.tasks)
+
+        # metadata cell of every task and error (nationality x gender x topic, raveled)
+        task_cell = np.ravel_multi_index(tuple(task_meta[facet] for facet in CorpusStats.META_FACETS), meta_shape) if n_tasks > 0 else np.zeros(0, dtype=np.int64)
+        error_cell = task_cell[error_tasks]
+        error_counted = counted[error_tasks] # errors of the tasks with token counts (numerators of the rates)
+        n_cells = int(np.prod(meta_shape))
+        tokens = np.bincount(task_cell[counted], weights=task_tokens[counted], minlength=n_cells).reshape(meta_shape)
+        rng = np.random.default_rng(seed)
+        quantiles = [(1 - confidence) / 2 * 100, (1 + confidence) / 2 * 100]
+
+        report = {
+            "files": [],
+            "errors": int(len(error_tasks)),
+            "tasks": n_tasks,
+            "tasks_without_token_counts": int(n_tasks - counted.sum()),
+            "tokens": int(task_tokens[counted].sum()),
+            "bootstrap": {"resamples": bootstrap, "confidence": confidence, "seed": seed},
+            "facets": {},
+            "metadata": {}
+        }
+
+        # errors per task (of the tasks with token counts) for the overall and per-group rates
+        errors_per_task = np.bincount(error_tasks, minlength=n_tasks).astype(np.float64)
+        weights = CorpusStats.resample(rng, int(counted.sum()), bootstrap) # shared by the overall and the per-facet rates
+        total_rate, total_ci = CorpusStats.rate_with_ci(errors_per_task[counted][:, None], task_tokens[counted], weights, quantiles)
+        report["per_1k_tokens"] = {"rate": total_rate[0], "ci": total_ci[0]}
+
+        for axis, meta in enumerate(CorpusStats.META_FACETS):
+            labels = self.labels(meta)
+            group_tokens = tokens.sum(axis=tuple(i for i in range(len(meta_shape)) if i != axis))
+            res = {}
+            for code, label in enumerate(labels):
+                members = counted & (task_meta[meta] == code)
+                rate, ci = CorpusStats.rate_with_ci(errors_per_task[members][:, None], task_tokens[members], CorpusStats.resample(rng, int(members.sum()), bootstrap), quantiles)
+                res[label] = {"tasks": int((task_meta[meta] == code).sum()), "tokens": int(group_tokens[code]), "errors": int((task_meta[meta][error_tasks] == code).sum()),
+                              "per_1k_tokens": rate[0], "ci": ci[0]}
+            report["metadata"][meta] = res
+
+        for facet in CorpusStats.ERROR_FACETS:
+            codes = self.recoding(facet)[np.concatenate(self.error_codes[facet])] if len(self.error_codes[facet]) > 0 else np.zeros(0, dtype=np.int64)
+            labels = self.labels(facet)
+            n_values = len(labels)
+
+            # contingency tensor: facet value x nationality x gender x topic
+            tensor = np.bincount(codes * n_cells + error_cell, minlength=n_values * n_cells).reshape((n_values,) + meta_shape)
+            marginal = tensor.reshape(n_values, -1).sum(axis=1)
+            counted_tensor = np.bincount((codes * n_cells + error_cell)[error_counted], minlength=n_values * n_cells).reshape((n_values,) + meta_shape)
+
+            # per-task counts of the facet values (tasks with token counts) for the bootstrap of the rates
+            per_task = np.bincount(error_tasks * n_values + codes, minlength=n_tasks * n_values).reshape(n_tasks, n_values).astype(np.float64)
+            rates, cis = CorpusStats.rate_with_ci(per_task[counted], task_tokens[counted], weights, quantiles)
+
+            res = {
+                "marginal": {label: int(marginal[code]) for code, label in enumerate(labels)},
+                "share": {label: CorpusStats.ratio(marginal[code], marginal.sum()) for code, label in enumerate(labels)},
+                "per_1k_tokens": {label: {"rate": rates[code], "ci": cis[code]} for code, label in enumerate(labels)},
+                "by": {}
+            }
+            for axis, meta in enumerate(CorpusStats.META_FACETS):
+                other = tuple(i + 1 for i in range(len(meta_shape)) if i != axis)
+                crosstab = tensor.sum(axis=other) # facet value x metadata value
+                counted_crosstab = counted_tensor.sum(axis=other) # same for the tasks with token counts
+                group_tokens = tokens.sum(axis=tuple(i - 1 for i in other))
+                res["by"][meta] = {
+                    meta_label: {
+                        "counts": {label: int(crosstab[code, meta_code]) for code, label in enumerate(labels) if crosstab[code, meta_code] > 0},
+                        "per_1k_tokens": {label: CorpusStats.ratio(1000 * counted_crosstab[code, meta_code], group_tokens[meta_code]) for code, label in enumerate(labels) if crosstab[code, meta_code] > 0}
+                    }
+                    for meta_code, meta_label in enumerate(self.labels(meta))
+                }
+            report["facets"][facet] = res
+        return report
+
+    # errors per 1,000 tokens of every column of counts (tasks x values) and its bootstrap confidence interval
+    # weights: bootstrap weights of the tasks (see resample), None for no confidence intervals
+    @staticmethod
+    def rate_with_ci(counts, tokens, weights, quantiles):
+        total_tokens = tokens.sum()
+        rates = [CorpusStats.ratio(1000 * value, total_tokens) for value in counts.sum(axis=0)]
+        if weights is None or total_tokens == 0:
+            return rates, [None] * counts.shape[1]
+        resampled_tokens = weights @ tokens
+        with np.errstate(divide="ignore", invalid="ignore"):
+            resampled = 1000 * (weights @ counts) / resampled_tokens[:, None]
+        # resamples without tokens (only possible if some tasks have no tokens) have no rate
+        bounds = np.percentile(resampled, quantiles, axis=0) if resampled_tokens.all() else np.nanpercentile(resampled, quantiles, axis=0)
+        return rates, [[round(float(bounds[0, i]), 4), round(float(bounds[1, i]), 4)] for i in range(counts.shape[1])]
+
+    # bootstrap resamples of n tasks as task weights (resamples x tasks, how often each task is drawn), None if there is nothing to resample
+    # all rates of the same tasks share the weights, so a resampled rate is a single matrix product for all facet values
+    @staticmethod
+    def resample(rng, n, bootstrap):
+        if bootstrap <= 0 or n == 0:
+            return None
+        draws = rng.integers(0, n, size=(bootstrap, n)) + n * np.arange(bootstrap)[:, None]
+        return np.bincount(draws.reshape(-1), minlength=bootstrap * n).reshape(bootstrap, n).astype(np.float64)
+
+    @staticmethod
+    def ratio(value, total):
+        return round(float(value) / float(total), 4) if total > 0 else None
+
+    @staticmethod
+    def print_report(report, top = 10):
+        print(f"Errors: {report['errors']} in {report['tasks']} tasks ({report['tokens']} tokens, {report['per_1k_tokens']['rate']} errors per 1,000 tokens, CI {report['per_1k_tokens']['ci']})")
+        if report["tasks_without_token_counts"] > 0:
+            print(f"Warning: {report['tasks_without_token_counts']} tasks have no token counts (outputs of an older run?), they are left out of the rates.")
+        for meta, groups in report["metadata"].items():
+            print(f"\nErrors per 1,000 tokens by {meta}:")
+            for label, res in sorted(groups.items(), key=lambda item: -item[1]["errors"])[:top]:
+                print(f"  {label or '(unknown)':<24} {res['errors']:>7} errors  {res['tokens']:>8} tokens  {res['per_1k_tokens']}  CI {res['ci']}")
+        for facet, res in report["facets"].items():
+            print(f"\n{facet}:")
+            for label, count in sorted(res["marginal"].items(), key=lambda item: -item[1])[:top]:
+                rate = res["per_1k_tokens"][label]
+                print(f"  {label or '(none)':<24} {count:>7}  {res['share'][label]:>7}  {rate['rate']} per 1,000 tokens  CI {rate['ci']}")
+
+
+# stats command (python src/main.py stats ... or python src/stats.py ...), returns the exit code
+def main(argv=None, prog=None):
+    parser = argparse.ArgumentParser(prog=prog, description="Error distributions of the enriched errors by taxonomy facet and learner metadata")
+    parser.add_argument("paths", nargs="+", metavar="path", help="Output files of the extender (jsonl, json, parquet or arrow), directories (their results_* files) or glob patterns.")
+    parser.add_argument("--output", default="./output/stats.json", help="JSON report of the statistics.")
+    parser.add_argument("--bootstrap", type=int, default=1000, help="Number of bootstrap resamples (over tasks) for the confidence intervals (0 disables them).")
+    parser.add_argument("--confidence", type=float, default=0.95, help="Confidence level of the bootstrap intervals.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the bootstrap resamples.")
+    parser.add_argument("--top", type=int, default=10, help="Number of values printed per facet.")
+    args = parser.parse_args(argv)
+
+    paths = CorpusStats.expand_outputs(args.paths)
+    if len(paths) == 0:
+        parser.error(f"No output files found for {args.paths}")
+    started = time.perf_counter()
+    stats = CorpusStats()
+    files = [stats.add_file(path) for path in paths]
+    report = stats.report(args.bootstrap, args.confidence, args.seed)
+    report["files"] = files
+    report["seconds"] = round(time.perf_counter() - started, 3)
+    CorpusStats.print_report(report, args.top)
+
+    directory = os.path.dirname(args.output)
+    if directory != "":
+        os.makedirs(directory, exist_ok=True)
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(report, f, ensure_ascii=False, indent=4)
+    print(f"\nStatistics: {args.output} ({report['seconds']} seconds)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,24 @@
+
+# Per-task lookup structures, built once per task after reconstruction
+# replaces the linear scans over the results of the task in the inner loop of main.run
+class TaskContext:
+    # constructor
+    def __init__(self, task, span_map):
+        self.task = task # task of Label Studio's json export
+        self.span_map = span_map # span map of the task (see Helper.get_reconstructed_task_data)
+
+        # corrected text of each result (textarea type results carry the corrected form)
+        self.corrections = {}
+        for result in task["annotations"][0]["result"]:
+            if result["type"] == "textarea":
+                self.corrections.setdefault(result["id"], result["value"]["text"][0])
+
+    # corrected text of a result, None if the result has no correction
+    def corrected_text(self, result_id):
+        return self.corrections.get(result_id)
+
+    # indices of the error in the reconstructed text and whether it is covered by an overlapping (wider) error
+    # returns (start_for_tokenrange, end_for_tokenrange, overlap_flag)
+    # important: always the same biggest span is refered for nested overlapping spans and for the errors of the same span
+    def token_range(self, result_id):
+        return self.span_map.token_range(result_id)
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import config
+from atomic_file import write_atomic
+
+
+# Manifest of an output file for incremental re-runs
+# records a content hash of every task (data and annotations) together with the output records produced for it,
+# a re-run reprocesses only the tasks whose hash changed and carries the records of the other tasks forward
+# the manifest is valid only for the same fingerprint (rule code, UDPipe2 model and resource files), otherwise all tasks are reprocessed
+# file format: JSON Lines, a header line with the fingerprint followed by one line per task ({"id", "updated_at", "hash", "records", "tokens"})
+class TaskManifest:
+
+    VERSION = 1 # version of the manifest format
+
+    # constructor
+    def __init__(self, path, fingerprint = None):
+        self.path = path
+        self.fingerprint = fingerprint if fingerprint is not None else TaskManifest.current_fingerprint()
+        self.previous = {} # task id -> entry of the previous run
+        self.entries = {} # task id -> entry of the current run
+        self.carried = 0 # number of tasks whose records are carried forward
+        self.processed = 0 # number of tasks processed in the current run
+        self.load()
+
+    # manifest path of an output file (stored next to the output)
+    @staticmethod
+    def path_for(output):
+        return os.path.splitext(output)[0] + ".manifest.jsonl"
+
+    # content hash of a (compact) task: data and annotations (ids, spans, labels and corrections)
+    @staticmethod
+    def task_hash(task):
+        content = json.dumps({"data": task["data"], "annotations": task["annotations"]}, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+        return hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+    # fingerprint of everything else the records depend on (model: identifier of the analyzer model, see Pipeline.model_id)
+    @staticmethod
+    def current_fingerprint(model = None):
+        src_dir = os.path.dirname(os.path.abspath(__file__))
+        code_files = []
+        for root, dirs, files in os.walk(src_dir):
+            dirs[:] = sorted(d for d in dirs if d != "__pycache__")
+            code_files.extend(os.path.join(root, f) for f in sorted(files) if f.endswith(".py"))
+        return {
+            "manifest": TaskManifest.VERSION,
+            "version": config.VERSION,
+            "model": model if model is not None else config.UDPIPE2_MODEL,
+            "code": TaskManifest.hash_files(code_files, src_dir),
+            "resources": TaskManifest.hash_files([config.METADATA_FILE, config.ABBREVIATIONS_TDK_FILE, config.MAPPING_SCHEMA_FILE])
+        }
+
+    @staticmethod
+    def hash_files(paths, base_dir = None):
+        digest = hashlib.sha256()
+        for path in paths:
+            digest.update((os.path.relpath(path, base_dir) if base_dir is not None else path).encode("utf-8") + b"\0")
+            try:
+                with open(path, "rb") as f:
+                    digest.update(hashlib.sha256(f.read()).digest())
+            except OSError:
+                digest.update(b"missing")
+        return digest.hexdigest()
+
+    # loading the entries of the previous run (ignored if the fingerprint changed or the file is unreadable)
+    def load(self):
+        if not os.path.exists(self.path):
+            return
+        try:
+            with open(self.path, "r", encoding="utf-8") as f:
+                header = json.loads(f.readline())
+                if header.get("fingerprint") != self.fingerprint:
+                    if config.DEBUG:
+                        print(f"Manifest {self.path} was created with other rules, model or resources. All tasks will be processed.")
+                    return
+                for line in f:
+                    entry = json.loads(line)
+                    self.previous[entry["id"]] = entry
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Manifest {self.path} could not be read ({e}). All tasks will be processed.")
+            self.previous = {}
+
+    # (hash of the task, records of the previous run or None if the task should be processed)
+    def lookup(self, task):
+        task_hash = TaskManifest.task_hash(task)
+        entry = self.previous.get(task["id"])
+        if entry is not None and entry["hash"] == task_hash:
+            return task_hash, entry["records"]
+        return task_hash, None
+
+    # number of tokens of a task recorded by the previous run (carried forward with its records, see TokenCounts), None if unknown
+    def tokens(self, task):
+        entry = self.previous.get(task["id"])
+        return entry.get("tokens") if entry is not None else None
+
+    # recording the records (and the number of tokens) of a task in the current run
+    def add(self, task, task_hash, records, carried = False, tokens = None):
+        self.entries[task["id"]] = {"id": task["id"], "updated_at": task.get("updated_at"), "hash": task_hash, "records": records, "tokens": tokens}
+        if carried:
+            self.carried += 1
+        else:
+            self.processed += 1
+
+    # writing the manifest of the current run (atomically, tasks which failed are not recorded and will be processed again)
+    def save(self):
+        def write(f):
+            f.write(json.dumps({"fingerprint": self.fingerprint}) + "\n")
+            for entry in self.entries.values():
+                f.write(json.dumps(entry, ensure_ascii=False, separators=(",", ":")) + "\n")
+        write_atomic(self.path, write, ".manifest-")
+
+    def stats(self):
+        return {"carried": self.carried, "processed": self.processed}
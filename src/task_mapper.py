@@ -0,0 +1,186 @@
+import heapq
+import time
+from concurrent.futures import ProcessPoolExecutor
+from model.error import Error
+from model.taxonomy import Taxonomy
+from model.metadata import Metadata
+from rule_registry import RuleRegistry
+from token_table import TokenTable
+from task_context import TaskContext
+from task_tokens import TaskTokens
+
+
+# Mapping of the errors of analyzed tasks to the taxonomy
+# a mapper owns the shared (read-only) resources used by the mappers, so several mappers can be used at the same time
+class TaskMapper:
+
+    worker = None # mapper of a worker process of a MappingPool (see init_worker)
+
+    # constructor
+    def __init__(self, metadata, abbreviations_tdk, registry, timer = None, tag_timer = None):
+        self.metadata = metadata # data ID -> (id, nationality, gender, topic)
+        self.abbreviations_tdk = abbreviations_tdk # abbreviations defined by TDK (used in Unit detection for error type "NO"/"PUNCTUATION")
+        self.registry = registry # RuleRegistry: mappers of the facets per error tag
+        self.timer = timer # StageTimer of the span lookup and the facet mappers (None disables timing)
+        self.tag_timer = tag_timer # StageTimer of the mapping time per error tag (None disables timing)
+
+    # mapping errors of a task to the taxonomy by using token tables of the reconstructed and the original task data
+    def map_task(self, ctx, table, original_table):
+        task = ctx.task
+        timer = self.timer
+        tag_timer = self.tag_timer
+        registry = self.registry
+        errors = []
+
+        # metadata of the task, a single instance shared by the errors of the task
+        res_meta = self.metadata.get(task["data"]["ID"])
+        metadata = Metadata(res_meta[0], res_meta[1], res_meta[2], res_meta[3]) if res_meta != None else None
+
+        # tokenization of the texts of the task, shared by the facet mappers of its errors
+        task_tokens = TaskTokens(original_table.sentences)
+
+        # inner loop through results of a task
+        for result in task["annotations"][0]["result"]: # annotators were informed that they should create only one "annotation" object in Label Studio (task["annotations"][0] usage is secured because of this assumption)
+            if result["type"] == "labels": # there are two types of results: "labels" (contains error type) and "textarea" (contains corrected form)
+                err_start = time.perf_counter() if tag_timer is not None else 0.0
+                err = Error()
+                err.id = result["id"] # id of the result
+                err.idLabelStudio = task["id"] # id that Label Studio assigned to task (text)
+                err.idData = task["data"]["ID"] # id that is coming from the data itself (per text)
+            
+                # filling out metadata (task id, nationality, gender, topic)
+                err.metadata = metadata
+            
+                err.rawText = task["data"]["DATA"] # raw text of task
+                err.idxStartErr = result["value"]["start"] # index that the error starts
+                err.idxEndErr = result["value"]["end"] # index that the error ends
+                err.incorrText = result["value"]["text"] # incorrect text
+                err.errType = result["value"]["labels"][0] # type of the error (observational fact; Label Studio creates different result object for the same region which has multiple labels)
+                err.corrText = ctx.corrected_text(result["id"]) # corrected text of the error span
+            
+                # indices of the error in the reconstructed text (normal, same-span and overlapping-span cases are resolved by the task context)
+                start_for_tokenrange = -1
+                end_for_tokenrange = -1
+                overlap_flag = False
+
+                # if corrected text is empty then there is no span in the reconstructed text (pos, infFeat and lexFeat are empty)
+                # if corrected text is not empty then pos, infFeat and lexFeat should be assigned
+                if err.corrText.strip() != "":
+                    start_for_tokenrange, end_for_tokenrange, overlap_flag = ctx.token_range(err.id)
+            
+                # mappers of the facets of the error tag
+                rules = registry.get(err.errType)
+
+                # getting tokens from udpipe2 api call result which are related to the error (selected span)
+                start = time.perf_counter() if timer is not None else 0.0
+                token_list = table.span(start_for_tokenrange, end_for_tokenrange)
+                sentence = table.last_sentence
+                if timer is not None: start = timer.lap("span", start)
+
+                # taxonomy related features
+                pos = rules.pos(err, token_list, overlap_flag, task_tokens)
+                if timer is not None: start = timer.lap("pos", start)
+                inf_feat = rules.inf_feat(err, token_list, overlap_flag, task_tokens)
+                if timer is not None: start = timer.lap("inf_feat", start)
+                lex_feat = rules.lex_feat(err, token_list, overlap_flag, task_tokens)
+                if timer is not None: start = timer.lap("lex_feat", start)
+                unit = rules.unit(err, token_list, overlap_flag, sentence, self.abbreviations_tdk, task_tokens)
+                if timer is not None: start = timer.lap("unit", start)
+                phenomenon = rules.phenomenon(err, token_list, overlap_flag, original_table, task_tokens)
+                if timer is not None: start = timer.lap("phenomenon", start)
+                level = rules.level(err)
+                if timer is not None: timer.lap("level", start)
+                err.errTax = Taxonomy(err.id, pos, inf_feat, lex_feat, unit, phenomenon, level)
+                registry.check(err)
+
+
+                #print("\n##########################")
+                #for item in token_list:
+                #    print(item)
+                #print(f"Error ID: {err.errTax.id}")
+                #print(f"Corrected Text: {err.corrText}")
+                #print(f"POS: {err.errTax.pos}")
+                #print(f"Inflectional Features: {err.errTax.infFeat}")
+                #print(f"Lexical Features: {err.errTax.lexFeat}")
+                #print(f"Unit: {err.errTax.unit.value}")
+                #print(f"Phenomenon: {err.errTax.phenomenon.value}")
+                #print(f"Level: {err.errTax.level.value}")
+                #print(f"Nationality: {err.metadata.nationality}")
+                #print(f"Gender: {err.metadata.gender}")
+                #print(f"Topic: {err.metadata.topic}")
+
+                if tag_timer is not None: tag_timer.add(err.errType, time.perf_counter() - err_start)
+                errors.append(err)
+
+        return errors
+
+    # mapping a task from its compact data: (task, span map of the task, analysis of the reconstructed text, analysis of the original text)
+    def map_compact(self, item):
+        task, span_map, res_service, res_original = item
+        return self.map_task(TaskContext(task, span_map), TokenTable(res_service), TokenTable(res_original))
+
+    # mapping a shard of tasks in a worker process, the errors of each task are returned in the order of the shard
+    @staticmethod
+    def map_shard(items):
+        return [TaskMapper.worker.map_compact(item) for item in items]
+
+    # setting up the mapper of a worker process (each worker process belongs to a single pool), the rules are compiled again from the schema
+    @staticmethod
+    def init_worker(metadata, abbreviations_tdk, schema, strict):
+        TaskMapper.worker = TaskMapper(metadata, abbreviations_tdk, RuleRegistry(schema, strict))
+
+
+# Process pool for the CPU-bound mapping stage
+# tasks are sharded by their number of annotations (longest-processing-time-first assignment to the least loaded shard),
+# workers receive only the compact data of their tasks and the errors are returned in the original task order
+class MappingPool:
+
+    SHARDS_PER_PROCESS = 4 # more shards than processes, so a slow shard does not keep the other processes idle
+
+    # constructor
+    def __init__(self, processes, mapper, shards_per_process = SHARDS_PER_PROCESS):
+        self.processes = processes
+        self.shards_per_process = shards_per_process
+        # metadata, abbreviations and mapping schema of the mapper are sent once per worker process (not once per task)
+        self.executor = ProcessPoolExecutor(max_workers=processes, initializer=TaskMapper.init_worker,
+                                            initargs=(mapper.metadata, mapper.abbreviations_tdk, mapper.registry.schema, mapper.registry.strict))
+
+    # splitting items into at most n_shards shards with balanced total weight, indices of each shard are sorted
+    @staticmethod
+    def shard(weights, n_shards):
+        heap = [(0, s) for s in range(n_shards)]
+        shards = [[] for _ in range(n_shards)]
+        # heaviest items first, ties are broken by the index of the item (deterministic)
+        for i in sorted(range(len(weights)), key=lambda i: (-weights[i], i)):
+            load, s = heapq.heappop(heap)
+            shards[s].append(i)
+            heapq.heappush(heap, (load + weights[i], s))
+        return [sorted(shard) for shard in shards if len(shard) > 0]
+
+    # weight of a task: number of errors (labels type results) to map
+    @staticmethod
+    def weight(task):
+        return 1 + sum(1 for result in task["annotations"][0]["result"] if result["type"] == "labels")
+
+    # mapping (task context, analysis of the reconstructed text, analysis of the original text) items
+    # yields the list of errors of each item in the order of the items
+    def map(self, items):
+        if len(items) == 0:
+            return
+        shards = MappingPool.shard([MappingPool.weight(ctx.task) for ctx, _, _ in items], min(len(items), self.processes * self.shards_per_process))
+
+        futures = {}
+        for shard in shards:
+            future = self.executor.submit(TaskMapper.map_shard, [(items[i][0].task, items[i][0].span_map, items[i][1], items[i][2]) for i in shard])
+            for i in shard:
+                futures[i] = (shard, future)
+
+        results = {}
+        for i in range(len(items)):
+            if i not in results:
+                shard, future = futures[i]
+                results.update(zip(shard, future.result()))
+            yield results.pop(i)
+
+    def close(self):
+        self.executor.shutdown(cancel_futures=True)
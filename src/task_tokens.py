@@ -0,0 +1,26 @@
+from text_tools import wordpunct_tokenize
+
+
+# Tokenization of the texts of a task, shared by the facet mappers of all errors of the task
+# the word tokens of a text (corrections, erroneous spans) are computed once per distinct text of the task
+# the sentences of the raw text are the sentences UDPipe2 returned for the original text ("# text = " lines, see TokenTable.sentences),
+# so the raw text is not segmented again (formerly with NLTK's Punkt tokenizer for every İB and AnB error)
+class TaskTokens:
+    # constructor
+    def __init__(self, sentences):
+        self.sentences = sentences # texts of the sentences of the raw text
+        self.cache = {} # text -> tuple of its word tokens
+        self.sentence_words = None # set of the word tokens of the sentences (built on first use)
+
+    # word tokens of a text (see text_tools.wordpunct_tokenize), returned as a tuple since it is shared
+    def words(self, text):
+        words = self.cache.get(text)
+        if words is None:
+            words = self.cache[text] = tuple(wordpunct_tokenize(text))
+        return words
+
+    # whether a text has the same word tokens as a whole sentence of the raw text
+    def is_sentence(self, text):
+        if self.sentence_words is None:
+            self.sentence_words = {self.words(sentence) for sentence in self.sentences}
+        return self.words(text) in self.sentence_words
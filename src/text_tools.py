@@ -0,0 +1,19 @@
+import re
+
+
+# Tokenizers used by the facet mappers, without import-time side effects
+# wordpunct_tokenize is NLTK's WordPunctTokenizer (same pattern and flags), so NLTK is not imported for it
+# sentences are not segmented here, the facet mappers use the sentences of the UDPipe2 analysis (see TaskTokens)
+
+_WORDPUNCT = re.compile(r"\w+|[^\w\s]+", re.UNICODE | re.MULTILINE | re.DOTALL)
+
+
+# splitting a text into runs of word characters and runs of punctuation (e.g. "Ali'nin." -> ["Ali", "'", "nin", "."])
+def wordpunct_tokenize(text):
+    return _WORDPUNCT.findall(text)
+
+
+# lowercasing with the Turkish dotted/dotless i ("I" -> "ı", "İ" -> "i"), str.lower() would turn "İ" into "i" + combining dot
+def turkish_casefold(text):
+    return text.replace("I", "ı").replace("İ", "i").lower()
+
@@ -0,0 +1,44 @@
+import json
+import os
+from atomic_file import write_atomic
+
+
+# Token counts of the tasks of an output file (stored next to the output, used by the stats command for errors per 1,000 tokens)
+# the output records only hold the errors, so tasks without errors and the length of the texts are known from this file only
+# the number of tokens of a task is the number of words in the analysis of its original text (see TokenTable.count_words)
+# file format: JSON, {"version", "tasks": {task id: {"idData", "tokens"}}}
+class TokenCounts:
+
+    VERSION = 1 # version of the file format
+
+    # constructor
+    def __init__(self, path):
+        self.path = path
+        self.tasks = {} # task id -> {"idData", "tokens"}
+
+    # token counts path of an output file (results_x.jsonl -> results_x.counts.json)
+    @staticmethod
+    def path_for(output):
+        return os.path.splitext(output)[0] + ".counts.json"
+
+    # task id -> {"idData", "tokens"} of a token counts file, None if it is missing or of another version
+    @staticmethod
+    def load(path):
+        try:
+            with open(path, "r", encoding="utf-8") as f:
+                content = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not isinstance(content, dict) or content.get("version") != TokenCounts.VERSION:
+            return None
+        return {int(task_id): entry for task_id, entry in content["tasks"].items()}
+
+    # recording the number of tokens of a task (None if it is unknown, e.g. carried from a manifest without token counts)
+    def add(self, task, tokens):
+        if tokens is not None:
+            self.tasks[task["id"]] = {"idData": task["data"]["ID"], "tokens": tokens}
+
+    # writing the token counts atomically
+    def save(self):
+        content = {"version": TokenCounts.VERSION, "tasks": self.tasks}
+        write_atomic(self.path, lambda f: json.dump(content, f, ensure_ascii=False, separators=(",", ":"), sort_keys=True), ".counts-")
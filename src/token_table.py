@@ -0,0 +1,138 @@
+from bisect import bisect_left, bisect_right
+from collections import namedtuple
+
+# a row of the token table
+# id: ID column as written in CoNLL-U ("3" for words, "3-4" for multi-word tokens)
+# first/last: word range of the row (first == last for words, first < last for multi-word tokens)
+# start/end: TokenRange offsets (-1 for words inside a multi-word token, they inherit the offsets of the multi-word token)
+# sentence: index of the sentence in the analysis
+Token = namedtuple("Token", ["id", "first", "last", "form", "lemma", "upos", "xpos", "feats", "start", "end", "sentence"])
+
+
+# UDPipe2 analysis result (CoNLL-U) parsed once into columns, with a sorted-offset index for span queries
+# a span query costs O(log n + k) for n tokens and k returned rows
+class TokenTable:
+    # constructor
+    def __init__(self, conllu_text):
+        # columns (one entry per word or multi-word token line)
+        self.ids = []
+        self.firsts = []
+        self.lasts = []
+        self.forms = []
+        self.lemmas = []
+        self.upos = []
+        self.xpos = []
+        self.feats = []
+        self.starts = []
+        self.ends = []
+        self.sentence_ids = []
+
+        self.sentences = [] # texts of the sentences ("# text = " lines)
+
+        # offset index over the rows having a TokenRange (surface tokens), sorted by offsets
+        self.index_starts = []
+        self.index_ends = []
+        self.index_rows = []
+
+        self._parse(conllu_text)
+
+    # text of the last sentence in the analysis (last "# text = " line, empty if the analysis has no sentences), used as the sentence of the unit mappers
+    @property
+    def last_sentence(self):
+        return self.sentences[-1] if len(self.sentences) > 0 else ""
+
+    # rows for a span, including the words of multi-word tokens
+    # by default only tokens lying completely within the span are returned, overlapping=True returns all tokens touching the span
+    def span(self, start_idx, end_idx, overlapping=False):
+        return [self.token(row) for row in self.span_rows(start_idx, end_idx, overlapping)]
+
+    # row numbers of span(), in the order of the CoNLL-U lines
+    def span_rows(self, start_idx, end_idx, overlapping=False):
+        if overlapping:
+            pos = bisect_right(self.index_ends, start_idx) # first token ending after the span start
+            stop = bisect_left(self.index_starts, end_idx) # first token starting at or after the span end
+        else:
+            pos = bisect_left(self.index_starts, start_idx) # first token starting within the span
+            stop = bisect_right(self.index_ends, end_idx) # first token ending after the span end
+
+        rows = []
+        for i in range(pos, stop):
+            row = self.index_rows[i]
+            rows.append(row)
+            # words of a multi-word token directly follow it
+            if self.lasts[row] != self.firsts[row]:
+                rows.extend(range(row + 1, row + 1 + self.lasts[row] - self.firsts[row] + 1))
+        return rows
+
+    def token(self, row):
+        return Token(self.ids[row], self.firsts[row], self.lasts[row], self.forms[row], self.lemmas[row], self.upos[row],
+                     self.xpos[row], self.feats[row], self.starts[row], self.ends[row], self.sentence_ids[row])
+
+    def __len__(self):
+        return len(self.ids)
+
+    # number of words (syntactic words, not multi-word token lines or empty nodes) of a CoNLL-U text, without building a table
+    @staticmethod
+    def count_words(conllu_text):
+        count = 0
+        for line in conllu_text.splitlines():
+            if line != "" and line[0].isdigit():
+                head = line.split("\t", 1)[0]
+                if "-" not in head and "." not in head:
+                    count += 1
+        return count
+
+    # CoNLL-U lines of the rows (comments, empty lines and empty nodes are skipped like in the table)
+    @staticmethod
+    def row_lines(conllu_text):
+        return [line for line in conllu_text.splitlines() if not line.startswith("# text = ") and TokenTable._is_row(line.split("\t"))]
+
+    @staticmethod
+    def _is_row(cols):
+        return len(cols) == 10 and "." not in cols[0]
+
+    def _parse(self, conllu_text):
+        sentence_id = -1
+        for line in conllu_text.splitlines():
+            if line.startswith("# text = "):
+                self.sentences.append(line[len("# text = "):])
+                sentence_id = len(self.sentences) - 1
+                continue
+
+            cols = line.split("\t")
+            if not TokenTable._is_row(cols): # comments, empty lines and empty nodes
+                continue
+
+            if "-" in cols[0]:
+                first, last = cols[0].split("-")
+                first = int(first)
+                last = int(last)
+            else:
+                first = last = int(cols[0])
+
+            start = -1
+            end = -1
+            for part in cols[9].split("|"):
+                if part.startswith("TokenRange="):
+                    start, end = part[len("TokenRange="):].split(":", 1)
+                    start = int(start)
+                    end = int(end)
+                    break
+
+            row = len(self.ids)
+            self.ids.append(cols[0])
+            self.firsts.append(first)
+            self.lasts.append(last)
+            self.forms.append(cols[1])
+            self.lemmas.append(cols[2])
+            self.upos.append(cols[3])
+            self.xpos.append(cols[4])
+            self.feats.append(cols[5])
+            self.starts.append(start)
+            self.ends.append(end)
+            self.sentence_ids.append(sentence_id)
+
+            if start != -1:
+                self.index_starts.append(start)
+                self.index_ends.append(end)
+                self.index_rows.append(row)
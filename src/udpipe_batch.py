@@ -0,0 +1,131 @@
+
+# Packing several texts into a single UDPipe2 request and splitting the CoNLL-U result back into per-text results
+# texts are joined with an empty line, which is a paragraph (and therefore sentence) boundary for the UDPipe tokenizer
+# every sentence is assigned to its text by the TokenRange offsets of its tokens, and offsets are rebased to the start of that text
+class UDPipeBatch:
+
+    SEPARATOR = "\n\n" # document separator inserted between texts
+
+    # groups consecutive texts into batches whose joined size (UTF-8 bytes) does not exceed max_bytes
+    # a text which is larger than max_bytes on its own forms a single-element batch
+    # returns a list of lists of text indices
+    @staticmethod
+    def pack(texts, max_bytes):
+        batches = []
+        current = []
+        current_size = 0
+        sep_size = len(UDPipeBatch.SEPARATOR.encode("utf-8"))
+        for idx, text in enumerate(texts):
+            size = len(text.encode("utf-8"))
+            if current and current_size + sep_size + size > max_bytes:
+                batches.append(current)
+                current = []
+                current_size = 0
+            current_size += size if not current else sep_size + size
+            current.append(idx)
+        if current:
+            batches.append(current)
+        return batches
+
+    # joins texts into a single text, returns the joined text and the start offset of each text in it
+    @staticmethod
+    def join(texts):
+        offsets = []
+        pos = 0
+        for text in texts:
+            offsets.append(pos)
+            pos += len(text) + len(UDPipeBatch.SEPARATOR)
+        return UDPipeBatch.SEPARATOR.join(texts), offsets
+
+    # splits the CoNLL-U result of a joined text into one CoNLL-U result per text
+    # raises ValueError if a sentence spans more than one text (the caller should fall back to single requests)
+    @staticmethod
+    def split(conllu_text, offsets):
+        blocks = [block.split("\n") for block in conllu_text.strip("\n").split("\n\n") if block.strip() != ""]
+
+        # document-level comments (generator, model, etc.) are repeated at the beginning of each result
+        header = []
+        if len(blocks) > 0:
+            for line in blocks[0]:
+                if not line.startswith("#") or UDPipeBatch._is_sentence_comment(line):
+                    break
+                header.append(line)
+            blocks[0] = blocks[0][len(header):]
+
+        sentences = [[] for _ in offsets]
+        doc_idx = 0
+        for block in blocks:
+            doc_idx = UDPipeBatch._find_document(block, offsets, doc_idx)
+            sentences[doc_idx].append(UDPipeBatch._rebase(block, offsets[doc_idx]))
+
+        results = []
+        for doc_sentences in sentences:
+            lines = list(header)
+            for sent_idx, block in enumerate(doc_sentences):
+                if sent_idx == 0:
+                    lines.append("# newdoc")
+                for line in block:
+                    if line.startswith("# sent_id = "):
+                        line = f"# sent_id = {sent_idx + 1}" # sentence ids are renumbered per text
+                    lines.append(line)
+                lines.append("")
+            results.append("\n".join(lines) + "\n")
+        return results
+
+    @staticmethod
+    def _is_sentence_comment(line):
+        return line.startswith(("# newdoc", "# newpar", "# sent_id", "# text"))
+
+    # finds the text of a sentence by the first TokenRange in it (sentences come in the order of the texts)
+    @staticmethod
+    def _find_document(block, offsets, doc_idx):
+        start = None
+        end = None
+        for line in block:
+            token_range = UDPipeBatch._token_range(line)
+            if token_range is not None:
+                if start is None:
+                    start = token_range[0]
+                end = token_range[1]
+        if start is None:
+            return doc_idx # sentence without tokens stays with the previous text
+
+        while doc_idx + 1 < len(offsets) and offsets[doc_idx + 1] <= start:
+            doc_idx += 1
+        if doc_idx + 1 < len(offsets) and end > offsets[doc_idx + 1]:
+            raise ValueError("A sentence spans more than one text in the batch.")
+        return doc_idx
+
+    # returns (start, end) of the TokenRange attribute of a token line, None for other lines
+    @staticmethod
+    def _token_range(line):
+        cols = line.split("\t")
+        if len(cols) != 10:
+            return None
+        for part in cols[9].split("|"):
+            if part.startswith("TokenRange="):
+                start, end = part[len("TokenRange="):].split(":", 1)
+                return int(start), int(end)
+        return None
+
+    # shifting TokenRange offsets of a sentence by the start offset of its text
+    @staticmethod
+    def _rebase(block, base):
+        if base == 0:
+            return [line for line in block if not line.startswith("# newdoc")]
+        rebased = []
+        for line in block:
+            if line.startswith("# newdoc"):
+                continue
+            cols = line.split("\t")
+            if len(cols) == 10 and "TokenRange=" in cols[9]:
+                parts = []
+                for part in cols[9].split("|"):
+                    if part.startswith("TokenRange="):
+                        start, end = part[len("TokenRange="):].split(":", 1)
+                        part = f"TokenRange={int(start) - base}:{int(end) - base}"
+                    parts.append(part)
+                cols[9] = "|".join(parts)
+                line = "\t".join(cols)
+            rebased.append(line)
+        return rebased
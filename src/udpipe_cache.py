@@ -0,0 +1,139 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from atomic_file import write_atomic
+
+
+# Content-addressed cache for UDPipe2 responses
+# two tiers are used: a bounded in-memory LRU tier in front of a persistent on-disk tier
+# disk entries are written atomically (temp file + rename), so concurrent runs can share the same cache directory
+class UDPipeCache:
+    # constructor
+    def __init__(self, cache_dir, max_bytes = 512 * 1024 * 1024, max_items_memory = 1024):
+        self.cache_dir = cache_dir # root directory of the on-disk tier
+        self.max_bytes = max_bytes # size limit of the on-disk tier (oldest entries are evicted first)
+        self.max_items_memory = max_items_memory # number of entries kept in the in-memory tier
+        self.memory = OrderedDict() # key -> conllu text, ordered from least to most recently used
+        self.lock = threading.Lock() # cache is shared by worker threads
+
+        # counters
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+        self.writes = 0
+        self.evictions = 0
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.size_on_disk = self._scan_size()
+
+    # key of a request: hash of the model, tokenizer/tagger/parser options (everything in the payload except the data) and the input text
+    @staticmethod
+    def make_key(payload, text):
+        options = {k: v for k, v in payload.items() if k != "data"}
+        raw = json.dumps([options, text], ensure_ascii=False, sort_keys=True)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    # returns the cached conllu text or None
+    def get(self, key):
+        with self.lock:
+            if key in self.memory:
+                self.memory.move_to_end(key)
+                self.hits_memory += 1
+                return self.memory[key]
+
+        path = self._path(key)
+        try:
+            with open(path, "r", encoding="utf-8") as file:
+                value = file.read()
+            os.utime(path) # refreshing mtime, eviction removes the least recently used entries first
+        except FileNotFoundError:
+            with self.lock:
+                self.misses += 1
+            return None
+
+        with self.lock:
+            self.hits_disk += 1
+            self._remember(key, value)
+        return value
+
+    # stores conllu text for the key in both tiers
+    def put(self, key, value):
+        path = self._path(key)
+        try:
+            old_size = os.path.getsize(path) # an overwritten entry is already counted in size_on_disk
+        except FileNotFoundError:
+            old_size = 0
+
+        # atomic write: readers see either no entry or the complete entry
+        write_atomic(path, lambda file: file.write(value), ".tmp-")
+
+        with self.lock:
+            self.writes += 1
+            self.size_on_disk += os.path.getsize(path) - old_size
+            self._remember(key, value)
+            evict = self.size_on_disk > self.max_bytes
+        if evict:
+            self._evict()
+
+    # counters for reporting
+    def stats(self):
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        return {
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_ratio": round((self.hits_memory + self.hits_disk) / lookups, 4) if lookups else 0.0,
+            "writes": self.writes,
+            "evictions": self.evictions,
+            "size_on_disk": self.size_on_disk
+        }
+
+    # entries are sharded into sub-directories by the first two characters of the key
+    def _path(self, key):
+        return os.path.join(self.cache_dir, key[:2], key + ".conllu")
+
+    # adding an entry to the in-memory tier (lock must be held)
+    def _remember(self, key, value):
+        self.memory[key] = value
+        self.memory.move_to_end(key)
+        while len(self.memory) > self.max_items_memory:
+            self.memory.popitem(last=False)
+
+    def _entries(self):
+        entries = []
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".conllu"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except FileNotFoundError: # removed by a concurrent run
+                    continue
+                entries.append((st.st_mtime, st.st_size, os.path.join(root, name)))
+        return entries
+
+    def _scan_size(self):
+        return sum(size for _, size, _ in self._entries())
+
+    # removing least recently used entries until the on-disk tier is below 90% of its limit
+    # the directory is re-scanned because other runs may have written to it as well
+    def _evict(self):
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        target = int(self.max_bytes * 0.9)
+        removed = 0
+        for _, size, path in entries:
+            if total <= target:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        with self.lock:
+            self.size_on_disk = total
+            self.evictions += removed
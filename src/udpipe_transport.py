@@ -0,0 +1,150 @@
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+
+# HTTP transport for the UDPipe2 REST API
+# - keep-alive connection pool (requests.Session)
+# - retries with exponential backoff and full jitter for timeouts, connection errors, 429 and 5xx responses
+# - adaptive read timeout derived from the measured latency percentiles
+# - optional hedged requests: a duplicate request is sent if the first one is slower than the usual (p95) latency
+class UDPipeTransport:
+
+    RETRY_STATUS = {429, 500, 502, 503, 504} # status codes which are worth retrying
+
+    # constructor
+    def __init__(self, pool_size = 10, max_retries = 3, backoff_base = 0.5, backoff_max = 8.0, timeout = (25, 60),
+                 adaptive_timeout = True, min_read_timeout = 5.0, timeout_factor = 3.0, hedge = False, min_samples = 20):
+        # requests is imported on first use (a pipeline with the local or replay analyzer never creates a transport)
+        import requests
+        from requests.adapters import HTTPAdapter
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=2 * pool_size if hedge else pool_size, max_retries=0) # retries are handled here, not by urllib3
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self.max_retries = max_retries # number of retries after the first attempt
+        self.backoff_base = backoff_base # first backoff delay (seconds), doubled for each retry
+        self.backoff_max = backoff_max # upper limit of a backoff delay (seconds)
+        self.timeout = timeout # (connect, read) timeout used until enough latencies are measured, also the upper limit of the adaptive timeout
+        self.adaptive_timeout = adaptive_timeout
+        self.min_read_timeout = min_read_timeout # lower limit of the adaptive read timeout
+        self.timeout_factor = timeout_factor # adaptive read timeout = p99 latency * timeout_factor (scaled by the request size)
+        self.hedge = hedge
+        self.min_samples = min_samples # number of measured latencies required before adaptive timeouts and hedging are used
+
+        self.samples = deque(maxlen=1000) # (latency in seconds, request size in bytes) of the recent successful requests
+        self.lock = threading.Lock()
+        self.hedge_executor = ThreadPoolExecutor(max_workers=2 * pool_size) if hedge else None # original and duplicate request of each caller
+
+        # counters
+        self.requests = 0
+        self.retries = 0
+        self.failures = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    # sending a POST request with form data, returns the response (status is checked)
+    # raises requests exceptions if all attempts fail
+    def post(self, url, data):
+        data = dict(data) # a hedged duplicate may still be running after the caller reuses its payload
+        size = sum(len(str(v).encode("utf-8")) for v in data.values())
+        import requests
+        attempt = 0
+        while True:
+            try:
+                if self.hedge and len(self.samples) >= self.min_samples:
+                    response = self._post_hedged(url, data, size)
+                else:
+                    response = self._post_once(url, data, size)
+                return response
+            except requests.exceptions.RequestException as e:
+                if attempt >= self.max_retries or not self._is_retryable(e):
+                    with self.lock:
+                        self.failures += 1
+                    raise
+                attempt += 1
+                with self.lock:
+                    self.retries += 1
+                # exponential backoff with full jitter
+                time.sleep(random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** (attempt - 1)))))
+
+    # latency percentile (p in 0-100) of the recent successful requests, None if there is no measurement
+    def latency_percentile(self, p):
+        with self.lock:
+            latencies = sorted(latency for latency, _ in self.samples)
+        if len(latencies) == 0:
+            return None
+        return latencies[min(len(latencies) - 1, int(round(p / 100 * (len(latencies) - 1))))]
+
+    # read timeout for a request of the given size
+    def read_timeout(self, size):
+        if not self.adaptive_timeout or len(self.samples) < self.min_samples:
+            return self.timeout[1]
+        with self.lock:
+            sizes = sorted(s for _, s in self.samples)
+        median_size = max(1, sizes[len(sizes) // 2])
+        predicted = self.latency_percentile(99) * self.timeout_factor * max(1.0, size / median_size)
+        return min(self.timeout[1], max(self.min_read_timeout, predicted))
+
+    # counters and latency percentiles for reporting
+    def stats(self):
+        return {
+            "requests": self.requests,
+            "retries": self.retries,
+            "failures": self.failures,
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "latency_p50": self.latency_percentile(50),
+            "latency_p95": self.latency_percentile(95),
+            "latency_p99": self.latency_percentile(99)
+        }
+
+    def close(self):
+        if self.hedge_executor is not None:
+            self.hedge_executor.shutdown(wait=False, cancel_futures=True)
+        self.session.close()
+
+    def _post_once(self, url, data, size):
+        with self.lock:
+            self.requests += 1
+        started = time.perf_counter()
+        response = self.session.post(url, data=data, timeout=(self.timeout[0], self.read_timeout(size)))
+        response.raise_for_status()
+        with self.lock:
+            self.samples.append((time.perf_counter() - started, size))
+        return response
+
+    # sending a duplicate request if the first one does not finish within the p95 latency, the first successful response wins
+    def _post_hedged(self, url, data, size):
+        hedge_delay = self.latency_percentile(95)
+        first = self.hedge_executor.submit(self._post_once, url, data, size)
+        done, _ = wait([first], timeout=hedge_delay)
+        if done:
+            return first.result()
+
+        with self.lock:
+            self.hedges += 1
+        second = self.hedge_executor.submit(self._post_once, url, data, size)
+        pending = {first, second}
+        error = None
+        while pending:
+            done, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                if future.exception() is None:
+                    if future is second:
+                        with self.lock:
+                            self.hedge_wins += 1
+                    return future.result()
+                error = future.exception()
+        raise error
+
+    def _is_retryable(self, e):
+        import requests
+        if isinstance(e, (requests.exceptions.Timeout, requests.exceptions.ConnectionError)):
+            return True
+        if isinstance(e, requests.exceptions.HTTPError) and e.response is not None:
+            return e.response.status_code in UDPipeTransport.RETRY_STATUS
+        return False
@@ -0,0 +1,154 @@
+from bisect import bisect_left, insort
+from collections import Counter
+from model.error_tag import ErrorTag
+
+
+# Single-pass validator of Label Studio's json export
+# every task is visited once: cross-overlapping spans are found with a sweep line over the sorted spans,
+# conflicting corrections of the same span are found with span-keyed hash maps
+# tasks are added one by one (add_task), so the validator also works on streamed exports
+class DataValidator:
+
+    ERROR_TAGS = frozenset(tag.value for tag in ErrorTag)
+
+    # constructor
+    def __init__(self):
+        self.task_count = 0
+        self.not_assigned_tag = [] # result ids of spans which are not assigned to a valid error type
+        self.multi_annotation = [] # task ids having more than one element in the list of annotations
+        self.multi_label = [] # result ids of labels-type results having more than one label
+        self.multi_text = [] # result ids of textarea-type results having more than one text
+        self.labels_textarea_mismatch = [] # task ids having different number of labels and textarea type results
+        self.cross_overlap = [] # (result id, result id) pairs of cross-overlapping spans
+        self.same_span_multi_correction = [] # result ids of labels-type results whose span is corrected with a different text by another result
+        self.cross_overlap_counter = 0
+        self.same_span_multi_correction_counter = 0
+
+    def add_task(self, task):
+        self.task_count += 1
+        if len(task["annotations"]) > 1:
+            self.multi_annotation.append(task["id"])
+        if len(task["annotations"]) == 0:
+            return
+
+        labels = []
+        textarea_texts = {} # span -> Counter of corrected texts
+        textarea_id_texts = {} # (span, result id) -> Counter of corrected texts
+        corrections = {} # result id -> corrected text (first textarea-type result with that id)
+        textarea_counter = 0
+        for result in task["annotations"][0]["result"]:
+            value = result["value"]
+            if result["type"] == "labels":
+                labels.append(result)
+                if value["labels"][0] not in DataValidator.ERROR_TAGS:
+                    self.not_assigned_tag.append(result["id"])
+                if len(value["labels"]) > 1:
+                    self.multi_label.append(result["id"])
+            elif result["type"] == "textarea":
+                textarea_counter += 1
+                if len(value["text"]) > 1:
+                    self.multi_text.append(result["id"])
+                text = value["text"][0] if len(value["text"]) > 0 else ""
+                span = (value["start"], value["end"])
+                corrections.setdefault(result["id"], text)
+                textarea_texts.setdefault(span, Counter())[text] += 1
+                textarea_id_texts.setdefault((span, result["id"]), Counter())[text] += 1
+
+        if len(labels) != textarea_counter:
+            self.labels_textarea_mismatch.append(task["id"])
+
+        # same spans with different labels should have the same corrected text
+        # number of textarea-type results of the span with another id and another text = all - same text - same id with another text
+        for result in labels:
+            span = (result["value"]["start"], result["value"]["end"])
+            texts = textarea_texts.get(span)
+            if texts is None:
+                continue
+            corrected = corrections.get(result["id"])
+            own_texts = textarea_id_texts.get((span, result["id"]), Counter())
+            conflicts = sum(texts.values()) - texts[corrected] - (sum(own_texts.values()) - own_texts[corrected])
+            if conflicts > 0:
+                self.same_span_multi_correction_counter += conflicts
+                self.same_span_multi_correction.append(result["id"])
+
+        self._sweep_cross_overlaps(labels)
+
+    # finding pairs of spans (a, b) with a.start < b.start < a.end < b.end
+    # spans are visited by start index; active spans are kept sorted by end index, so the spans crossed by the current span are a contiguous slice
+    def _sweep_cross_overlaps(self, labels):
+        spans = {}
+        for result in sorted(labels, key = lambda e: (e["value"]["start"], -e["value"]["end"])):
+            spans.setdefault((result["value"]["start"], result["value"]["end"]), result["id"]) # same spans are checked once
+
+        active = [] # (end, result id) of the spans started before the current start index
+        group = []
+        group_start = None
+        for (start, end), result_id in spans.items():
+            if start != group_start:
+                for item in group:
+                    insort(active, item)
+                group = []
+                group_start = start
+                # spans ending at or before the current start cannot be crossed anymore
+                del active[:bisect_left(active, (start + 1,))]
+
+            crossed = active[:bisect_left(active, (end,))]
+            self.cross_overlap_counter += len(crossed)
+            for _, other_id in crossed:
+                self.cross_overlap.append((other_id, result_id))
+            group.append((end, result_id))
+
+    def passed(self):
+        return (len(self.not_assigned_tag) == 0 and len(self.multi_annotation) == 0 and len(self.multi_label) == 0 and len(self.multi_text) == 0
+                and len(self.labels_textarea_mismatch) == 0 and self.cross_overlap_counter == 0 and self.same_span_multi_correction_counter == 0)
+
+    # machine-readable report (counters and offending ids)
+    def report(self):
+        return {
+            "passed": self.passed(),
+            "tasks": self.task_count,
+            "not_assigned_tag": {"count": len(self.not_assigned_tag), "result_ids": self.not_assigned_tag},
+            "multi_annotation": {"count": len(self.multi_annotation), "task_ids": self.multi_annotation},
+            "multi_label": {"count": len(self.multi_label), "result_ids": self.multi_label},
+            "multi_text": {"count": len(self.multi_text), "result_ids": self.multi_text},
+            "labels_textarea_mismatch": {"count": len(self.labels_textarea_mismatch), "task_ids": self.labels_textarea_mismatch},
+            "cross_overlap": {"count": self.cross_overlap_counter, "result_ids": [list(pair) for pair in self.cross_overlap]},
+            "same_span_multi_correction": {"count": self.same_span_multi_correction_counter, "result_ids": self.same_span_multi_correction}
+        }
+
+    # printing the results of the checks
+    def print_summary(self):
+        if len(self.not_assigned_tag) == 0:
+            print("Passed. All spans were assigned to valid error types.")
+        else:
+            print(f"Failed. There are {len(self.not_assigned_tag)} spans which were not assigned to valid error types.")
+
+        if len(self.multi_annotation) == 0:
+            print("Passed. List of annotations has only one element in each task.")
+        else:
+            print(f"Failed. There are {len(self.multi_annotation)} tasks having more than one element in the list of annotations.")
+
+        if len(self.multi_label) == 0:
+            print("Passed. List of labels has only one element in each labels-type result in each task.")
+        else:
+            print(f"Failed. There are {len(self.multi_label)} result object having more than one element in the list of labels.")
+
+        if len(self.multi_text) == 0:
+            print("Passed. List of text has only one element in each textarea-type result in each task.")
+        else:
+            print(f"Failed. There are {len(self.multi_text)} result object having more than one element in the list of text.")
+
+        if len(self.labels_textarea_mismatch) == 0:
+            print("Passed. Equal number of labels and textarea type exists.")
+        else:
+            print("Failed. Different number of labels and textarea type exists.")
+
+        if self.cross_overlap_counter == 0:
+            print("Passed. Cross-overlap spans not found.")
+        else:
+            print(f"Failed. Cross-overlap spans found.")
+
+        if self.same_span_multi_correction_counter == 0:
+            print("Passed. Same spans with different labels have the same corrected text.")
+        else:
+            print(f"Failed. Same spans with different labels ({self.same_span_multi_correction_counter}) should be corrected with the same text.")